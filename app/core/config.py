@@ -1,5 +1,8 @@
 import os
-from pydantic import Field
+from pydantic import Field, computed_field
+from pydantic_settings import BaseSettings
+from typing import Dict, Optional
+from urllib import parse
 
 class Settings(BaseSettings):
     """
@@ -7,12 +10,191 @@ class Settings(BaseSettings):
     """
 
     # DESCRIPTION: str =Field(default="", alias="DESCRIPTION")
+    PROJECT_NAME: str = "SecureDoc Flow"
     DESCRIPTION: str = ""
+    API_V1_STR: str = "/api/v1"
 
     # Secret để ký state CSRF (Nên khác JWT_SECRET)
     STATE_SECRET_KEY: str
     # STATE_SECRET_KEY: str = Field(default="", alias="STATE_SECRET_KEY")
 
+    # Endpoint Google OAuth2 / OIDC mà luồng đăng nhập gọi tới.
+    # Benchmark / môi trường local trỏ về benchmarks.fake_oauth (không gọi ra Google)
+    GOOGLE_AUTH_URL: str = "https://accounts.google.com/o/oauth2/v2/auth"
+    GOOGLE_TOKEN_URL: str = "https://oauth2.googleapis.com/token"
+    GOOGLE_USERINFO_URL: str = "https://openidconnect.googleapis.com/v1/userinfo"
+
+    # --- Database (PostgreSQL) ---
+    POSTGRES_SERVER: str = "db"
+    POSTGRES_PORT: int = 5432
+    POSTGRES_USER: str = "postgres"
+    POSTGRES_PASSWORD: str = ""
+    POSTGRES_DB: str = "securedoc_db"
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    # Ghi đè toàn bộ URI (vd: database PostgreSQL riêng cho benchmark)
+    DATABASE_URL: Optional[str] = None
+    # Read replica (streaming replication) cho dashboard / tìm kiếm / báo cáo; None = đọc từ primary
+    DATABASE_REPLICA_URL: Optional[str] = None
+    DB_REPLICA_POOL_SIZE: int = 10
+    DB_REPLICA_MAX_OVERFLOW: int = 20
+    # Read-your-writes: sau khi user ghi, các request đọc của user đó đi primary trong khoảng này
+    DB_PRIMARY_PIN_SECONDS: float = 5.0
+    # Replica trễ quá ngưỡng (hoặc không đo được) -> mọi request đọc quay về primary
+    DB_REPLICA_MAX_LAG_SECONDS: float = 10.0
+    DB_REPLICA_LAG_CHECK_INTERVAL_SECONDS: float = 2.0
+
+    @computed_field  # type: ignore[misc]
+    @property
+    def SQLALCHEMY_DATABASE_URI(self) -> str:
+        if self.DATABASE_URL:
+            return self.DATABASE_URL
+        password = parse.quote_plus(self.POSTGRES_PASSWORD)
+        return (
+            f"postgresql+asyncpg://{self.POSTGRES_USER}:{password}"
+            f"@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+        )
+
+    # --- File Storage ---
+    STORAGE_TYPE: str = Field(default="LOCAL", description="Loại storage: LOCAL, S3 (S3/MinIO)")
+    LOCAL_STORAGE_DIR: str = Field(default="uploads/", description="Thư mục vật lý cho Local Storage")
+
+    # S3 / MinIO (path-style). S3_PUBLIC_ENDPOINT_URL dùng cho presigned URL trả về trình duyệt
+    S3_ENDPOINT_URL: str = "http://minio:9000"
+    S3_PUBLIC_ENDPOINT_URL: Optional[str] = None
+    S3_REGION: str = "us-east-1"
+    S3_BUCKET: str = "securedoc"
+    S3_ACCESS_KEY: str = ""
+    S3_SECRET_KEY: str = ""
+    S3_PART_SIZE: int = 8 * 1024 * 1024
+    S3_MAX_CONCURRENCY: int = 4     # Số part upload song song (bộ nhớ ~ (n+1) * part size)
+    S3_POOL_SIZE: int = 20
+    S3_PRESIGN_EXPIRES: int = 300
+
+    # --- Chunk-tree (Merkle) digest ---
+    # Leaf cố định cho Merkle root lưu cạnh file_hash; leaf hash nằm trong sidecar <file>.merkle
+    MERKLE_LEAF_SIZE: int = 1024 * 1024
+    MERKLE_HASH_WORKERS: int = min(8, os.cpu_count() or 1)
+
+    # --- Resumable Uploads ---
+    # Phiên upload tiếp nối (tus-style) được ghi tạm ở đây, nên cùng filesystem với LOCAL_STORAGE_DIR
+    UPLOAD_SESSION_DIR: str = "uploads/.sessions/"
+    UPLOAD_SESSION_TTL_SECONDS: int = 24 * 3600
+    UPLOAD_MAX_SIZE: int = 2 * 1024 * 1024 * 1024
+
+    # --- Internal Signing ---
+    INTERNAL_PRIVATE_KEY_PATH: str = "keys/internal_signing_private.pem"
+    INTERNAL_PRIVATE_KEY_PASSWORD: str = ""
+    # Khóa ký nháy (INITIAL). Thuật toán theo loại khóa: RSA-PSS / Ed25519 / ECDSA P-256
+    INITIAL_PRIVATE_KEY_PATH: str = "keys/initial_signing_private.pem"
+    INITIAL_PRIVATE_KEY_PASSWORD: str = ""
+    # Trạng thái khóa ký (ACTIVE / REVOKED) cache tối đa chừng này rồi đọc lại từ DB,
+    # để thu hồi từ CLI có hiệu lực trên mọi worker
+    SIGNING_KEY_STATUS_TTL_SECONDS: float = 5.0
+    # Signing daemon: nếu đặt socket, API worker không nạp private key mà ký qua Unix socket
+    SIGNING_DAEMON_SOCKET: Optional[str] = None
+    SIGNING_DAEMON_WORKERS: int = os.cpu_count() or 1
+    SIGNING_DAEMON_MAX_BATCH: int = 64
+    SIGNING_DAEMON_TIMEOUT_SECONDS: float = 5.0
+    # Metadata khóa (fingerprint / public key) hỏi lại daemon sau khoảng này, hoặc ngay khi OP_SIGN báo khóa khác
+    SIGNING_DAEMON_INFO_TTL_SECONDS: float = 60.0
+    # Ký theo lô: gom hash trong cửa sổ ngắn, ký Merkle root một lần, mỗi hồ sơ lưu inclusion proof
+    SIGN_BATCH_ENABLED: bool = False
+    SIGN_BATCH_WINDOW_MS: int = 50
+    SIGN_BATCH_MAX_SIZE: int = 512
+
+    # --- External CA (Viettel-CA, VNPT-CA, FPT-CA) ---
+    # provider -> base URL (env dạng JSON)
+    EXTERNAL_CA_PROVIDERS: Dict[str, str] = {
+        "VIETTEL_CA": "http://localhost:9200",
+        "VNPT_CA": "http://localhost:9200",
+        "FPT_CA": "http://localhost:9200",
+    }
+    EXTERNAL_CA_DEFAULT_PROVIDER: str = "VIETTEL_CA"
+    EXTERNAL_CA_API_KEY: str = ""
+    EXTERNAL_CA_TIMEOUT_SECONDS: float = 10.0
+    EXTERNAL_CA_MAX_CONCURRENCY: int = 8            # Mỗi provider
+    EXTERNAL_CA_MAX_RETRIES: int = 3
+    EXTERNAL_CA_BACKOFF_BASE_SECONDS: float = 0.2
+    EXTERNAL_CA_BACKOFF_MAX_SECONDS: float = 5.0
+    EXTERNAL_CA_BREAKER_THRESHOLD: int = 5          # Lỗi liên tiếp trước khi mở mạch
+    EXTERNAL_CA_BREAKER_RESET_SECONDS: float = 30.0
+    # CA ký body callback bằng HMAC-SHA256 (header X-CA-Signature)
+    EXTERNAL_CA_CALLBACK_SECRET: str = ""
+    EXTERNAL_CA_CALLBACK_BASE_URL: str = "http://localhost:8000"
+
+    # --- PAdES Validation (PDF đã ký bằng USB Token / CA bên ngoài) ---
+    # Thư mục chứa chứng thư Root CA tin cậy (.pem/.crt/.cer); đổi nội dung -> đổi trust-store version
+    PADES_TRUST_ROOTS_DIR: str = "keys/trust_roots/"
+    PADES_VALIDATION_WORKERS: int = min(4, os.cpu_count() or 1)
+    PADES_VALIDATION_CACHE_SIZE: int = 1024
+    PADES_VALIDATION_TIMEOUT_SECONDS: float = 60.0
+    # Cho phép tải CRL/OCSP/chứng thư trung gian khi xác thực (cần mạng ra ngoài)
+    PADES_ALLOW_FETCHING: bool = False
+    # Nhúng chữ ký nội bộ vào PDF (incremental update) khi Manager ký. Worker tự nạp
+    # INTERNAL_PRIVATE_KEY_PATH + chứng thư tương ứng (không đi qua signing daemon).
+    PADES_EMBED_ENABLED: bool = False
+    PADES_SIGNING_CERT_PATH: str = "keys/internal_signing_cert.pem"
+    PADES_EMBED_WORKERS: int = min(4, os.cpu_count() or 1)
+    PADES_EMBED_TIMEOUT_SECONDS: float = 120.0
+
+    # --- Full-text Search ---
+    # Trích text PDF khi có phiên bản mới (process pool), chỉ giữ tối đa SEARCH_MAX_TEXT_CHARS ký tự
+    SEARCH_EXTRACT_WORKERS: int = min(2, os.cpu_count() or 1)
+    SEARCH_EXTRACT_TIMEOUT_SECONDS: float = 60.0
+    SEARCH_MAX_TEXT_CHARS: int = 200_000
+    SEARCH_PAGE_SIZE: int = 20
+
+    # --- Legacy Import (/var/data/hoso/<DEPT>/<DOC>/V{n}_*.pdf) ---
+    LEGACY_IMPORT_ROOT: str = "/var/data/hoso"
+    # Số hồ sơ mỗi transaction COPY
+    LEGACY_IMPORT_BATCH_SIZE: int = 200
+    LEGACY_IMPORT_HASH_WORKERS: int = os.cpu_count() or 1
+    # Số file ghi vào storage đồng thời (S3: số request PUT song song)
+    LEGACY_IMPORT_STORE_CONCURRENCY: int = 8
+
+    # --- SLA Analytics ---
+    # Consumer đọc audit_logs theo checkpoint, cập nhật rollup giờ / ngày
+    ANALYTICS_INTERVAL_SECONDS: float = 30.0
+    # Chỉ xử lý sự kiện cũ hơn khoảng này (transaction commit muộn vẫn kịp được đọc)
+    ANALYTICS_SETTLE_SECONDS: float = 30.0
+    ANALYTICS_BATCH_SIZE: int = 5000
+    ANALYTICS_BACKFILL_WORKERS: int = 4
+
+    # --- Document Timeline ---
+    TIMELINE_PAGE_SIZE: int = 50
+    # Số hồ sơ giữ trang timeline trong cache (mỗi worker)
+    TIMELINE_CACHE_SIZE: int = 1024
+
+    # --- Audit Query ---
+    AUDIT_PAGE_SIZE: int = 50
+    AUDIT_MAX_PAGE_SIZE: int = 500
+    # Chặn truy vấn JSON path chạy quá lâu trên bảng audit lớn
+    AUDIT_QUERY_TIMEOUT_MS: int = 10_000
+
+    # --- Exports (CSV / NDJSON) ---
+    # Số dòng mỗi lần fetch từ server-side cursor
+    EXPORT_YIELD_PER: int = 2000
+
+    # --- Health Probes ---
+    # /readyz chỉ đọc kết quả cache; các check chạy nền theo chu kỳ này
+    HEALTH_CHECK_INTERVAL_SECONDS: float = 5.0
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = 2.0
+    # Kết quả cũ hơn ngưỡng này coi như không sẵn sàng (vòng refresh bị treo)
+    HEALTH_MAX_STALENESS_SECONDS: float = 30.0
+
+    # --- Request Profiler ---
+    # Bật profile theo request bằng header X-Profile-Token / cookie profile_token (HMAC)
+    PROFILER_ENABLED: bool = True
+    PROFILER_SECRET_KEY: str = ""
+    PROFILER_MAX_TRACES: int = 50
+
+    # --- Error Pages ---
+    # Cookie chứa JWT phiên đăng nhập; chỉ khi có cookie này mới tra cứu user cho trang lỗi
+    SESSION_COOKIE_NAME: str = "access_token"
+    # Số lượng trang lỗi / JSON body (status, detail) tối đa được cache trong bộ nhớ
+    ERROR_PAGE_CACHE_SIZE: int = 256
+
 
 # class Settings(BaseSettings):
 #     """
@@ -37,3 +219,6 @@ class Settings(BaseSettings):
 #         path = os.path.join(os.getcwd(), self.UPLOAD_DIR)
 #         os.makedirs(path, exist_ok=True)  # Tự động tạo thư mục nếu chưa có
 #         return path
+
+
+settings = Settings()
@@ -0,0 +1,126 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Callable, Optional, Sequence
+from uuid import UUID
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.sql import Select
+
+from .config import settings
+from .metrics import registry
+
+EXPORT_ROWS = registry.counter("export_rows_total", "Rows streamed by CSV/NDJSON exports.", ("export", "format"))
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+def export_value(value: Any) -> Any:
+    """JSON-safe scalar for one exported cell."""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+class _CsvFormatter:
+    def __init__(self, columns: Sequence[str]):
+        self.columns = columns
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def header(self) -> str:
+        # BOM để Excel nhận đúng UTF-8 (tiêu đề tiếng Việt)
+        self._writer.writerow(self.columns)
+        return "\ufeff" + self._drain()
+
+    def rows(self, rows: Sequence[Sequence[Any]]) -> str:
+        for row in rows:
+            self._writer.writerow([
+                json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else export_value(value)
+                for value in row
+            ])
+        return self._drain()
+
+    def _drain(self) -> str:
+        text = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return text
+
+
+class _NdjsonFormatter:
+    def __init__(self, columns: Sequence[str]):
+        self.columns = columns
+
+    def header(self) -> str:
+        return ""
+
+    def rows(self, rows: Sequence[Sequence[Any]]) -> str:
+        return "".join(
+            json.dumps(dict(zip(self.columns, row)), default=export_value, ensure_ascii=False) + "\n" for row in rows
+        )
+
+
+_FORMATTERS = {"csv": _CsvFormatter, "ndjson": _NdjsonFormatter}
+
+
+async def stream_export(
+    stmt: Select,
+    export_format: str,
+    compress: bool,
+    export_name: str,
+    session_factory: Optional[Callable] = None,
+    yield_per: int = settings.EXPORT_YIELD_PER,
+) -> AsyncIterator[bytes]:
+    """
+    Stream the rows of a column-level SELECT as CSV / NDJSON bytes.
+
+    Rows come from a server-side cursor (`AsyncSession.stream` + `yield_per`)
+    one partition at a time, so memory stays flat regardless of the export
+    size. The generator opens its own session: the request-scoped one from
+    `get_db` is closed before a StreamingResponse body is consumed. With
+    `compress`, output is gzip-encoded incrementally and sync-flushed after
+    each partition so clients see data as soon as it is produced.
+    """
+    if session_factory is None:
+        from ..db.database import SessionLocal as session_factory
+
+    formatter = _FORMATTERS[export_format]([column.name for column in stmt.selected_columns])
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31: gzip container
+
+    def encode(text: str, flush: bool = False) -> bytes:
+        data = text.encode("utf-8")
+        if compressor is None:
+            return data
+        return compressor.compress(data) + (compressor.flush(zlib.Z_SYNC_FLUSH) if flush else b"")
+
+    # Byte đầu tiên (header CSV / gzip header) đi ra trước khi truy vấn chạy
+    yield encode(formatter.header(), flush=True)
+    async with session_factory() as db:
+        result = await db.stream(stmt.execution_options(yield_per=yield_per))
+        async for partition in result.partitions():
+            yield encode(formatter.rows(partition), flush=True)
+            EXPORT_ROWS.inc(export_name, export_format, amount=len(partition))
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def export_response(stream: AsyncIterator[bytes], filename: str, export_format: str, compress: bool) -> StreamingResponse:
+    """StreamingResponse with a download filename (`.gz` file when compressed)."""
+    filename = f"{filename}.{export_format}"
+    media_type = EXPORT_MEDIA_TYPES[export_format]
+    if compress:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import random
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from .config import settings
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------------------
+# External CA client (Viettel-CA, VNPT-CA, FPT-CA)
+# -----------------------------------------------------------------------
+# Mỗi provider có: một httpx.AsyncClient (pool + keep-alive), semaphore giới
+# hạn số request đồng thời, timeout, retry với jittered backoff và circuit
+# breaker. CA chậm/chết chỉ làm request ký EXTERNAL thất bại nhanh (503),
+# không giữ worker API.
+
+EXTERNAL_CA_REQUESTS = registry.counter(
+    "external_ca_requests_total", "Requests sent to external CA providers.", ("provider", "outcome")
+)
+EXTERNAL_CA_LATENCY = registry.histogram(
+    "external_ca_request_duration_seconds", "External CA request latency (incl. retries).", ("provider",)
+)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class ExternalCAError(Exception):
+    pass
+
+
+class CircuitOpenError(ExternalCAError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    CLOSED -> OPEN sau `failure_threshold` lỗi liên tiếp; OPEN từ chối ngay
+    trong `reset_timeout` giây; sau đó HALF_OPEN cho một request thử:
+    thành công -> CLOSED, thất bại -> OPEN lại.
+    """
+    CLOSED, OPEN, HALF_OPEN = "CLOSED", "OPEN", "HALF_OPEN"
+
+    def __init__(self, failure_threshold: int = settings.EXTERNAL_CA_BREAKER_THRESHOLD,
+                 reset_timeout: float = settings.EXTERNAL_CA_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Request bị hủy (client ngắt, timeout phía ta): không phải lỗi của CA, chỉ trả lượt thử HALF_OPEN."""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class CAProvider:
+    def __init__(self, name: str, base_url: str, api_key: str = settings.EXTERNAL_CA_API_KEY,
+                 max_concurrency: int = settings.EXTERNAL_CA_MAX_CONCURRENCY,
+                 timeout: float = settings.EXTERNAL_CA_TIMEOUT_SECONDS):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.breaker = CircuitBreaker()
+        self.max_concurrency = max_concurrency
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"} if self.api_key else None,
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 3.0)),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class ExternalCAClient:
+    def __init__(self, providers: Dict[str, str] = settings.EXTERNAL_CA_PROVIDERS,
+                 max_retries: int = settings.EXTERNAL_CA_MAX_RETRIES,
+                 backoff_base: float = settings.EXTERNAL_CA_BACKOFF_BASE_SECONDS,
+                 backoff_max: float = settings.EXTERNAL_CA_BACKOFF_MAX_SECONDS):
+        self.providers = {name: CAProvider(name, url) for name, url in providers.items()}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: tránh mọi worker retry cùng lúc vào CA đang quá tải
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def post(self, provider_name: str, path: str, payload: Dict[str, Any], idempotency_key: str) -> Dict[str, Any]:
+        provider = self.providers.get(provider_name)
+        if provider is None:
+            raise ExternalCAError(f"Unknown CA provider: {provider_name}")
+
+        start = time.perf_counter()
+        try:
+            for attempt in range(self.max_retries + 1):
+                if not provider.breaker.allow():
+                    EXTERNAL_CA_REQUESTS.inc(provider_name, "circuit_open")
+                    raise CircuitOpenError(f"{provider_name} circuit open")
+                try:
+                    async with provider.semaphore:
+                        # Idempotency-Key: CA trả lại cùng kết quả nếu request bị gửi lại
+                        response = await provider.client.post(
+                            path, json=payload, headers={"Idempotency-Key": idempotency_key}
+                        )
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    error = f"{type(e).__name__}: {e}"
+                except asyncio.CancelledError:
+                    # Không để probe HALF_OPEN treo mãi, nhưng cũng không tính là CA lỗi
+                    provider.breaker.release_probe()
+                    raise
+                except BaseException:
+                    provider.breaker.record_failure()
+                    raise
+                else:
+                    if response.status_code < 400:
+                        provider.breaker.record_success()
+                        EXTERNAL_CA_REQUESTS.inc(provider_name, "ok")
+                        try:
+                            return response.json()
+                        except ValueError:
+                            raise ExternalCAError(f"{provider_name} -> {response.status_code}: body không phải JSON")
+                    if response.status_code not in RETRYABLE_STATUS:
+                        # Lỗi nghiệp vụ (4xx): CA vẫn sống, không tính vào breaker
+                        provider.breaker.record_success()
+                        EXTERNAL_CA_REQUESTS.inc(provider_name, "rejected")
+                        raise ExternalCAError(f"{provider_name} -> {response.status_code}: {response.text[:200]}")
+                    error = f"HTTP {response.status_code}"
+
+                provider.breaker.record_failure()
+                EXTERNAL_CA_REQUESTS.inc(provider_name, "retry" if attempt < self.max_retries else "failed")
+                logger.info(f"External CA {provider_name} attempt {attempt + 1} failed: {error}")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self._backoff(attempt))
+            raise ExternalCAError(f"{provider_name} unavailable after {self.max_retries + 1} attempts: {error}")
+        finally:
+            EXTERNAL_CA_LATENCY.observe(time.perf_counter() - start, provider_name)
+
+    async def aclose(self) -> None:
+        for provider in self.providers.values():
+            await provider.aclose()
+
+
+# -----------------------------------------------------------------------
+# Callback authentication
+# -----------------------------------------------------------------------
+CALLBACK_SIGNATURE_HEADER = "X-CA-Signature"
+
+
+def sign_callback(body: bytes, secret: str = settings.EXTERNAL_CA_CALLBACK_SECRET) -> str:
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_callback_signature(body: bytes, signature: Optional[str],
+                              secret: str = settings.EXTERNAL_CA_CALLBACK_SECRET) -> bool:
+    if not secret or not signature:
+        return False
+    return hmac.compare_digest(signature, sign_callback(body, secret))
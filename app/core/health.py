@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# A check returns None when healthy, or raises / returns an error description.
+CheckFunc = Callable[[], Awaitable[Optional[str]]]
+
+
+class ReadinessMonitor:
+    """
+    Runs dependency checks in the background and serves cached results.
+
+    Probes only read the last snapshot, so /readyz traffic never reaches
+    PostgreSQL or the disk; the refresh loop runs every `interval` seconds
+    regardless of probe frequency.
+    """
+
+    def __init__(
+        self,
+        interval: float = settings.HEALTH_CHECK_INTERVAL_SECONDS,
+        timeout: float = settings.HEALTH_CHECK_TIMEOUT_SECONDS,
+        max_staleness: float = settings.HEALTH_MAX_STALENESS_SECONDS,
+    ):
+        self.interval = interval
+        self.timeout = timeout
+        self.max_staleness = max_staleness
+        self._checks: Dict[str, CheckFunc] = {}
+        self._results: Dict[str, dict] = {}
+        self._checked_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, func: CheckFunc) -> None:
+        self._checks[name] = func
+
+    async def _run_check(self, name: str, func: CheckFunc) -> Tuple[str, dict]:
+        start = time.perf_counter()
+        try:
+            error = await asyncio.wait_for(func(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            error = f"timeout after {self.timeout}s"
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+        return name, {
+            "ok": error is None,
+            "detail": error,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+
+    async def refresh(self) -> None:
+        results = await asyncio.gather(*(self._run_check(n, f) for n, f in self._checks.items()))
+        self._results = dict(results)
+        self._checked_at = time.monotonic()
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Readiness refresh failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Tuple[bool, dict]:
+        """(ready, payload) from the cached results."""
+        if self._checked_at is None:
+            return False, {"status": "starting", "checks": {}}
+
+        age = time.monotonic() - self._checked_at
+        stale = age > self.max_staleness
+        ready = not stale and all(r["ok"] for r in self._results.values())
+        return ready, {
+            "status": "ok" if ready else ("stale" if stale else "unavailable"),
+            "age_seconds": round(age, 2),
+            "checks": self._results,
+        }
+
+
+# -----------------------------------------------------------------------
+# Dependency checks
+# -----------------------------------------------------------------------
+async def check_database() -> Optional[str]:
+    from sqlalchemy import text
+
+    from ..db.database import engine
+
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    return None
+
+
+def _probe_storage_dir(path: str) -> Optional[str]:
+    os.makedirs(path, exist_ok=True)
+    probe = os.path.join(path, f".readyz-{uuid.uuid4().hex}")
+    with open(probe, "wb") as f:
+        f.write(b"ok")
+    os.remove(probe)
+    return None
+
+
+async def check_storage() -> Optional[str]:
+    if settings.STORAGE_TYPE != "LOCAL":
+        return None
+    return await asyncio.to_thread(_probe_storage_dir, settings.LOCAL_STORAGE_DIR)
+
+
+async def check_signing_key() -> Optional[str]:
+    from .signing import internal_signer
+
+    # RemoteSigner hỏi signing daemon qua client async (metadata cache theo TTL)
+    if not await internal_signer.adescribe():
+        return "internal signing key not loaded"
+    return None
+
+
+readiness_monitor = ReadinessMonitor()
+readiness_monitor.register("database", check_database)
+readiness_monitor.register("storage", check_storage)
+readiness_monitor.register("signing_key", check_signing_key)
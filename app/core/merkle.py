@@ -0,0 +1,75 @@
+import hashlib
+from typing import List, Sequence, Tuple
+
+# -----------------------------------------------------------------------
+# Merkle tree primitives
+# -----------------------------------------------------------------------
+# Domain separation 0x00 (leaf) / 0x01 (node) as in RFC 6962, so a leaf can
+# never be passed off as an inner node. An odd node at the end of a level is
+# promoted unchanged to the next level.
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+DIGEST_SIZE = 32
+
+# Proof step: (sibling is on the left, sibling hash)
+ProofStep = Tuple[bool, bytes]
+
+
+def hash_leaf(data: bytes) -> bytes:
+    return hashlib.sha256(LEAF_PREFIX + data).digest()
+
+
+def hash_node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def _next_level(level: List[bytes]) -> List[bytes]:
+    next_level = [hash_node(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+    if len(level) % 2:
+        next_level.append(level[-1])
+    return next_level
+
+
+def merkle_root(leaves: Sequence[bytes]) -> bytes:
+    """Root of a list of leaf hashes."""
+    if not leaves:
+        return hash_leaf(b"")
+    level = list(leaves)
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0]
+
+
+def merkle_proofs(leaves: Sequence[bytes]) -> Tuple[bytes, List[List[ProofStep]]]:
+    """Root and the inclusion proof of every leaf, built in a single pass."""
+    if not leaves:
+        raise ValueError("Cannot build proofs for an empty tree")
+    proofs: List[List[ProofStep]] = [[] for _ in leaves]
+    # Vị trí hiện tại của từng leaf ở tầng đang xét
+    positions = list(range(len(leaves)))
+    level = list(leaves)
+    while len(level) > 1:
+        for leaf_index, pos in enumerate(positions):
+            sibling = pos ^ 1
+            if sibling < len(level):
+                proofs[leaf_index].append((sibling < pos, level[sibling]))
+            positions[leaf_index] = pos // 2
+        level = _next_level(level)
+    return level[0], proofs
+
+
+def root_from_proof(leaf: bytes, proof: Sequence[ProofStep]) -> bytes:
+    node = leaf
+    for sibling_is_left, sibling in proof:
+        node = hash_node(sibling, node) if sibling_is_left else hash_node(node, sibling)
+    return node
+
+
+def encode_proof(proof: Sequence[ProofStep]) -> List[str]:
+    """JSON-friendly form: "L:<hex>" / "R:<hex>"."""
+    return [("L:" if left else "R:") + sibling.hex() for left, sibling in proof]
+
+
+def decode_proof(encoded: Sequence[str]) -> List[ProofStep]:
+    return [(item[0] == "L", bytes.fromhex(item[2:])) for item in encoded]
@@ -0,0 +1,266 @@
+import functools
+import hashlib
+import hmac
+import inspect
+import json
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from .config import settings
+
+# -----------------------------------------------------------------------
+# Request-scoped profiler
+# -----------------------------------------------------------------------
+# Opt-in per request: the client sends a signed token in the
+# `X-Profile-Token` header (or the `profile_token` cookie issued to admins).
+# When no profile is active every hook below is a single ContextVar lookup.
+
+PROFILE_HEADER = b"x-profile-token"
+PROFILE_COOKIE = "profile_token"
+TRACE_URL_PREFIX = "/_profiler"
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.sql: List[dict] = []
+        self.spans: List[dict] = []
+        self.status_code: Optional[int] = None
+        self.duration_ms: Optional[float] = None
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def add_sql(self, statement: str, duration: float) -> None:
+        self.sql.append({
+            "statement": statement,
+            "duration_ms": round(duration * 1000, 3),
+            "at_ms": round(self.elapsed_ms(), 3),
+        })
+
+    def add_span(self, category: str, name: str, start: float, duration: float) -> None:
+        self.spans.append({
+            "category": category,
+            "name": name,
+            "start_ms": round((start - self._start) * 1000, 3),
+            "duration_ms": round(duration * 1000, 3),
+        })
+
+    def server_timing(self) -> str:
+        """Server-Timing header value aggregated per category."""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            totals[span["category"]] = totals.get(span["category"], 0.0) + span["duration_ms"]
+        entries = [f'sql;dur={sum(q["duration_ms"] for q in self.sql):.2f};desc="{len(self.sql)} queries"']
+        entries += [f"{category};dur={total:.2f}" for category, total in totals.items()]
+        entries.append(f"total;dur={self.elapsed_ms():.2f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at,
+            "status_code": self.status_code,
+            "duration_ms": self.duration_ms,
+            "sql_count": len(self.sql),
+            "sql_total_ms": round(sum(q["duration_ms"] for q in self.sql), 3),
+            "sql": self.sql,
+            "spans": self.spans,
+        }
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+
+class TraceStore:
+    """Bounded in-memory store of the most recent traces."""
+
+    def __init__(self, max_traces: int = settings.PROFILER_MAX_TRACES):
+        self.max_traces = max_traces
+        self._traces: "OrderedDict[str, dict]" = OrderedDict()
+
+    def put(self, profile: RequestProfile) -> None:
+        self._traces[profile.id] = profile.to_dict()
+        while len(self._traces) > self.max_traces:
+            self._traces.popitem(last=False)
+
+    def get(self, trace_id: str) -> Optional[dict]:
+        return self._traces.get(trace_id)
+
+
+trace_store = TraceStore()
+
+
+# -----------------------------------------------------------------------
+# Tokens
+# -----------------------------------------------------------------------
+def _signature(expires: str) -> str:
+    return hmac.new(settings.PROFILER_SECRET_KEY.encode(), expires.encode(), hashlib.sha256).hexdigest()
+
+
+def create_profile_token(ttl_seconds: int = 3600) -> str:
+    """Token `<expires>.<hmac>` to send in X-Profile-Token or the admin cookie."""
+    expires = str(int(time.time()) + ttl_seconds)
+    return f"{expires}.{_signature(expires)}"
+
+
+def verify_profile_token(token: Optional[str]) -> bool:
+    if not token or not settings.PROFILER_SECRET_KEY:
+        return False
+    expires, _, signature = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _signature(expires))
+
+
+# -----------------------------------------------------------------------
+# Hooks
+# -----------------------------------------------------------------------
+@contextmanager
+def profile_span(category: str, name: str):
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_span(category, name, start, time.perf_counter() - start)
+
+
+def profiled(category: str, name: Optional[str] = None):
+    """
+    Decorator recording a span (dependency, service call...) for sync or async
+    functions when the current request is being profiled.
+    """
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_profile.get() is None:
+                    return await func(*args, **kwargs)
+                with profile_span(category, span_name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_profile.get() is None:
+                return func(*args, **kwargs)
+            with profile_span(category, span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_engine(sync_engine) -> None:
+    """Record every SQL statement and its duration for profiled requests."""
+    from sqlalchemy import event
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current_profile.get() is not None:
+            conn.info.setdefault("profile_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = _current_profile.get()
+        if profile is not None and conn.info.get("profile_start_time"):
+            profile.add_sql(statement, time.perf_counter() - conn.info["profile_start_time"].pop())
+
+
+def instrument_templates(env) -> None:
+    """Wrap Jinja2 rendering of an environment with a `template` span."""
+    base = env.template_class
+
+    class ProfiledTemplate(base):
+        def render(self, *args, **kwargs):
+            if _current_profile.get() is None:
+                return super().render(*args, **kwargs)
+            with profile_span("template", self.name or "<string>"):
+                return super().render(*args, **kwargs)
+
+    env.template_class = ProfiledTemplate
+
+
+# -----------------------------------------------------------------------
+# Middleware
+# -----------------------------------------------------------------------
+def _request_token(scope) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == PROFILE_HEADER:
+            return value.decode("latin-1")
+        if key == b"cookie" and PROFILE_COOKIE.encode() in value:
+            for part in value.decode("latin-1").split(";"):
+                name, _, token = part.strip().partition("=")
+                if name == PROFILE_COOKIE:
+                    return token
+    return None
+
+
+class ProfilerMiddleware:
+    """
+    Pure ASGI middleware: when a request carries a valid profile token,
+    collects SQL statements and spans, adds `Server-Timing` and
+    `X-Profile-Trace` (download URL of the JSON trace) response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.PROFILER_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["path"].startswith(TRACE_URL_PREFIX) or not verify_profile_token(_request_token(scope)):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", profile.server_timing().encode("latin-1")))
+                headers.append((b"x-profile-trace", f"{TRACE_URL_PREFIX}/{profile.id}".encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            profile.duration_ms = round(profile.elapsed_ms(), 3)
+            trace_store.put(profile)
+
+
+def trace_json(trace_id: str) -> Optional[bytes]:
+    trace = trace_store.get(trace_id)
+    if trace is None:
+        return None
+    return json.dumps(trace, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+if __name__ == "__main__":
+    # Cấp token cho admin: python -m app.core.profiler
+    print(create_profile_token())
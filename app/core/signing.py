@@ -0,0 +1,387 @@
+import argparse
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, padding, rsa
+
+from .config import settings
+from .external_ca import ExternalCAClient
+from .merkle import ProofStep, hash_leaf, merkle_proofs, root_from_proof
+from .metrics import SIGN_BATCH_SIZE, SIGN_LATENCY
+from .profiler import profiled
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------------------------------------------------------
+# 0. Thuật toán chữ ký (chọn theo loại khóa)
+# -----------------------------------------------------------------------
+class SignatureAlgorithm:
+    """
+    Một thuật toán ký trên hash tài liệu (32 byte). Thuật toán được xác định
+    bởi loại khóa, nên mỗi khóa trong registry mang theo algorithm của nó.
+    """
+    name = ""
+
+    def matches(self, key) -> bool:
+        raise NotImplementedError
+
+    def generate_private_key(self):
+        raise NotImplementedError
+
+    def sign(self, private_key, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def verify(self, public_key, signature: bytes, data: bytes) -> None:
+        """Raise InvalidSignature nếu sai."""
+        raise NotImplementedError
+
+
+class RSAPSSAlgorithm(SignatureAlgorithm):
+    """RSA-PSS / SHA-256: dùng cho chữ ký pháp lý."""
+    name = "RSA_PSS_SHA256"
+    _padding = padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH)
+
+    def matches(self, key) -> bool:
+        return isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey))
+
+    def generate_private_key(self):
+        return rsa.generate_private_key(public_exponent=65537, key_size=3072)
+
+    def sign(self, private_key, data: bytes) -> bytes:
+        return private_key.sign(data, self._padding, hashes.SHA256())
+
+    def verify(self, public_key, signature: bytes, data: bytes) -> None:
+        public_key.verify(signature, data, self._padding, hashes.SHA256())
+
+
+class Ed25519Algorithm(SignatureAlgorithm):
+    """Ed25519: ký nhanh hơn RSA nhiều lần, phù hợp chữ ký nháy nội bộ."""
+    name = "ED25519"
+
+    def matches(self, key) -> bool:
+        return isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey))
+
+    def generate_private_key(self):
+        return ed25519.Ed25519PrivateKey.generate()
+
+    def sign(self, private_key, data: bytes) -> bytes:
+        return private_key.sign(data)
+
+    def verify(self, public_key, signature: bytes, data: bytes) -> None:
+        public_key.verify(signature, data)
+
+
+class ECDSAP256Algorithm(SignatureAlgorithm):
+    """ECDSA P-256 / SHA-256 (chữ ký DER)."""
+    name = "ECDSA_P256_SHA256"
+
+    def matches(self, key) -> bool:
+        return isinstance(key, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)) \
+            and isinstance(key.curve, ec.SECP256R1)
+
+    def generate_private_key(self):
+        return ec.generate_private_key(ec.SECP256R1())
+
+    def sign(self, private_key, data: bytes) -> bytes:
+        return private_key.sign(data, ec.ECDSA(hashes.SHA256()))
+
+    def verify(self, public_key, signature: bytes, data: bytes) -> None:
+        public_key.verify(signature, data, ec.ECDSA(hashes.SHA256()))
+
+
+ALGORITHMS: Dict[str, SignatureAlgorithm] = {
+    algorithm.name: algorithm for algorithm in (RSAPSSAlgorithm(), Ed25519Algorithm(), ECDSAP256Algorithm())
+}
+
+
+def algorithm_for_key(key) -> SignatureAlgorithm:
+    for algorithm in ALGORITHMS.values():
+        if algorithm.matches(key):
+            return algorithm
+    raise ValueError(f"Loại khóa không được hỗ trợ: {type(key).__name__}")
+
+
+# -----------------------------------------------------------------------
+# 1. Ký số Nội bộ (Internal)
+# -----------------------------------------------------------------------
+class InternalSigner:
+    """
+    Xử lý Ký số Nội bộ. Thuật toán theo loại khóa được nạp
+    (RSA-PSS, Ed25519 hoặc ECDSA P-256).
+    Private Key được tải một lần khi khởi tạo (hoặc khi xoay vòng key).
+    `purpose`: FINAL (chữ ký pháp lý của Manager) hoặc INITIAL (ký nháy).
+    """
+
+    def __init__(self, key_path: str = settings.INTERNAL_PRIVATE_KEY_PATH, purpose: str = "FINAL",
+                 password: str = settings.INTERNAL_PRIVATE_KEY_PASSWORD):
+        self.purpose = purpose
+        self.private_key = None
+        self._algorithm: Optional[SignatureAlgorithm] = None
+        self.load_key(key_path, password)
+
+    @property
+    def algorithm(self) -> str:
+        return self._algorithm.name if self._algorithm else ""
+
+    @property
+    def available(self) -> bool:
+        return self.private_key is not None
+
+    def load_key(self, key_path: str, password: Optional[str] = None) -> bool:
+        password = (password or "").encode() or None
+        try:
+            with open(key_path, "rb") as key_file:
+                private_key = serialization.load_pem_private_key(key_file.read(), password=password)
+        except FileNotFoundError:
+            logger.warning(f"Không tìm thấy key tại {key_path}. Cần tạo key.")
+            return False
+        self._algorithm = algorithm_for_key(private_key)
+        self.private_key = private_key
+        return True
+
+    @profiled("crypto", "InternalSigner.sign_hash")
+    def sign_hash(self, data_hash: str) -> bytes:
+        """Ký trên SHA-256 Hash của file (Không ký trực tiếp lên file)"""
+        if not self.private_key:
+            raise RuntimeError("Internal Private Key chưa được tải hoặc không tồn tại.")
+
+        start = time.perf_counter()
+        signature = self._algorithm.sign(self.private_key, bytes.fromhex(data_hash))
+        SIGN_LATENCY.observe(time.perf_counter() - start, self._algorithm.name)
+        return signature
+
+    async def asign_hash(self, data_hash: str) -> bytes:
+        """sign_hash ngoài event loop (cùng giao diện với RemoteSigner)."""
+        return await asyncio.to_thread(self.sign_hash, data_hash)
+
+    async def asign_hash_with_fingerprint(self, data_hash: str) -> Tuple[bytes, str]:
+        """Chữ ký kèm fingerprint của khóa đã ký (key_id suy ra từ khóa thực sự dùng)."""
+        return await self.asign_hash(data_hash), self.get_fingerprint()
+
+    def describe(self) -> Dict[str, str]:
+        """Metadata của khóa đang dùng (rỗng nếu chưa nạp khóa), cùng dạng OP_INFO của signing daemon."""
+        if not self.private_key:
+            return {}
+        return {
+            "purpose": self.purpose,
+            "algorithm": self.algorithm,
+            "fingerprint": self.get_fingerprint(),
+            "public_key_pem": self.get_public_key(),
+        }
+
+    async def adescribe(self, refresh: bool = False) -> Dict[str, str]:
+        return self.describe()
+
+    def get_public_key(self) -> str:
+        """Trích xuất Public Key (PEM) để lưu vào DB và phục vụ cho việc Verify"""
+        if not self.private_key:
+            return ""
+
+        pem = self.private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        return pem.decode("utf-8")
+
+    def get_fingerprint(self) -> str:
+        """Fingerprint của key đang dùng (xem public_key_fingerprint)."""
+        if not self.private_key:
+            return ""
+        return public_key_fingerprint(self.private_key.public_key())
+
+
+# -----------------------------------------------------------------------
+# 1b. Ký theo lô (Merkle-batched)
+# -----------------------------------------------------------------------
+@dataclass
+class BatchSignature:
+    """Chữ ký trên Merkle root của lô + inclusion proof của một hash trong lô."""
+    signature: bytes
+    root: str                 # hex
+    proof: List[ProofStep]
+    batch_size: int
+    fingerprint: str          # khóa đã ký root
+
+
+class BatchSigner:
+    """
+    Gom các yêu cầu ký trong `window_ms` (hoặc đến khi đủ `max_size`),
+    dựng Merkle tree trên các hash, ký root bằng một phép RSA duy nhất và
+    trả về cho từng caller chữ ký chung kèm inclusion proof riêng.
+    """
+
+    def __init__(self, signer, window_ms: int = settings.SIGN_BATCH_WINDOW_MS,
+                 max_size: int = settings.SIGN_BATCH_MAX_SIZE):
+        self.signer = signer
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def sign(self, data_hash: str) -> BatchSignature:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((data_hash, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._sign_batch(batch))
+
+    async def _sign_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        try:
+            leaves = [hash_leaf(bytes.fromhex(data_hash)) for data_hash, _ in batch]
+            root, proofs = merkle_proofs(leaves)
+            # Phép RSA chạy ngoài event loop (thread hoặc signing daemon)
+            signature, fingerprint = await self.signer.asign_hash_with_fingerprint(root.hex())
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        SIGN_BATCH_SIZE.observe(len(batch))
+        for (_, future), proof in zip(batch, proofs):
+            if not future.done():
+                future.set_result(BatchSignature(signature, root.hex(), proof, len(batch), fingerprint))
+
+
+# -----------------------------------------------------------------------
+# 2. Ký số Bên ngoài (External CA)
+# -----------------------------------------------------------------------
+class ExternalCAService:
+    """
+    Tích hợp với Viettel-CA, VNPT-CA, FPT-CA qua ExternalCAClient
+    (pool, giới hạn đồng thời, retry, circuit breaker). Kết quả ký được CA
+    gửi về bất đồng bộ qua callback, khớp theo `external_request_id`.
+    """
+
+    def __init__(self, client: Optional[ExternalCAClient] = None):
+        self.client = client or ExternalCAClient()
+
+    async def request_external_sign(self, document_version: Any, signer: Any,
+                                    external_request_id: Optional[str] = None,
+                                    provider: str = settings.EXTERNAL_CA_DEFAULT_PROVIDER) -> Dict[str, Any]:
+        """
+        Gửi yêu cầu Ký số tới dịch vụ CA bên ngoài.
+        `external_request_id` đồng thời là Idempotency-Key: gửi lại an toàn.
+        """
+        external_request_id = external_request_id or str(uuid.uuid4())
+        payload = {
+            "request_id": external_request_id,
+            "document_hash": document_version.file_hash,
+            "hash_algorithm": "SHA-256",
+            "file_name": document_version.file_name,
+            "signer": {"id": str(signer.id), "email": getattr(signer, "email", None)},
+            "callback_url": f"{settings.EXTERNAL_CA_CALLBACK_BASE_URL}{settings.API_V1_STR}/external-ca/callback/{provider}",
+        }
+        response = await self.client.post(provider, "/sign-requests", payload, idempotency_key=external_request_id)
+        return {
+            "status": response.get("status", "REQUESTED"),
+            "external_request_id": external_request_id,
+            "provider_reference": response.get("reference"),
+            "ca_service": provider,
+        }
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+# -----------------------------------------------------------------------
+# 3. Helper
+# -----------------------------------------------------------------------
+def load_public_key(public_key_pem: str):
+    return serialization.load_pem_public_key(public_key_pem.encode("utf-8"))
+
+
+def public_key_fingerprint(public_key) -> str:
+    """SHA-256 (hex) của SubjectPublicKeyInfo DER: định danh ổn định của một key."""
+    der = public_key.public_bytes(
+        encoding=serialization.Encoding.DER,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    return hashlib.sha256(der).hexdigest()
+
+
+def generate_private_key_pem(algorithm_name: str, password: Optional[str] = None) -> bytes:
+    private_key = ALGORITHMS[algorithm_name].generate_private_key()
+    encryption = serialization.BestAvailableEncryption(password.encode()) if password \
+        else serialization.NoEncryption()
+    return private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, encryption)
+
+
+def verify_signature(data_hash: str, signature: bytes, public_key) -> bool:
+    """
+    Xác minh chữ ký trên hash của tài liệu, thuật toán chọn theo loại khóa.
+    `public_key`: key đã parse (cache của key registry) hoặc chuỗi PEM.
+    """
+    try:
+        if isinstance(public_key, str):
+            public_key = load_public_key(public_key)
+        algorithm_for_key(public_key).verify(public_key, signature, bytes.fromhex(data_hash))
+        return True
+    except Exception as e:
+        logger.info(f"Xác minh chữ ký thất bại: {e}")
+        return False
+
+
+def verify_batch_signature(data_hash: str, signature: bytes, public_key,
+                           root: str, proof: Sequence[ProofStep]) -> bool:
+    """
+    Xác minh chữ ký theo lô: hash tài liệu + proof phải dựng lại đúng root,
+    và chữ ký phải hợp lệ trên root đó.
+    """
+    try:
+        if root_from_proof(hash_leaf(bytes.fromhex(data_hash)), proof).hex() != root:
+            return False
+    except ValueError:
+        return False
+    return verify_signature(root, signature, public_key)
+
+
+if settings.SIGNING_DAEMON_SOCKET:
+    # Private key chỉ nằm trong signing daemon (python -m app.core.signing_daemon)
+    from .signing_daemon import RemoteSigner
+
+    internal_signer = RemoteSigner(settings.SIGNING_DAEMON_SOCKET, "FINAL")
+    initial_signer = RemoteSigner(settings.SIGNING_DAEMON_SOCKET, "INITIAL")
+else:
+    internal_signer = InternalSigner()
+    # Ký nháy (không yêu cầu pháp lý): nên dùng khóa Ed25519; chưa cấu hình thì dùng chung khóa FINAL
+    initial_signer = InternalSigner(settings.INITIAL_PRIVATE_KEY_PATH, purpose="INITIAL",
+                                    password=settings.INITIAL_PRIVATE_KEY_PASSWORD)
+batch_signer = BatchSigner(internal_signer)
+external_ca_service = ExternalCAService()
+
+
+def get_signer(purpose: str = "FINAL") -> InternalSigner:
+    if purpose == "INITIAL" and initial_signer.available:
+        return initial_signer
+    return internal_signer
+
+
+if __name__ == "__main__":
+    # Tạo khóa: python -m app.core.signing ED25519 keys/initial_signing_private.pem
+    parser = argparse.ArgumentParser(description="Generate an internal signing key")
+    parser.add_argument("algorithm", choices=sorted(ALGORITHMS))
+    parser.add_argument("path")
+    parser.add_argument("--password")
+    args = parser.parse_args()
+    with open(args.path, "wb") as key_file:
+        key_file.write(generate_private_key_pem(args.algorithm, args.password))
+    print(f"{args.algorithm} key written to {args.path}")
@@ -0,0 +1,348 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import socket
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------------------
+# Wire protocol (Unix socket, big-endian, fixed-size request)
+# -----------------------------------------------------------------------
+# Request : request_id u32 | op u8 | purpose u8 | digest 32 bytes
+# Response: request_id u32 | status u8 | length u32 | payload
+# OP_SIGN payload: key fingerprint (64 hex chars) | signature, so the caller
+# knows which key actually signed even if the daemon restarted with a new one.
+# Requests are multiplexed on one connection; responses may arrive out of order.
+
+REQUEST = struct.Struct(">IBB32s")
+RESPONSE_HEADER = struct.Struct(">IBI")
+
+OP_SIGN = 1
+OP_INFO = 2
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+PURPOSES = {"FINAL": 0, "INITIAL": 1}
+PURPOSE_NAMES = {code: name for name, code in PURPOSES.items()}
+
+EMPTY_DIGEST = b"\x00" * 32
+FINGERPRINT_SIZE = 64
+# Daemon không trả lời: hỏi lại metadata sau chừng này giây thay vì ở mọi lần gọi
+INFO_RETRY_SECONDS = 5.0
+
+
+class SigningDaemonError(RuntimeError):
+    pass
+
+
+# -----------------------------------------------------------------------
+# Server
+# -----------------------------------------------------------------------
+_worker_signers: Dict[str, object] = {}
+
+
+def _load_signers() -> Dict[str, object]:
+    from .signing import InternalSigner
+
+    signers = {
+        "FINAL": InternalSigner(settings.INTERNAL_PRIVATE_KEY_PATH, "FINAL", settings.INTERNAL_PRIVATE_KEY_PASSWORD),
+        "INITIAL": InternalSigner(settings.INITIAL_PRIVATE_KEY_PATH, "INITIAL", settings.INITIAL_PRIVATE_KEY_PASSWORD),
+    }
+    # Khóa FINAL dùng thay cho INITIAL nếu chưa cấu hình khóa ký nháy riêng
+    if not signers["INITIAL"].available:
+        signers["INITIAL"] = signers["FINAL"]
+    return signers
+
+
+def _init_worker() -> None:
+    global _worker_signers
+    _worker_signers = _load_signers()
+
+
+def _sign_many(purpose: str, digests: List[bytes]) -> List[Tuple[bool, bytes]]:
+    """Runs in a worker process: one IPC round-trip for a whole slice of the batch."""
+    signer = _worker_signers[purpose]
+    fingerprint = signer.get_fingerprint().encode("ascii")
+    results = []
+    for digest in digests:
+        try:
+            results.append((True, fingerprint + signer.sign_hash(digest.hex())))
+        except Exception as e:
+            results.append((False, str(e).encode("utf-8")))
+    return results
+
+
+class SigningDaemon:
+    """
+    Holds the private keys and signs digests for the API workers.
+    Concurrent requests (from every connection) are drained from one queue
+    into batches, and each batch is split across a process pool so signing
+    uses all cores without the GIL in the way.
+    """
+
+    def __init__(self, socket_path: str = settings.SIGNING_DAEMON_SOCKET,
+                 workers: int = settings.SIGNING_DAEMON_WORKERS, max_batch: int = settings.SIGNING_DAEMON_MAX_BATCH):
+        self.socket_path = socket_path
+        self.workers = workers
+        self.max_batch = max_batch
+        self.signers = _load_signers()
+        self._queue: "asyncio.Queue[Tuple[str, bytes, asyncio.Future]]" = asyncio.Queue()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(workers * 2)
+
+    def _info(self, purpose: str) -> bytes:
+        info = self.signers[purpose].describe()
+        if not info:
+            raise SigningDaemonError(f"No {purpose} key loaded")
+        return json.dumps(info).encode("utf-8")
+
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            by_purpose: Dict[str, List[Tuple[bytes, asyncio.Future]]] = {}
+            for purpose, digest, future in batch:
+                by_purpose.setdefault(purpose, []).append((digest, future))
+
+            for purpose, items in by_purpose.items():
+                # Chia đều lô cho các worker process
+                size = max(1, -(-len(items) // self.workers))
+                for i in range(0, len(items), size):
+                    await self._slots.acquire()
+                    loop.create_task(self._run_slice(purpose, items[i:i + size]))
+
+    async def _run_slice(self, purpose: str, items: List[Tuple[bytes, asyncio.Future]]) -> None:
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self._pool, _sign_many, purpose, [digest for digest, _ in items]
+            )
+        except Exception as e:
+            results = [(False, str(e).encode("utf-8"))] * len(items)
+        finally:
+            self._slots.release()
+        for (_, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _respond(self, writer: asyncio.StreamWriter, request_id: int, future: asyncio.Future) -> None:
+        ok, payload = await future
+        if not writer.is_closing():
+            writer.write(RESPONSE_HEADER.pack(request_id, STATUS_OK if ok else STATUS_ERROR, len(payload)) + payload)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                request_id, op, purpose_code, digest = REQUEST.unpack(await reader.readexactly(REQUEST.size))
+                purpose = PURPOSE_NAMES.get(purpose_code, "FINAL")
+                if op == OP_SIGN:
+                    future = loop.create_future()
+                    self._queue.put_nowait((purpose, digest, future))
+                    loop.create_task(self._respond(writer, request_id, future))
+                    continue
+                try:
+                    if op != OP_INFO:
+                        raise SigningDaemonError(f"Unknown op {op}")
+                    ok, payload = True, self._info(purpose)
+                except SigningDaemonError as e:
+                    ok, payload = False, str(e).encode("utf-8")
+                writer.write(RESPONSE_HEADER.pack(request_id, STATUS_OK if ok else STATUS_ERROR, len(payload)) + payload)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self) -> None:
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        # Chỉ user chạy API được kết nối
+        os.chmod(self.socket_path, 0o660)
+        dispatcher = asyncio.create_task(self._dispatch())
+        logger.info(f"Signing daemon listening on {self.socket_path} ({self.workers} workers)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            dispatcher.cancel()
+            self._pool.shutdown(cancel_futures=True)
+
+
+# -----------------------------------------------------------------------
+# Client (API workers)
+# -----------------------------------------------------------------------
+class SigningDaemonClient:
+    """One multiplexed connection per event loop, reconnected on failure."""
+
+    def __init__(self, socket_path: str, timeout: float = settings.SIGNING_DAEMON_TIMEOUT_SECONDS):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def _connect(self) -> asyncio.StreamWriter:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._writer is None or self._writer.is_closing():
+                reader, self._writer = await asyncio.open_unix_connection(self.socket_path)
+                self._reader_task = asyncio.get_running_loop().create_task(self._read_loop(reader))
+        return self._writer
+
+    async def _read_loop(self, reader: asyncio.StreamReader) -> None:
+        error = SigningDaemonError("Signing daemon connection closed")
+        try:
+            while True:
+                request_id, status, length = RESPONSE_HEADER.unpack(await reader.readexactly(RESPONSE_HEADER.size))
+                payload = await reader.readexactly(length)
+                future = self._pending.pop(request_id, None)
+                if future is None or future.done():
+                    continue
+                if status == STATUS_OK:
+                    future.set_result(payload)
+                else:
+                    future.set_exception(SigningDaemonError(payload.decode("utf-8", "replace")))
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            error = SigningDaemonError(f"Signing daemon connection lost: {e}")
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+
+    async def request(self, op: int, purpose: str, digest: bytes = EMPTY_DIGEST) -> bytes:
+        writer = await self._connect()
+        request_id = next(self._ids) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        writer.write(REQUEST.pack(request_id, op, PURPOSES[purpose], digest))
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    def request_sync(self, op: int, purpose: str) -> bytes:
+        """Blocking one-shot request (key metadata at startup, outside the event loop)."""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            sock.sendall(REQUEST.pack(0, op, PURPOSES[purpose], EMPTY_DIGEST))
+            header = sock.recv(RESPONSE_HEADER.size, socket.MSG_WAITALL)
+            _, status, length = RESPONSE_HEADER.unpack(header)
+            payload = sock.recv(length, socket.MSG_WAITALL) if length else b""
+        if status != STATUS_OK:
+            raise SigningDaemonError(payload.decode("utf-8", "replace"))
+        return payload
+
+
+class RemoteSigner:
+    """
+    Same surface as InternalSigner, backed by the signing daemon:
+    API workers never load private keys.
+
+    Key metadata is cached for SIGNING_DAEMON_INFO_TTL_SECONDS and dropped as
+    soon as a signature comes back under another fingerprint (daemon restarted
+    with a new key). Coroutines use adescribe(); the sync properties never
+    block a running event loop.
+    """
+
+    def __init__(self, socket_path: str, purpose: str = "FINAL"):
+        self.purpose = purpose
+        self.client = SigningDaemonClient(socket_path)
+        self._info: Dict[str, str] = {}
+        self._info_expires = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def _set_info(self, info: Dict[str, str]) -> Dict[str, str]:
+        self._info = info
+        self._info_expires = time.monotonic() + (settings.SIGNING_DAEMON_INFO_TTL_SECONDS if info else INFO_RETRY_SECONDS)
+        return info
+
+    def _unavailable(self, error: Exception) -> Dict[str, str]:
+        logger.warning(f"Signing daemon unavailable for {self.purpose}: {error}")
+        return self._set_info({})
+
+    async def adescribe(self, refresh: bool = False) -> Dict[str, str]:
+        if not refresh and time.monotonic() < self._info_expires:
+            return self._info
+        try:
+            return self._set_info(json.loads(await self.client.request(OP_INFO, self.purpose)))
+        except (OSError, asyncio.TimeoutError, SigningDaemonError) as e:
+            return self._unavailable(e)
+
+    def describe(self) -> Dict[str, str]:
+        if time.monotonic() < self._info_expires:
+            return self._info
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            # Trong event loop: trả metadata đang có, làm mới ở nền
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = loop.create_task(self.adescribe(refresh=True))
+            return self._info
+        try:
+            return self._set_info(json.loads(self.client.request_sync(OP_INFO, self.purpose)))
+        except (OSError, SigningDaemonError) as e:
+            return self._unavailable(e)
+
+    @property
+    def available(self) -> bool:
+        return bool(self.describe())
+
+    @property
+    def algorithm(self) -> str:
+        return self.describe().get("algorithm", "")
+
+    def get_public_key(self) -> str:
+        return self.describe().get("public_key_pem", "")
+
+    def get_fingerprint(self) -> str:
+        return self.describe().get("fingerprint", "")
+
+    def load_key(self, key_path: str, password: Optional[str] = None) -> bool:
+        raise SigningDaemonError("Keys are held by the signing daemon; restart it with the new key.")
+
+    async def asign_hash_with_fingerprint(self, data_hash: str) -> Tuple[bytes, str]:
+        payload = await self.client.request(OP_SIGN, self.purpose, bytes.fromhex(data_hash))
+        fingerprint = payload[:FINGERPRINT_SIZE].decode("ascii")
+        if fingerprint != self._info.get("fingerprint"):
+            # Daemon đã đổi khóa: metadata cũ không còn đúng
+            self._info_expires = 0.0
+        return payload[FINGERPRINT_SIZE:], fingerprint
+
+    async def asign_hash(self, data_hash: str) -> bytes:
+        signature, _ = await self.asign_hash_with_fingerprint(data_hash)
+        return signature
+
+
+if __name__ == "__main__":
+    # python -m app.core.signing_daemon --socket /run/securedoc/signer.sock
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="SecureDoc signing daemon")
+    parser.add_argument("--socket", default=settings.SIGNING_DAEMON_SOCKET or "/tmp/securedoc-signer.sock")
+    parser.add_argument("--workers", type=int, default=settings.SIGNING_DAEMON_WORKERS)
+    args = parser.parse_args()
+    asyncio.run(SigningDaemon(args.socket, args.workers).serve())
@@ -0,0 +1,176 @@
+import json
+import logging
+from collections import OrderedDict, defaultdict
+from http import HTTPStatus
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Request, status
+from fastapi.responses import HTMLResponse, Response
+from fastapi.templating import Jinja2Templates
+from jinja2 import TemplateNotFound
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+from .config import settings
+from .metrics import registry
+from .profiler import instrument_templates
+from .user_registry import user_registry
+
+logger = logging.getLogger(__name__)
+
+# Global templates (dùng chung cho các trang hệ thống)
+templates = Jinja2Templates(directory="app/template")
+instrument_templates(templates.env)
+
+ERROR_TEMPLATE = "error_page.html"
+
+
+class ErrorRenderer:
+    """
+    Single entry point for rendering HTTP errors.
+
+    - API paths: JSON bodies are serialized once per (status, detail) and reused.
+    - Web paths: the error page is rendered in place (no redirect to /error).
+      Anonymous responses are cached per (status, title, detail); the user is only
+      looked up when the request carries a session cookie.
+    - Every rendered error increments a per-status counter for monitoring.
+    """
+
+    def __init__(self, cache_size: int = settings.ERROR_PAGE_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._json_cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._html_cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self.counters: Dict[int, int] = defaultdict(int)
+
+    # -------------------------------------------------------------------
+    # Helpers
+    # -------------------------------------------------------------------
+    @staticmethod
+    def default_detail(status_code: int) -> str:
+        try:
+            return HTTPStatus(status_code).phrase
+        except ValueError:
+            return "Error"
+
+    @staticmethod
+    def _cached(cache: "OrderedDict[tuple, bytes]", key: tuple) -> Optional[bytes]:
+        body = cache.get(key)
+        if body is not None:
+            cache.move_to_end(key)
+        return body
+
+    def _remember(self, cache: "OrderedDict[tuple, bytes]", key: tuple, body: bytes) -> bytes:
+        # LRU có giới hạn: detail tùy ý không làm cache phình mãi, lỗi hay gặp vẫn nằm trong cache
+        cache[key] = body
+        cache.move_to_end(key)
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return body
+
+    def _json_body(self, status_code: int, detail: str) -> bytes:
+        key = (status_code, detail)
+        body = self._cached(self._json_cache, key)
+        if body is None:
+            body = json.dumps({"detail": detail}, ensure_ascii=False).encode("utf-8")
+            body = self._remember(self._json_cache, key, body)
+        return body
+
+    def _render_html(self, status_code: int, title: str, detail: str, user: Optional[object]) -> bytes:
+        try:
+            template = templates.get_template(ERROR_TEMPLATE)
+            content = template.render(
+                error_message=title,
+                detail=detail,
+                status_code=status_code,
+                user=user,
+                settings=settings,
+            )
+        except TemplateNotFound:
+            content = f"<h1>{title}</h1><p>{detail}</p>"
+        return content.encode("utf-8")
+
+    def snapshot(self) -> Dict[int, int]:
+        """Copy of the per-status error counters."""
+        return dict(self.counters)
+
+    # -------------------------------------------------------------------
+    # Rendering
+    # -------------------------------------------------------------------
+    async def render(
+        self,
+        request: Request,
+        status_code: int,
+        detail: Optional[str] = None,
+        title: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Response:
+        self.counters[status_code] += 1
+
+        if not isinstance(detail, str):
+            # Detail của HTTPException có thể là dict/list (validation...)
+            detail = self.default_detail(status_code) if detail is None else json.dumps(detail, ensure_ascii=False)
+
+        if request.url.path.startswith(settings.API_V1_STR):
+            return Response(
+                content=self._json_body(status_code, detail),
+                status_code=status_code,
+                media_type="application/json",
+                headers=headers,
+            )
+
+        title = title or f"Lỗi {status_code}"
+
+        if settings.SESSION_COOKIE_NAME in request.cookies:
+            # Chỉ tra cứu user khi request có cookie phiên đăng nhập
+            current_user = await user_registry.get_user_from_request(request)
+            if current_user is not None:
+                body = self._render_html(status_code, title, detail, current_user)
+                return HTMLResponse(content=body, status_code=status_code, headers=headers)
+
+        key = (status_code, title, detail)
+        body = self._cached(self._html_cache, key)
+        if body is None:
+            body = self._remember(self._html_cache, key, self._render_html(status_code, title, detail, None))
+
+        return HTMLResponse(content=body, status_code=status_code, headers=headers)
+
+
+error_renderer = ErrorRenderer()
+
+registry.callback(
+    "http_errors_total",
+    "Errors rendered by the exception handlers, per status code.",
+    lambda: {(str(code),): count for code, count in error_renderer.snapshot().items()},
+    labelnames=("status",),
+    type_name="counter",
+)
+
+
+def register_exception_handlers(app: FastAPI) -> None:
+    """
+    Register the HTTP and global exception handlers on the application.
+    """
+
+    @app.exception_handler(StarletteHTTPException)
+    async def http_exception_handler(request: Request, exc: StarletteHTTPException):
+        """
+        Render web errors in place as HTML, API errors as JSON.
+        """
+        return await error_renderer.render(
+            request,
+            status_code=exc.status_code,
+            detail=exc.detail,
+            headers=getattr(exc, "headers", None),
+        )
+
+    @app.exception_handler(Exception)
+    async def global_exception_handler(request: Request, exc: Exception):
+        """
+        Catch all unhandled system errors (500)
+        """
+        logger.error(f"Global Error: {str(exc)}", exc_info=True)
+        return await error_renderer.render(
+            request,
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            title="Lỗi hệ thống",
+            detail="Đã có lỗi xảy ra phía máy chủ. Vui lòng thử lại sau.",
+        )
@@ -0,0 +1,58 @@
+from typing import AsyncGenerator
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from ..core.config import settings
+from ..core import profiler
+from ..core.metrics import instrument_engine
+
+# --- 1. Engine & Session ---
+# `pool_pre_ping=True` kiểm tra kết nối còn sống trước khi sử dụng
+engine = create_async_engine(
+    settings.SQLALCHEMY_DATABASE_URI,
+    pool_pre_ping=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+)
+
+# Đếm số câu lệnh SQL / thời gian thực thi cho /metrics
+instrument_engine(engine.sync_engine)
+# Ghi lại từng câu SQL cho các request đang được profile
+profiler.instrument_engine(engine.sync_engine)
+
+SessionLocal = async_sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+# Read replica (tùy chọn): chỉ dùng qua app.db.routing (get_read_db / read_sessionmaker)
+replica_engine = None
+ReplicaSessionLocal = None
+if settings.DATABASE_REPLICA_URL:
+    replica_engine = create_async_engine(
+        settings.DATABASE_REPLICA_URL,
+        pool_pre_ping=True,
+        pool_size=settings.DB_REPLICA_POOL_SIZE,
+        max_overflow=settings.DB_REPLICA_MAX_OVERFLOW,
+        # Hot standby từ chối ghi; đặt read-only ngay từ transaction để lỗi rõ ràng hơn
+        execution_options={"postgresql_readonly": True},
+    )
+    instrument_engine(replica_engine.sync_engine, pool_prefix="db_replica_pool")
+    profiler.instrument_engine(replica_engine.sync_engine)
+    ReplicaSessionLocal = async_sessionmaker(
+        bind=replica_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+
+# --- 2. Dependency (FastAPI) ---
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Cung cấp một AsyncSession cho mỗi request và đảm bảo Session được đóng.
+    """
+    async with SessionLocal() as session:
+        yield session
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from http.cookies import SimpleCookie
+from typing import AsyncGenerator, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..core.metrics import registry
+from . import database
+
+logger = logging.getLogger(__name__)
+
+DB_REPLICA_LAG = registry.gauge("db_replica_lag_seconds", "Replication lag of the read replica (last check).")
+DB_REPLICA_HEALTHY = registry.gauge("db_replica_healthy", "1 when reads may be routed to the replica.")
+DB_READ_ROUTING = registry.counter("db_read_routing_total", "Read-only sessions by target database.", ("target", "reason"))
+
+PIN_COOKIE = "db_primary_until"
+WROTE_KEY = "routing_wrote"
+
+# Replica không phải standby (vd: hai instance độc lập khi test) -> coi như trễ 0
+LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class _RoutingState:
+    __slots__ = ("pinned", "wrote")
+
+    def __init__(self, pinned: bool):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_routing_state: ContextVar[Optional[_RoutingState]] = ContextVar("db_routing_state", default=None)
+
+
+# -----------------------------------------------------------------------
+# Replica lag
+# -----------------------------------------------------------------------
+class ReplicaLagMonitor:
+    """
+    Polls replication lag on the replica in the background.
+
+    Reads are routed to the replica only while the last check succeeded,
+    is recent and reported lag <= max_lag; otherwise they fall back to the
+    primary. Request handling never waits on the check itself.
+    """
+
+    def __init__(
+        self,
+        interval: float = settings.DB_REPLICA_LAG_CHECK_INTERVAL_SECONDS,
+        max_lag: float = settings.DB_REPLICA_MAX_LAG_SECONDS,
+        timeout: float = settings.HEALTH_CHECK_TIMEOUT_SECONDS,
+    ):
+        self.interval = interval
+        self.max_lag = max_lag
+        self.timeout = timeout
+        self.lag: Optional[float] = None
+        self._checked_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def healthy(self) -> bool:
+        if self.lag is None or self._checked_at is None:
+            return False
+        fresh = time.monotonic() - self._checked_at <= max(3 * self.interval, self.max_lag)
+        return fresh and self.lag <= self.max_lag
+
+    async def _query_lag(self) -> float:
+        async with database.replica_engine.connect() as conn:
+            return float((await conn.execute(LAG_QUERY)).scalar() or 0)
+
+    async def check(self) -> None:
+        try:
+            self.lag = await asyncio.wait_for(self._query_lag(), self.timeout)
+            self._checked_at = time.monotonic()
+            DB_REPLICA_LAG.set(self.lag)
+        except Exception as e:
+            self.lag = None
+            logger.warning(f"Replica lag check failed: {e}")
+        DB_REPLICA_HEALTHY.set(1 if self.healthy else 0)
+
+    async def _loop(self) -> None:
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None and database.replica_engine is not None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if database.replica_engine is not None:
+            await database.replica_engine.dispose()
+
+
+replica_lag_monitor = ReplicaLagMonitor()
+
+
+# -----------------------------------------------------------------------
+# Routing
+# -----------------------------------------------------------------------
+def read_sessionmaker() -> async_sessionmaker:
+    """
+    Session factory for a read-only unit of work: the replica unless it is
+    not configured / lagging, or the current user wrote recently
+    (read-your-writes pin).
+    """
+    if database.ReplicaSessionLocal is None:
+        return database.SessionLocal
+    state = _routing_state.get()
+    if state is not None and (state.pinned or state.wrote):
+        DB_READ_ROUTING.inc("primary", "pinned")
+        return database.SessionLocal
+    if not replica_lag_monitor.healthy:
+        DB_READ_ROUTING.inc("primary", "replica_unhealthy")
+        return database.SessionLocal
+    DB_READ_ROUTING.inc("replica", "ok")
+    return database.ReplicaSessionLocal
+
+
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency cho endpoint chỉ đọc (danh sách, tìm kiếm, báo cáo, export).
+    Không dùng cho luồng ghi: session có thể trỏ tới replica (read-only).
+    """
+    async with read_sessionmaker()() as session:
+        yield session
+
+
+# Ghi nhận transaction có ghi dữ liệu (ORM flush hoặc INSERT/UPDATE/DELETE trực tiếp)
+@event.listens_for(Session, "after_flush")
+def _mark_flush(session: Session, flush_context) -> None:
+    session.info[WROTE_KEY] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_dml(orm_execute_state) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[WROTE_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _pin_after_commit(session: Session) -> None:
+    if session.info.pop(WROTE_KEY, False):
+        state = _routing_state.get()
+        if state is not None:
+            state.wrote = True
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_after_rollback(session: Session) -> None:
+    session.info.pop(WROTE_KEY, None)
+
+
+class ReadRoutingMiddleware:
+    """
+    Pure ASGI middleware carrying the read-your-writes pin.
+
+    A request that commits a write gets a short-lived `db_primary_until`
+    cookie; while it is valid, read-only sessions of that client go to the
+    primary so the user never sees the replica without their own change.
+    """
+
+    def __init__(self, app, pin_seconds: float = settings.DB_PRIMARY_PIN_SECONDS):
+        self.app = app
+        self.pin_seconds = pin_seconds
+
+    @staticmethod
+    def _pinned_until(scope) -> float:
+        for name, value in scope.get("headers", ()):
+            if name == b"cookie":
+                morsel = SimpleCookie(value.decode("latin-1")).get(PIN_COOKIE)
+                if morsel is not None:
+                    try:
+                        return float(morsel.value)
+                    except ValueError:
+                        return 0.0
+        return 0.0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or database.ReplicaSessionLocal is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = _RoutingState(pinned=self._pinned_until(scope) > time.time())
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and state.wrote:
+                until = time.time() + self.pin_seconds
+                cookie = f"{PIN_COOKIE}={until:.3f}; Max-Age={int(self.pin_seconds) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        token = _routing_state.set(state)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _routing_state.reset(token)
@@ -0,0 +1,49 @@
+from enum import Enum
+from typing import Mapping, Optional, Type
+
+from sqlalchemy import SmallInteger
+from sqlalchemy.types import TypeDecorator
+
+
+class SmallIntEnum(TypeDecorator):
+    """
+    Lưu Enum dưới dạng mã smallint (2 byte) thay vì chuỗi tên, model vẫn làm
+    việc với member Enum: `Document.status == DocumentStatus.APPROVED` được
+    bind thành mã số, kết quả đọc ra là member Enum.
+
+    Mã phải ổn định (chỉ thêm mới, không đổi / tái sử dụng mã cũ) vì đã nằm
+    trong dữ liệu.
+    """
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum_class: Type[Enum], codes: Mapping[Enum, int]):
+        super().__init__()
+        missing = [member.name for member in enum_class if member not in codes]
+        if missing:
+            raise ValueError(f"{enum_class.__name__}: thiếu mã cho {', '.join(missing)}")
+        if len(set(codes.values())) != len(codes):
+            raise ValueError(f"{enum_class.__name__}: mã bị trùng")
+        self.enum_class = enum_class
+        # Tuple (hashable) để SQLAlchemy dùng làm cache key của kiểu
+        self.codes = tuple(sorted(((member.value, code) for member, code in codes.items()), key=lambda item: item[1]))
+        self._to_code = {enum_class(value): code for value, code in self.codes}
+        self._from_code = {code: enum_class(value) for value, code in self.codes}
+
+    def process_bind_param(self, value, dialect) -> Optional[int]:
+        if value is None:
+            return None
+        # Chấp nhận cả chuỗi tên ("APPROVED") như khi cột còn là String
+        return self._to_code[self.enum_class(value)]
+
+    def process_literal_param(self, value, dialect) -> str:
+        return str(self.process_bind_param(value, dialect))
+
+    def process_result_value(self, value, dialect) -> Optional[Enum]:
+        if value is None:
+            return None
+        return self._from_code[value]
+
+    @property
+    def python_type(self):
+        return self.enum_class
@@ -1,16 +1,23 @@
 import importlib
 import logging
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator
 # import sentry_sdk
 
-from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse, RedirectResponse, HTMLResponse
-from fastapi.templating import Jinja2Templates
-from starlette.exceptions import HTTPException as StarletteHTTPException
-from typing import Optional
+from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
 
-from .core.config import settings
-from .core.exceptions import NotAuthenticatedWebException
-from .core.user_registry import user_registry
+from .core.health import readiness_monitor
+from .core.metrics import MetricsMiddleware
+from .core.profiler import ProfilerMiddleware
+from .core.signing import external_ca_service
+from .db.routing import ReadRoutingMiddleware, replica_lag_monitor
+from .modules.analytics.rollups import sla_aggregator
+from .modules.documents.pades import pades_embedder, pades_validator
+from .modules.documents.search import search_indexer
+from .modules.documents.storage import storage_service
+from .core.template import register_exception_handlers
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -25,87 +32,44 @@ logger = logging.getLogger(__name__)
 # -----------------------------------------------------------------------
 # APP INITIALIZATION
 # -----------------------------------------------------------------------
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    """
+    Start/stop background services (readiness checks, replica lag, search indexer, SLA rollups, storage client pool).
+    """
+    readiness_monitor.start()
+    replica_lag_monitor.start()
+    search_indexer.start()
+    sla_aggregator.start()
+    yield
+    await sla_aggregator.stop()
+    await search_indexer.stop()
+    await replica_lag_monitor.stop()
+    await readiness_monitor.stop()
+    await storage_service.aclose()
+    await external_ca_service.aclose()
+    await pades_validator.aclose()
+    await pades_embedder.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Static files serving (e.g., CSS, JS, Images)
 app.mount("/static/users", StaticFiles(directory="app/modules/users/static"), name="static_users")
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
-# Initialize global templates variables
-templates = Jinja2Templates(directory="templates")
-# templates = get_templates()
-
+# Per-route latency / in-flight / SQL-per-request metrics (exposed at /metrics)
+app.add_middleware(MetricsMiddleware)
+# Opt-in request profiler (signed X-Profile-Token header / admin cookie)
+app.add_middleware(ProfilerMiddleware)
+# Read-your-writes pin cho read replica (cookie db_primary_until sau khi ghi)
+app.add_middleware(ReadRoutingMiddleware)
 
 # -----------------------------------------------------------------------
 # EXCEPTION HANDLERS
 # -----------------------------------------------------------------------
-@app.exception_handler(StarletteHTTPException)
-async def http_exception_handler(request: Request, exc: StarletteHTTPException):
-    """
-    Redirects web errors to HTML page, API errors to JSON.
-    """
-    # If it's an API request (based on the path), return JSON.
-    if request.url.path.startswith(settings.API_V1_STR):
-        return JSONResponse(
-            status_code=exc.status_code,
-            content={"detail": exc.detail},
-        )
-
-    # If it's a web request, redirect to the error page.
-    # NOTE: Ensure the route 'error_page' exists below.
-    try:
-        base_url = request.url_for("error_page")
-        error_url = f"{base_url}?detail={exc.detail}&status_code={exc.status_code}"
-        return RedirectResponse(url=error_url, status_code=status.HTTP_302_FOUND)
-    except Exception:
-        # Fallback if route error_page has not been loaded
-        return HTMLResponse(
-            status_code=exc.status_code,
-            content=f"<h1>Error {exc.status_code}</h1><p>{exc.detail}</p>",
-        )
-
-
-@app.exception_handler(StarletteHTTPException)
-async def http_exception_handler(request: Request, exc: StarletteHTTPException):
-    """
-    Redirects web errors to HTML page, API errors to JSON.
-    """
-    if exc.status_code == status.HTTP_404_NOT_FOUND and not request.url.path.startswith(settings.API_V1_STR):
-        base_url = request.url_for("error_page")
-        error_url = f"{base_url}?title=Page Not Found&detail=Resource does not exist.&status_code={exc.status_code}"
-        return RedirectResponse(url=error_url, status_code=status.HTTP_302_FOUND)
-
-    return JSONResponse(
-        status_code=exc.status_code,
-        content={"detail": exc.detail},
-    )
-
-
-@app.exception_handler(StarletteHTTPException)
-async def http_exception_handler(request: Request, exc: StarletteHTTPException):
-    """
-    Redirects web errors to HTML page, API errors to JSON.
-    """
-    return await error_page(
-        request=request,
-        error_message=f"Lỗi {exc.status_code}",
-        detail=exc.detail,
-        status_code=exc.status_code,
-    )
-
-
-@app.exception_handler(Exception)
-async def global_exception_handler(request: Request, exc: Exception):
-    """
-    Catch all unhandled system errors (500)
-    """
-    logger.error(f"Global Error: {str(exc)}", exc_info=True)
-    return await error_page(
-        request=request,
-        error_message="Lỗi hệ thống",
-        detail="Đã có lỗi xảy ra phía máy chủ. Vui lòng thử lại sau.",
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-    )
+# API errors -> prebuilt JSON, web errors -> cached error page rendered in place.
+register_exception_handlers(app)
 
 
 def load_modules():
@@ -144,46 +108,3 @@ def load_modules():
             except Exception as e:
                 print(f"❌ Error when registering the module {module_name}: {e}")
 
-
-# -----------------------------------------------------------------------
-# ROUTERS HELPER
-# -----------------------------------------------------------------------
-@app.get("/error", response_class=HTMLResponse, name="error_page")
-async def error_page(
-    request: Request,
-    error_message: str = "An Error Occurred",
-    detail: Optional[str] = "The requested resource could not be loaded.",
-    status_code: int = status.HTTP_500_INTERNAL_SERVER_ERROR,
-    user: Optional[object] = None,
-):
-    """
-    Render a system-wide error page.
-    Required file: app/templates/error_page.html
-    """
-    # 1. Tự động lấy user thông qua Registry
-    # Nếu module Users chưa load hoặc chưa đăng ký, nó trả về None.
-    current_user = await user_registry.get_user_from_request(request)
-
-    return templates.TemplateResponse(
-        request=request,
-        name="error_page.html",
-        context={
-            "error_message": error_message,
-            "detail": detail,
-            "status_code": status_code,
-            "user": current_user,
-            "settings": settings,
-        },
-        status_code=status_code,
-    )
-
-    # return templates.TemplateResponse(
-    #     "error_page.html",
-    #     {
-    #         "request": request,
-    #         "error_message": error_message,
-    #         "detail": detail,
-    #         "user": user,
-    #     },
-    #     status_code=status_code,
-    # )
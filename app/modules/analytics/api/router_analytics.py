@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import HTMLResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ....core.config import settings
+from ....core.template import templates
+from ....db.routing import get_read_db
+from ...users.dependencies import is_manager
+from ..rollups import sla_report
+from ..schemas import SlaDimension, SlaGranularity, SlaMetric, SlaReport, SlaStat
+
+router = APIRouter(prefix=settings.API_V1_STR + "/analytics", tags=["Analytics"])
+
+# Series theo giờ: chặn khoảng thời gian để số bucket trả về có giới hạn
+MAX_HOURLY_RANGE = timedelta(days=31)
+
+
+async def _report(db: AsyncSession, metric: str, granularity: str, dimension: str,
+                  since: Optional[datetime], until: Optional[datetime],
+                  dimension_value: Optional[str], series: bool) -> SlaReport:
+    until = until or datetime.utcnow()
+    since = since or until - timedelta(days=30)
+    if since >= until:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="since phải trước until.")
+    if series and granularity == "hour" and until - since > MAX_HOURLY_RANGE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Series theo giờ tối đa 31 ngày; dùng granularity=day.")
+    items = await sla_report(db, metric, granularity, dimension, since, until,
+                             dimension_value=dimension_value, series=series)
+    return SlaReport(metric=metric, granularity=granularity, dimension=dimension, since=since, until=until,
+                     items=[SlaStat(**item) for item in items])
+
+
+# -----------------------------------------------------------------------
+# ENDPOINT: SLA / THỜI GIAN XỬ LÝ (MANAGER) — chỉ đọc bảng rollup
+# -----------------------------------------------------------------------
+@router.get("/sla", response_model=SlaReport, summary="[MANAGER] Thời gian xử lý theo phòng ban / người duyệt")
+async def get_sla(
+    metric: SlaMetric = Query("submit_to_complete"),
+    dimension: SlaDimension = Query("department"),
+    granularity: SlaGranularity = Query("day", description="Bucket rollup dùng để gộp (hour chính xác biên hơn)"),
+    since: Optional[datetime] = Query(None, description="Mặc định: 30 ngày trước until"),
+    until: Optional[datetime] = Query(None, description="Mặc định: hiện tại"),
+    dimension_value: Optional[str] = Query(None),
+    actor=Depends(is_manager),
+    db: AsyncSession = Depends(get_read_db),
+):
+    return await _report(db, metric, granularity, dimension, since, until, dimension_value, series=False)
+
+
+@router.get("/sla/series", response_model=SlaReport, summary="[MANAGER] Thời gian xử lý theo từng bucket")
+async def get_sla_series(
+    metric: SlaMetric = Query("submit_to_complete"),
+    dimension: SlaDimension = Query("all"),
+    granularity: SlaGranularity = Query("day"),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    dimension_value: Optional[str] = Query(None),
+    actor=Depends(is_manager),
+    db: AsyncSession = Depends(get_read_db),
+):
+    return await _report(db, metric, granularity, dimension, since, until, dimension_value, series=True)
+
+
+@router.get("/dashboard", response_class=HTMLResponse, include_in_schema=False)
+async def sla_dashboard(request: Request, actor=Depends(is_manager)):
+    return templates.TemplateResponse(
+        "analytics_dashboard.html",
+        {"request": request, "user": actor, "api_base": settings.API_V1_STR + "/analytics"},
+    )
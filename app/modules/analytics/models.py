@@ -0,0 +1,50 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import BigInteger, Column, DateTime, Float, Index, String
+from sqlalchemy.dialects.postgresql import JSONB, UUID as PG_UUID
+from sqlmodel import Field, SQLModel
+
+
+class SlaRollup(SQLModel, table=True):
+    """
+    Rollup thời gian xử lý (giây) theo bucket giờ / ngày và chiều phân tích.
+    Một dòng = (metric, granularity, bucket_start, dimension, dimension_value);
+    các cột count / sum / min / max / sketch cộng dồn được nên cập nhật bằng UPSERT.
+    """
+    __tablename__ = "sla_rollups"
+    __table_args__ = (
+        Index("ix_sla_rollups_lookup", "metric", "granularity", "dimension", "bucket_start"),
+    )
+
+    # submit_to_approve / approve_to_complete / submit_to_complete
+    metric: str = Field(sa_column=Column(String(32), primary_key=True))
+    # hour / day
+    granularity: str = Field(sa_column=Column(String(8), primary_key=True))
+    bucket_start: datetime = Field(sa_column=Column(DateTime, primary_key=True))
+    # all / department / checker / manager
+    dimension: str = Field(sa_column=Column(String(16), primary_key=True))
+    # Tên phòng ban / user id; "" với dimension = all
+    dimension_value: str = Field(default="", sa_column=Column(String(255), primary_key=True))
+
+    count: int = Field(default=0, sa_column=Column(BigInteger, nullable=False))
+    sum_seconds: float = Field(default=0.0, sa_column=Column(Float, nullable=False))
+    min_seconds: Optional[float] = Field(default=None, sa_column=Column(Float))
+    max_seconds: Optional[float] = Field(default=None, sa_column=Column(Float))
+    # QuantileSketch.to_json(): {"bucket": count}
+    sketch: dict = Field(default_factory=dict, sa_column=Column(JSONB, nullable=False))
+
+    updated_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime, nullable=False))
+
+
+class AnalyticsCheckpoint(SQLModel, table=True):
+    """
+    Vị trí đã xử lý trong audit_logs (id UUIDv7 tăng theo thời gian) của từng consumer.
+    Cập nhật cùng transaction với rollup nên mỗi sự kiện được cộng đúng một lần.
+    """
+    __tablename__ = "analytics_checkpoints"
+
+    name: str = Field(sa_column=Column(String(64), primary_key=True))
+    last_event_id: Optional[UUID] = Field(default=None, sa_column=Column(PG_UUID(as_uuid=True)))
+    updated_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime, nullable=False))
@@ -0,0 +1,444 @@
+import argparse
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import String, column, delete, func, literal_column, select, table, true
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from ...core.config import settings
+from ...core.metrics import registry
+from ..documents.models.documents import AuditAction, AuditLog, Document
+from .models import AnalyticsCheckpoint, SlaRollup
+from .sketch import QuantileSketch
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_EVENTS = registry.counter("analytics_events_total", "Audit events consumed by the SLA rollups.", ("source",))
+ANALYTICS_LAG = registry.gauge("analytics_lag_seconds", "Age of the newest audit event folded into the SLA rollups.")
+
+CHECKPOINT = "sla_rollups"
+METRICS = ("submit_to_approve", "approve_to_complete", "submit_to_complete")
+GRANULARITIES = ("hour", "day")
+DIMENSIONS = ("all", "department", "checker", "manager")
+
+# users chỉ cần id + department (trường department của profile)
+users = table("users", column("id", PG_UUID(as_uuid=True)), column("department", String))
+
+END_ACTIONS = (AuditAction.APPROVE, AuditAction.SIGN_INTERNAL, AuditAction.SIGN_EXTERNAL)
+
+
+def is_completion(action: AuditAction, details: Optional[dict]) -> bool:
+    """Sự kiện đưa hồ sơ sang COMPLETED (xem DocumentService)."""
+    if action == AuditAction.SIGN_INTERNAL:
+        return True
+    if action == AuditAction.SIGN_EXTERNAL:
+        details = details or {}
+        stage = details.get("stage")
+        return stage == "COMPLETED" or (stage == "PADES_VALIDATED" and bool(details.get("valid")))
+    return False
+
+
+def truncate(at: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+# -----------------------------------------------------------------------
+# Sự kiện kết thúc -> các đoạn thời gian (segment)
+# -----------------------------------------------------------------------
+def end_events_query():
+    """
+    Sự kiện kết thúc (APPROVE / ký hoàn tất) kèm mốc bắt đầu, trong một câu:
+    LATERAL lấy APPROVE gần nhất (chính nó với sự kiện APPROVE) và SUBMIT gần
+    nhất trước mốc duyệt, qua index (document_id, timestamp) của audit_logs.
+    Phòng ban = department của người tạo hồ sơ.
+    """
+    event = aliased(AuditLog, name="event")
+    approval_log = aliased(AuditLog, name="approval_log")
+    submit_log = aliased(AuditLog, name="submit_log")
+
+    approval = (
+        select(approval_log.timestamp.label("at"), approval_log.actor_id.label("actor_id"))
+        .where(
+            approval_log.document_id == event.document_id,
+            approval_log.action == AuditAction.APPROVE,
+            approval_log.timestamp <= event.timestamp,
+        )
+        .order_by(approval_log.timestamp.desc())
+        .limit(1)
+        .lateral("approval")
+    )
+    submission = (
+        select(submit_log.timestamp.label("at"))
+        .where(
+            submit_log.document_id == event.document_id,
+            submit_log.action == AuditAction.SUBMIT,
+            submit_log.timestamp <= approval.c.at,
+        )
+        .order_by(submit_log.timestamp.desc())
+        .limit(1)
+        .lateral("submission")
+    )
+    stmt = (
+        select(
+            event.id,
+            event.timestamp,
+            event.action,
+            event.actor_id,
+            event.details,
+            users.c.department,
+            approval.c.at.label("approved_at"),
+            approval.c.actor_id.label("approver_id"),
+            submission.c.at.label("submitted_at"),
+        )
+        .select_from(event)
+        .join(Document, Document.id == event.document_id)
+        .outerjoin(users, users.c.id == Document.creator_id)
+        .outerjoin(approval, true())
+        .outerjoin(submission, true())
+        .where(event.action.in_(END_ACTIONS))
+    )
+    return stmt, event
+
+
+def segments(row) -> Iterable[Tuple[str, float, List[Tuple[str, str]]]]:
+    """(metric, seconds, [(dimension, value), ...]) của một sự kiện kết thúc."""
+    department = row.department or ""
+    base = [("all", ""), ("department", department)]
+
+    def seconds(start: Optional[datetime]) -> Optional[float]:
+        if start is None:
+            return None
+        value = (row.timestamp - start).total_seconds()
+        return value if value >= 0 else None
+
+    if row.action == AuditAction.APPROVE:
+        value = seconds(row.submitted_at)
+        if value is not None:
+            yield "submit_to_approve", value, base + [("checker", str(row.actor_id or ""))]
+    elif is_completion(row.action, row.details):
+        value = seconds(row.approved_at)
+        if value is not None:
+            yield "approve_to_complete", value, base + [
+                ("checker", str(row.approver_id or "")),
+                ("manager", str(row.actor_id or "")),
+            ]
+        value = seconds(row.submitted_at)
+        if value is not None:
+            yield "submit_to_complete", value, base
+
+
+# -----------------------------------------------------------------------
+# Gộp và ghi rollup
+# -----------------------------------------------------------------------
+RollupKey = Tuple[str, str, datetime, str, str]
+
+
+@dataclass
+class RollupDelta:
+    count: int = 0
+    sum_seconds: float = 0.0
+    min_seconds: Optional[float] = None
+    max_seconds: Optional[float] = None
+    sketch: QuantileSketch = field(default_factory=QuantileSketch)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.sum_seconds += value
+        self.min_seconds = value if self.min_seconds is None else min(self.min_seconds, value)
+        self.max_seconds = value if self.max_seconds is None else max(self.max_seconds, value)
+        self.sketch.add(value)
+
+
+def aggregate(rows) -> Dict[RollupKey, RollupDelta]:
+    deltas: Dict[RollupKey, RollupDelta] = defaultdict(RollupDelta)
+    for row in rows:
+        for metric, value, dimensions in segments(row):
+            for granularity in GRANULARITIES:
+                bucket = truncate(row.timestamp, granularity)
+                for dimension, dimension_value in dimensions:
+                    deltas[(metric, granularity, bucket, dimension, dimension_value)].add(value)
+    return deltas
+
+
+# Cộng hai sketch JSONB theo bucket ngay trong UPSERT (không đọc-sửa-ghi, an toàn khi ghi đồng thời)
+_MERGE_SKETCH = literal_column(
+    "(SELECT COALESCE(jsonb_object_agg(k, total), '{}'::jsonb) FROM ("
+    "SELECT k, SUM(v::bigint) AS total FROM ("
+    "SELECT key AS k, value AS v FROM jsonb_each_text(sla_rollups.sketch) "
+    "UNION ALL SELECT key, value FROM jsonb_each_text(excluded.sketch)"
+    ") AS parts GROUP BY k) AS merged)"
+)
+
+
+async def apply_deltas(db: AsyncSession, deltas: Dict[RollupKey, RollupDelta]) -> None:
+    if not deltas:
+        return
+    now = datetime.utcnow()
+    rows = [
+        {
+            "metric": metric,
+            "granularity": granularity,
+            "bucket_start": bucket,
+            "dimension": dimension,
+            "dimension_value": dimension_value,
+            "count": delta.count,
+            "sum_seconds": delta.sum_seconds,
+            "min_seconds": delta.min_seconds,
+            "max_seconds": delta.max_seconds,
+            "sketch": delta.sketch.to_json(),
+            "updated_at": now,
+        }
+        for (metric, granularity, bucket, dimension, dimension_value), delta in deltas.items()
+    ]
+    rollups = SlaRollup.__table__
+    stmt = pg_insert(rollups)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[c for c in rollups.primary_key.columns],
+        set_={
+            "count": rollups.c.count + stmt.excluded.count,
+            "sum_seconds": rollups.c.sum_seconds + stmt.excluded.sum_seconds,
+            "min_seconds": func.least(rollups.c.min_seconds, stmt.excluded.min_seconds),
+            "max_seconds": func.greatest(rollups.c.max_seconds, stmt.excluded.max_seconds),
+            "sketch": _MERGE_SKETCH,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    await db.execute(stmt, rows)
+
+
+# -----------------------------------------------------------------------
+# Consumer nền (incremental)
+# -----------------------------------------------------------------------
+class SlaAggregator:
+    """
+    Đọc sự kiện kết thúc mới trong audit_logs sau checkpoint (id UUIDv7) và cộng
+    vào rollup, rollup + checkpoint trong cùng transaction (mỗi sự kiện đúng
+    một lần). Dòng checkpoint khóa FOR UPDATE SKIP LOCKED: nhiều worker / lệnh
+    backfill đang chạy thì chỉ một bên xử lý, bên còn lại bỏ lượt.
+    """
+
+    def __init__(self, interval: float = settings.ANALYTICS_INTERVAL_SECONDS,
+                 settle: float = settings.ANALYTICS_SETTLE_SECONDS,
+                 batch_size: int = settings.ANALYTICS_BATCH_SIZE):
+        self.interval = interval
+        self.settle = settle
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self, db: AsyncSession) -> int:
+        """Xử lý một lô; trả về số sự kiện kết thúc đã đọc (0 = không có gì / worker khác đang giữ)."""
+        await db.execute(
+            pg_insert(AnalyticsCheckpoint.__table__)
+            .values(name=CHECKPOINT, updated_at=datetime.utcnow())
+            .on_conflict_do_nothing()
+        )
+        checkpoint = (await db.execute(
+            select(AnalyticsCheckpoint)
+            .where(AnalyticsCheckpoint.name == CHECKPOINT)
+            .with_for_update(skip_locked=True)
+        )).scalar_one_or_none()
+        if checkpoint is None:
+            await db.rollback()
+            return 0
+
+        stmt, event = end_events_query()
+        stmt = stmt.where(event.timestamp < datetime.utcnow() - timedelta(seconds=self.settle))
+        if checkpoint.last_event_id is not None:
+            stmt = stmt.where(event.id > checkpoint.last_event_id)
+        rows = (await db.execute(stmt.order_by(event.id).limit(self.batch_size))).all()
+        if rows:
+            await apply_deltas(db, aggregate(rows))
+            checkpoint.last_event_id = rows[-1].id
+            checkpoint.updated_at = datetime.utcnow()
+            ANALYTICS_EVENTS.inc("live", amount=len(rows))
+            ANALYTICS_LAG.set((datetime.utcnow() - rows[-1].timestamp).total_seconds())
+        await db.commit()
+        return len(rows)
+
+    async def _loop(self) -> None:
+        from ...db.database import SessionLocal
+
+        while True:
+            try:
+                # Bắt kịp theo lô liên tiếp, nghỉ khi đã hết sự kiện
+                while True:
+                    async with SessionLocal() as db:
+                        if await self.run_once(db) < self.batch_size:
+                            break
+            except Exception:
+                logger.exception("SLA rollup update failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+sla_aggregator = SlaAggregator()
+
+
+# -----------------------------------------------------------------------
+# Backfill (dựng lại từ lịch sử, song song theo ngày)
+# -----------------------------------------------------------------------
+async def _rebuild_day(session_factory, day: datetime, boundary_id: UUID, semaphore: asyncio.Semaphore) -> int:
+    async with semaphore, session_factory() as db:
+        next_day = day + timedelta(days=1)
+        await db.execute(
+            delete(SlaRollup).where(SlaRollup.bucket_start >= day, SlaRollup.bucket_start < next_day)
+        )
+        # Chỉ tới boundary_id: sự kiện sau đó (cùng ngày) để consumer nền cộng tiếp
+        stmt, event = end_events_query()
+        result = await db.stream(
+            stmt.where(event.timestamp >= day, event.timestamp < next_day, event.id <= boundary_id)
+            .execution_options(yield_per=settings.ANALYTICS_BATCH_SIZE)
+        )
+        count = 0
+        deltas: Dict[RollupKey, RollupDelta] = defaultdict(RollupDelta)
+        async for partition in result.partitions():
+            count += len(partition)
+            # Cùng một ngày: gộp trong bộ nhớ (số key bị chặn bởi số bucket x chiều), ghi một lần
+            for key, delta in aggregate(partition).items():
+                target = deltas[key]
+                target.count += delta.count
+                target.sum_seconds += delta.sum_seconds
+                target.min_seconds = delta.min_seconds if target.min_seconds is None \
+                    else min(target.min_seconds, delta.min_seconds)
+                target.max_seconds = delta.max_seconds if target.max_seconds is None \
+                    else max(target.max_seconds, delta.max_seconds)
+                target.sketch.merge(delta.sketch)
+        await apply_deltas(db, deltas)
+        await db.commit()
+        ANALYTICS_EVENTS.inc("backfill", amount=count)
+        logger.info(f"SLA rollups {day:%Y-%m-%d}: {count} end events")
+        return count
+
+
+async def backfill(session_factory, since: Optional[datetime], until: Optional[datetime],
+                   workers: int = settings.ANALYTICS_BACKFILL_WORKERS) -> int:
+    """
+    Xóa và dựng lại rollup của các ngày (trọn ngày) giao với [since, until) từ
+    audit_logs, mỗi ngày một transaction, tối đa `workers` ngày song song.
+
+    Mốc dừng là một id sự kiện: max(checkpoint hiện tại, sự kiện cuối trước
+    `until`), nên dựng lại một khoảng quá khứ không làm lùi checkpoint và không
+    mất phần consumer nền đã cộng trong ngày cuối. Trong lúc chạy giữ khóa dòng
+    checkpoint (consumer nền bỏ lượt); xong thì đặt checkpoint tới mốc dừng.
+    """
+    until = until or datetime.utcnow() - timedelta(seconds=settings.ANALYTICS_SETTLE_SECONDS)
+    async with session_factory() as lock_db:
+        await lock_db.execute(
+            pg_insert(AnalyticsCheckpoint.__table__)
+            .values(name=CHECKPOINT, updated_at=datetime.utcnow())
+            .on_conflict_do_nothing()
+        )
+        checkpoint = (await lock_db.execute(
+            select(AnalyticsCheckpoint).where(AnalyticsCheckpoint.name == CHECKPOINT).with_for_update()
+        )).scalar_one()
+        last_before_until = (await lock_db.execute(
+            select(func.max(AuditLog.id)).where(AuditLog.timestamp < until)
+        )).scalar()
+        candidates = [i for i in (checkpoint.last_event_id, last_before_until) if i is not None]
+        if since is None:
+            since = (await lock_db.execute(select(func.min(AuditLog.timestamp)))).scalar()
+        if since is None or not candidates:
+            await lock_db.commit()
+            return 0
+        # UUIDv7: so sánh UUID = so sánh thứ tự sinh
+        boundary_id = max(candidates)
+
+        days = []
+        day = truncate(since, "day")
+        while day < until:
+            days.append(day)
+            day += timedelta(days=1)
+        semaphore = asyncio.Semaphore(workers)
+        counts = await asyncio.gather(*(_rebuild_day(session_factory, day, boundary_id, semaphore) for day in days))
+
+        checkpoint.last_event_id = boundary_id
+        checkpoint.updated_at = datetime.utcnow()
+        await lock_db.commit()
+    return sum(counts)
+
+
+# -----------------------------------------------------------------------
+# Đọc rollup (báo cáo)
+# -----------------------------------------------------------------------
+def summarize(rows) -> dict:
+    count = sum(row.count for row in rows)
+    sketch = QuantileSketch.merged(row.sketch for row in rows)
+    mins = [row.min_seconds for row in rows if row.min_seconds is not None]
+    maxes = [row.max_seconds for row in rows if row.max_seconds is not None]
+    return {
+        "count": count,
+        "mean_seconds": sum(row.sum_seconds for row in rows) / count if count else None,
+        "p50_seconds": sketch.quantile(0.5),
+        "p90_seconds": sketch.quantile(0.9),
+        "p95_seconds": sketch.quantile(0.95),
+        "min_seconds": min(mins) if mins else None,
+        "max_seconds": max(maxes) if maxes else None,
+    }
+
+
+async def sla_report(db: AsyncSession, metric: str, granularity: str, dimension: str,
+                     since: datetime, until: datetime, dimension_value: Optional[str] = None,
+                     series: bool = False) -> List[dict]:
+    """
+    Chỉ đọc sla_rollups (ix_sla_rollups_lookup). Gộp các bucket trong [since, until)
+    theo dimension_value; `series` = một điểm cho mỗi bucket thay vì cả khoảng.
+    """
+    stmt = select(SlaRollup).where(
+        SlaRollup.metric == metric,
+        SlaRollup.granularity == granularity,
+        SlaRollup.dimension == dimension,
+        SlaRollup.bucket_start >= since,
+        SlaRollup.bucket_start < until,
+    )
+    if dimension_value is not None:
+        stmt = stmt.where(SlaRollup.dimension_value == dimension_value)
+    groups: Dict[tuple, list] = defaultdict(list)
+    for row in (await db.execute(stmt)).scalars():
+        key = (row.dimension_value, row.bucket_start) if series else (row.dimension_value, None)
+        groups[key].append(row)
+    return [
+        {"dimension_value": value, "bucket_start": bucket, **summarize(rows)}
+        for (value, bucket), rows in sorted(groups.items(), key=lambda item: (item[0][0], item[0][1] or since))
+    ]
+
+
+async def _main(args) -> None:
+    from ...db.database import SessionLocal
+
+    since = datetime.fromisoformat(args.since) if args.since else None
+    until = datetime.fromisoformat(args.until) if args.until else None
+    total = await backfill(SessionLocal, since, until, workers=args.workers)
+    print(f"Rebuilt SLA rollups from {total} end events")
+
+
+if __name__ == "__main__":
+    # python -m app.modules.analytics.rollups backfill [--since 2025-01-01] [--until ...] [--workers 8]
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Rollup SLA / thời gian xử lý hồ sơ")
+    sub = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = sub.add_parser("backfill")
+    backfill_parser.add_argument("--since", help="ISO datetime (mặc định: audit log đầu tiên)")
+    backfill_parser.add_argument("--until", help="ISO datetime (mặc định: hiện tại - ANALYTICS_SETTLE_SECONDS)")
+    backfill_parser.add_argument("--workers", type=int, default=settings.ANALYTICS_BACKFILL_WORKERS)
+    asyncio.run(_main(parser.parse_args()))
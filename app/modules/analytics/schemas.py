@@ -0,0 +1,30 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel
+
+SlaMetric = Literal["submit_to_approve", "approve_to_complete", "submit_to_complete"]
+SlaGranularity = Literal["hour", "day"]
+SlaDimension = Literal["all", "department", "checker", "manager"]
+
+
+class SlaStat(BaseModel):
+    """Thống kê thời gian xử lý (giây); quantile sai số tương đối <= 1%."""
+    dimension_value: str
+    bucket_start: Optional[datetime] = None
+    count: int
+    mean_seconds: Optional[float] = None
+    p50_seconds: Optional[float] = None
+    p90_seconds: Optional[float] = None
+    p95_seconds: Optional[float] = None
+    min_seconds: Optional[float] = None
+    max_seconds: Optional[float] = None
+
+
+class SlaReport(BaseModel):
+    metric: SlaMetric
+    granularity: SlaGranularity
+    dimension: SlaDimension
+    since: datetime
+    until: datetime
+    items: List[SlaStat]
@@ -0,0 +1,75 @@
+import math
+from typing import Dict, Iterable, Optional
+
+# Sai số tương đối của quantile (1%): đủ cho SLA tính bằng phút / giờ, mỗi sketch vài trăm bucket
+RELATIVE_ACCURACY = 0.01
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+# Thời lượng <= MIN_VALUE giây gom vào bucket "0"
+MIN_VALUE = 1.0
+
+
+class QuantileSketch:
+    """
+    Sketch quantile dạng log-bucket (kiểu DDSketch): giá trị x > 0 rơi vào
+    bucket ceil(log_gamma(x)), mỗi bucket chỉ lưu số đếm.
+
+    Gộp hai sketch = cộng số đếm theo bucket, nên rollup theo giờ / ngày / phòng
+    ban cộng dồn được (kể cả ngay trong câu UPSERT của PostgreSQL) mà quantile
+    vẫn giữ sai số tương đối RELATIVE_ACCURACY. Lưu JSONB {"bucket": count}.
+    """
+
+    __slots__ = ("counts",)
+
+    def __init__(self, counts: Optional[Dict[str, int]] = None):
+        self.counts: Dict[str, int] = dict(counts or {})
+
+    @staticmethod
+    def bucket(value: float) -> str:
+        if value <= MIN_VALUE:
+            return "0"
+        return str(math.ceil(math.log(value) / _LOG_GAMMA))
+
+    @staticmethod
+    def bucket_value(key: str) -> float:
+        if key == "0":
+            return 0.0
+        index = int(key)
+        # Điểm giữa (theo sai số tương đối) của bucket (gamma^(i-1), gamma^i]
+        return 2 * _GAMMA ** index / (_GAMMA + 1)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts.values())
+
+    def add(self, value: float, count: int = 1) -> None:
+        key = self.bucket(value)
+        self.counts[key] = self.counts.get(key, 0) + count
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for key in sorted(self.counts, key=int):
+            seen += self.counts[key]
+            if seen > rank:
+                return self.bucket_value(key)
+        return self.bucket_value(max(self.counts, key=int))
+
+    def to_json(self) -> Dict[str, int]:
+        return dict(self.counts)
+
+    @classmethod
+    def merged(cls, sketches: Iterable[Optional[Dict[str, int]]]) -> "QuantileSketch":
+        result = cls()
+        for counts in sketches:
+            if counts:
+                result.merge(cls(counts))
+        return result
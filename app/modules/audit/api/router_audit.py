@@ -0,0 +1,84 @@
+import json
+from datetime import datetime
+from typing import List, Literal, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import ColumnElement
+
+from ....core.config import settings
+from ....core.export import export_response, stream_export
+from ....db.routing import get_read_db, read_sessionmaker
+from ...documents.models.documents import AuditAction
+from ...users.dependencies import is_manager
+from ..schemas import AuditLogPage, AuditLogRead
+from ..services import audit_export_query, audit_filters, query_audit_logs
+
+router = APIRouter(prefix=settings.API_V1_STR + "/audit-logs", tags=["Audit"])
+
+
+def audit_filter_params(
+    actor_id: Optional[UUID] = Query(None),
+    document_id: Optional[UUID] = Query(None),
+    action: Optional[List[AuditAction]] = Query(None, description="Lặp lại để lọc nhiều hành động"),
+    since: Optional[datetime] = Query(None, description="Từ thời điểm (bao gồm)"),
+    until: Optional[datetime] = Query(None, description="Đến thời điểm (không bao gồm)"),
+    details: Optional[str] = Query(None, description='JSON object, khớp `details @> ...`, ví dụ {"reason": "Sai mẫu"}'),
+    details_path: Optional[str] = Query(
+        None, max_length=500, description='jsonpath, ví dụ $.reason ? (@ like_regex "mẫu" flag "i")'
+    ),
+) -> List[ColumnElement]:
+    """Dependency: bộ lọc chung của tra cứu và export."""
+    details_contains = None
+    if details:
+        try:
+            details_contains = json.loads(details)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="details không phải JSON")
+        if not isinstance(details_contains, dict):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="details phải là JSON object")
+    return audit_filters(
+        actor_id=actor_id,
+        document_id=document_id,
+        actions=action,
+        since=since,
+        until=until,
+        details_contains=details_contains,
+        details_path=details_path,
+    )
+
+
+# -----------------------------------------------------------------------
+# ENDPOINT: TRA CỨU NHẬT KÝ (MANAGER)
+# -----------------------------------------------------------------------
+@router.get("", response_model=AuditLogPage, summary="[MANAGER] Tra cứu nhật ký hệ thống")
+async def list_audit_logs(
+    conditions: List[ColumnElement] = Depends(audit_filter_params),
+    limit: int = Query(settings.AUDIT_PAGE_SIZE, ge=1, le=settings.AUDIT_MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor của trang trước"),
+    actor=Depends(is_manager),
+    db: AsyncSession = Depends(get_read_db),
+):
+    try:
+        rows, next_cursor = await query_audit_logs(db, conditions, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor không hợp lệ.")
+    return AuditLogPage(items=[AuditLogRead.model_validate(row) for row in rows], next_cursor=next_cursor)
+
+
+# -----------------------------------------------------------------------
+# ENDPOINT: EXPORT NHẬT KÝ (MANAGER) — streaming, bộ nhớ không đổi theo số dòng
+# -----------------------------------------------------------------------
+@router.get("/export", summary="[MANAGER] Export nhật ký (CSV / NDJSON, tùy chọn gzip)")
+async def export_audit_logs(
+    conditions: List[ColumnElement] = Depends(audit_filter_params),
+    export_format: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    gzip: bool = Query(True, description="Nén gzip khi stream"),
+    actor=Depends(is_manager),
+):
+    stream = stream_export(
+        audit_export_query(conditions), export_format, gzip, "audit_logs", session_factory=read_sessionmaker()
+    )
+    filename = f"audit-logs-{datetime.utcnow():%Y%m%d-%H%M%S}"
+    return export_response(stream, filename, export_format, gzip)
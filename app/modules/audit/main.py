@@ -0,0 +1,6 @@
+from fastapi import APIRouter
+
+from .api import router_audit
+
+router = APIRouter()
+router.include_router(router_audit.router)
@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from ..documents.models.documents import AuditAction
+
+
+class AuditLogRead(BaseModel):
+    id: UUID
+    timestamp: datetime
+    actor_id: Optional[UUID] = None
+    action: AuditAction
+    document_id: Optional[UUID] = None
+    details: Optional[dict] = None
+
+    model_config = {"from_attributes": True}
+
+
+class AuditLogPage(BaseModel):
+    """Một trang nhật ký (mới nhất trước); next_cursor = None khi hết."""
+    items: List[AuditLogRead]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,138 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import cast, literal, select, text, tuple_
+from sqlalchemy.dialects.postgresql import JSONB, JSONPATH
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import ColumnElement, Select
+
+from ...core.config import settings
+from ..documents.models.documents import AuditAction, AuditLog
+
+
+def create_audit_log(
+    db: AsyncSession,
+    actor_id: Optional[UUID],
+    action: AuditAction,
+    document_id: Optional[UUID] = None,
+    details: Optional[Dict[str, Any]] = None,
+) -> AuditLog:
+    """
+    Hàm helper tập trung để tạo AuditLog (append-only).
+    Không tự commit: service gọi nó chịu trách nhiệm commit chung cho giao dịch.
+    """
+    db_audit = AuditLog(
+        actor_id=actor_id,
+        action=action,
+        document_id=document_id,
+        details=details or {},
+    )
+    db.add(db_audit)
+    return db_audit
+
+
+# -----------------------------------------------------------------------
+# TRUY VẤN AUDIT (keyset theo (timestamp, id) giảm dần)
+# -----------------------------------------------------------------------
+def encode_audit_cursor(timestamp: datetime, audit_id: UUID) -> str:
+    return base64.urlsafe_b64encode(json.dumps([timestamp.isoformat(), str(audit_id)]).encode()).decode()
+
+
+def decode_audit_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        timestamp, audit_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(timestamp), UUID(audit_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid audit cursor: {e}")
+
+
+def audit_filters(
+    actor_id: Optional[UUID] = None,
+    document_id: Optional[UUID] = None,
+    actions: Optional[Sequence[AuditAction]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    details_contains: Optional[Dict[str, Any]] = None,
+    details_path: Optional[str] = None,
+) -> List[ColumnElement]:
+    """
+    Điều kiện WHERE dùng chung cho tra cứu và export:
+    - details_contains: `details @> {...}` (ví dụ {"reason": "Sai mẫu"}).
+    - details_path: jsonpath, `details @? '$.reason ? (@ like_regex "mẫu" flag "i")'`.
+    Cả hai đi qua GIN jsonb_path_ops; document/actor + thời gian đi qua index ghép.
+    """
+    conditions = []
+    if actor_id is not None:
+        conditions.append(AuditLog.actor_id == actor_id)
+    if document_id is not None:
+        conditions.append(AuditLog.document_id == document_id)
+    if actions:
+        conditions.append(AuditLog.action.in_(actions))
+    if since is not None:
+        conditions.append(AuditLog.timestamp >= since)
+    if until is not None:
+        conditions.append(AuditLog.timestamp < until)
+    if details_contains:
+        conditions.append(AuditLog.details.op("@>")(cast(details_contains, JSONB)))
+    if details_path:
+        conditions.append(AuditLog.details.op("@?")(cast(literal(details_path), JSONPATH)))
+    return conditions
+
+
+async def query_audit_logs(
+    db: AsyncSession,
+    conditions: Sequence[ColumnElement] = (),
+    limit: int = settings.AUDIT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> Tuple[List[AuditLog], Optional[str]]:
+    """
+    Lọc nhật ký theo `conditions` (xem audit_filters), mới nhất trước.
+    Trả về (trang kết quả, next_cursor) — next_cursor = None khi hết.
+    """
+    stmt = select(AuditLog).where(*conditions)
+    if cursor:
+        after_timestamp, after_id = decode_audit_cursor(cursor)
+        stmt = stmt.where(tuple_(AuditLog.timestamp, AuditLog.id) < tuple_(after_timestamp, after_id))
+    stmt = stmt.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(limit + 1)
+
+    try:
+        if db.bind.dialect.name == "postgresql":
+            # Chỉ áp dụng trong transaction hiện tại
+            await db.execute(text(f"SET LOCAL statement_timeout = {int(settings.AUDIT_QUERY_TIMEOUT_MS)}"))
+        rows = list((await db.execute(stmt)).scalars())
+    except DBAPIError as e:
+        await db.rollback()
+        # 57014 = query_canceled (quá statement_timeout); còn lại: jsonpath sai cú pháp
+        if (getattr(e.orig, "pgcode", None) or getattr(e.orig, "sqlstate", None)) == "57014":
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="Truy vấn audit quá thời gian, hãy thu hẹp khoảng thời gian hoặc lọc theo hồ sơ / người dùng.",
+            )
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Truy vấn audit không hợp lệ: {e.orig}")
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_audit_cursor(rows[-1].timestamp, rows[-1].id)
+    return rows, next_cursor
+
+
+def audit_export_query(conditions: Sequence[ColumnElement] = ()) -> Select:
+    """SELECT theo cột (không qua identity map của ORM) cho export, cũ nhất trước."""
+    return (
+        select(
+            AuditLog.id,
+            AuditLog.timestamp,
+            AuditLog.actor_id,
+            AuditLog.action,
+            AuditLog.document_id,
+            AuditLog.details,
+        )
+        .where(*conditions)
+        .order_by(AuditLog.timestamp, AuditLog.id)
+    )
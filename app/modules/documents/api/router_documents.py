@@ -0,0 +1,214 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ....core.config import settings
+from ....core.export import export_response, stream_export
+from ....db.database import get_db
+from ....db.routing import get_read_db, read_sessionmaker
+from ...users.dependencies import get_current_active_user, is_manager
+from ..schemas import (
+    DocumentRead,
+    DocumentSearchHit,
+    DocumentSearchPage,
+    DocumentSign,
+    ExternalSignCreate,
+    ExternalSignRequestRead,
+    SignatureRead,
+    SignatureVerification,
+    TimelinePage,
+)
+from ..search import MIN_QUERY_LENGTH, InvalidSearchQuery, search_documents
+from ..models.documents import DocumentStatus
+from ..services import DocumentService, document_register_query, get_document_service
+from ..storage import AbstractStorageService, get_storage_service
+from ..timeline import document_timeline
+
+router = APIRouter(prefix=settings.API_V1_STR + "/documents", tags=["Documents"])
+
+
+# -----------------------------------------------------------------------
+# ENDPOINT: UPLOAD TÀI LIỆU MỚI (SENDER)
+# -----------------------------------------------------------------------
+@router.post(
+    "",
+    response_model=DocumentRead,
+    status_code=status.HTTP_201_CREATED,
+    summary="[SENDER] Upload tài liệu mới và tạo phiên bản v1",
+)
+async def upload_document(
+    actor=Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    doc_service: DocumentService = Depends(get_document_service),
+    storage_svc: AbstractStorageService = Depends(get_storage_service),
+    file: UploadFile = File(..., description="File PDF cần upload"),
+    title: str = Form(..., max_length=255, description="Tiêu đề hồ sơ"),
+    description: Optional[str] = Form(None, description="Mô tả"),
+):
+    """
+    Upload một lần (multipart). File lớn / đường truyền chập chờn nên dùng
+    API upload tiếp nối tại /uploads.
+    """
+    file_name = file.filename
+    mime_type = file.content_type or "application/octet-stream"
+    try:
+        storage_result = await storage_svc.save_file_and_compute_hash(file, actor.id)
+    except IOError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    return await doc_service.create_new_document(
+        db,
+        title=title,
+        description=description,
+        storage_result=storage_result,
+        file_name=file_name,
+        mime_type=mime_type,
+        actor_id=actor.id,
+    )
+
+
+# -----------------------------------------------------------------------
+# ENDPOINT: TÌM KIẾM HỒ SƠ
+# -----------------------------------------------------------------------
+@router.get("/search", response_model=DocumentSearchPage, summary="Tìm hồ sơ theo tiêu đề, mô tả và nội dung PDF")
+async def search(
+    q: str = Query(..., min_length=MIN_QUERY_LENGTH, max_length=200, description="Từ khóa (có hoặc không dấu)"),
+    limit: int = Query(settings.SEARCH_PAGE_SIZE, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor của trang trước"),
+    actor=Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    try:
+        rows, next_cursor = await search_documents(db, q, limit=limit, cursor=cursor)
+    except InvalidSearchQuery as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor không hợp lệ.")
+    items = [
+        DocumentSearchHit.model_validate({**DocumentRead.model_validate(document).model_dump(), "score": score})
+        for document, score in rows
+    ]
+    return DocumentSearchPage(items=items, next_cursor=next_cursor)
+
+
+# -----------------------------------------------------------------------
+# ENDPOINT: EXPORT SỔ ĐĂNG KÝ HỒ SƠ (MANAGER) — streaming CSV / NDJSON
+# -----------------------------------------------------------------------
+@router.get("/export", summary="[MANAGER] Export sổ đăng ký hồ sơ (CSV / NDJSON, tùy chọn gzip)")
+async def export_document_register(
+    status_filter: Optional[DocumentStatus] = Query(None, alias="status"),
+    since: Optional[datetime] = Query(None, description="Tạo từ thời điểm (bao gồm)"),
+    until: Optional[datetime] = Query(None, description="Tạo trước thời điểm (không bao gồm)"),
+    export_format: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    gzip: bool = Query(True, description="Nén gzip khi stream"),
+    actor=Depends(is_manager),
+):
+    stmt = document_register_query(status_filter, since, until)
+    stream = stream_export(stmt, export_format, gzip, "documents", session_factory=read_sessionmaker())
+    return export_response(stream, f"documents-{datetime.utcnow():%Y%m%d-%H%M%S}", export_format, gzip)
+
+
+# -----------------------------------------------------------------------
+# ENDPOINT: KÝ SỐ NỘI BỘ (MANAGER)
+# -----------------------------------------------------------------------
+@router.post(
+    "/{document_id}/sign",
+    response_model=SignatureRead,
+    summary="[MANAGER] Ký số nội bộ phiên bản đã được phê duyệt",
+)
+async def sign_document(
+    document_id: UUID,
+    sign_in: DocumentSign,
+    actor=Depends(is_manager),
+    db: AsyncSession = Depends(get_db),
+    doc_service: DocumentService = Depends(get_document_service),
+):
+    return await doc_service.sign_document_internal(db, document_id, actor, sign_in.notes)
+
+
+# -----------------------------------------------------------------------
+# ENDPOINT: KÝ QUA CA BÊN NGOÀI (MANAGER)
+# -----------------------------------------------------------------------
+@router.post(
+    "/{document_id}/sign/external",
+    response_model=ExternalSignRequestRead,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="[MANAGER] Gửi yêu cầu ký số tới CA bên ngoài",
+)
+async def request_external_signature(
+    document_id: UUID,
+    sign_in: ExternalSignCreate,
+    actor=Depends(is_manager),
+    db: AsyncSession = Depends(get_db),
+    doc_service: DocumentService = Depends(get_document_service),
+):
+    """Chữ ký được CA gửi về sau qua /external-ca/callback/{provider}."""
+    return await doc_service.request_external_signature(db, document_id, actor, sign_in.provider)
+
+
+# -----------------------------------------------------------------------
+# ENDPOINT: UPLOAD PDF ĐÃ KÝ BẰNG USB TOKEN (MANAGER)
+# -----------------------------------------------------------------------
+@router.post(
+    "/{document_id}/upload-signed",
+    response_model=SignatureRead,
+    summary="[MANAGER] Upload PDF đã ký số (PAdES) và xác thực chữ ký",
+)
+async def upload_externally_signed_file(
+    document_id: UUID,
+    actor=Depends(is_manager),
+    db: AsyncSession = Depends(get_db),
+    doc_service: DocumentService = Depends(get_document_service),
+    storage_svc: AbstractStorageService = Depends(get_storage_service),
+    file: UploadFile = File(..., description="File PDF đã ký"),
+):
+    """Kết quả xác thực nằm ở `validation`; hồ sơ chỉ chuyển COMPLETED khi hợp lệ."""
+    file_name = file.filename
+    mime_type = file.content_type or "application/pdf"
+    try:
+        storage_result = await storage_svc.save_file_and_compute_hash(file, actor.id)
+    except IOError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    return await doc_service.upload_externally_signed_file(
+        db, document_id, actor, storage_result, file_name, mime_type, storage_svc
+    )
+
+
+# -----------------------------------------------------------------------
+# ENDPOINT: XÁC MINH CHỮ KÝ
+# -----------------------------------------------------------------------
+@router.get("/{document_id}/signatures/verify", response_model=List[SignatureVerification])
+async def verify_document_signatures(
+    document_id: UUID,
+    actor=Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    doc_service: DocumentService = Depends(get_document_service),
+):
+    """Xác minh mọi chữ ký của phiên bản mới nhất (đơn lẻ và theo lô)."""
+    return await doc_service.verify_document_signatures(db, document_id)
+
+
+# -----------------------------------------------------------------------
+# ENDPOINT: LỊCH SỬ HỒ SƠ (TIMELINE)
+# -----------------------------------------------------------------------
+@router.get("/{document_id}/timeline", response_model=TimelinePage, summary="Lịch sử hồ sơ: phiên bản, chữ ký, nhật ký")
+async def get_document_timeline(
+    document_id: UUID,
+    limit: int = Query(settings.TIMELINE_PAGE_SIZE, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor của trang trước"),
+    actor=Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Sự kiện mới nhất trước, gộp bằng một câu UNION ALL; trang được cache tới khi hồ sơ có sự kiện mới."""
+    try:
+        page = await document_timeline.page(db, document_id, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor không hợp lệ.")
+    if page is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy tài liệu.")
+    events, next_cursor = page
+    return TimelinePage(items=events, next_cursor=next_cursor)
@@ -0,0 +1,36 @@
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ....core.config import settings
+from ....core.external_ca import CALLBACK_SIGNATURE_HEADER, verify_callback_signature
+from ....db.database import get_db
+from ..schemas import ExternalSignRequestRead
+from ..services import DocumentService, get_document_service
+
+router = APIRouter(prefix=settings.API_V1_STR + "/external-ca", tags=["External CA"])
+
+
+# -----------------------------------------------------------------------
+# ENDPOINT: CALLBACK TỪ CA (không qua Auth người dùng, xác thực bằng HMAC)
+# -----------------------------------------------------------------------
+@router.post("/callback/{provider}", response_model=ExternalSignRequestRead)
+async def external_ca_callback(
+    provider: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    doc_service: DocumentService = Depends(get_document_service),
+):
+    """
+    CA gửi kết quả ký (SIGNED / REJECTED) kèm `request_id` = external_request_id.
+    Idempotent: CA gửi lại nhiều lần vẫn chỉ tạo một Signature.
+    """
+    body = await request.body()
+    if not verify_callback_signature(body, request.headers.get(CALLBACK_SIGNATURE_HEADER)):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Chữ ký callback không hợp lệ")
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body không phải JSON")
+    return await doc_service.handle_external_callback(db, provider, payload)
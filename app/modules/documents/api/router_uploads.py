@@ -0,0 +1,185 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ....core.config import settings
+from ....db.database import get_db
+from ...users.dependencies import get_current_active_user
+from ..schemas import DocumentRead, UploadSessionCreate, UploadSessionRead
+from ..services import DocumentService, get_document_service
+from ..storage import AbstractStorageService, get_storage_service
+from ..uploads import (
+    UploadOffsetMismatch,
+    UploadSession,
+    UploadSessionError,
+    UploadSessionManager,
+    UploadSessionNotFound,
+    UploadTooLarge,
+    get_upload_session_manager,
+)
+
+router = APIRouter(prefix=settings.API_V1_STR + "/uploads", tags=["Uploads"])
+
+OFFSET_CONTENT_TYPE = "application/offset+octet-stream"
+
+
+def _session_headers(session: UploadSession) -> dict:
+    return {
+        "Upload-Offset": str(session.offset),
+        "Upload-Length": str(session.length),
+        "Upload-Expires": session.expires_at_dt.strftime("%a, %d %b %Y %H:%M:%S GMT"),
+        "Cache-Control": "no-store",
+    }
+
+
+def _session_read(session: UploadSession) -> UploadSessionRead:
+    return UploadSessionRead(
+        id=session.id, offset=session.offset, length=session.length, expires_at=session.expires_at_dt
+    )
+
+
+# -----------------------------------------------------------------------
+# ENDPOINT: TẠO PHIÊN UPLOAD
+# -----------------------------------------------------------------------
+@router.post("", response_model=UploadSessionRead, status_code=status.HTTP_201_CREATED)
+async def create_upload_session(
+    session_in: UploadSessionCreate,
+    response: Response,
+    upload_length: int = Header(..., alias="Upload-Length"),
+    actor=Depends(get_current_active_user),
+    uploads: UploadSessionManager = Depends(get_upload_session_manager),
+):
+    """
+    Khởi tạo phiên upload tiếp nối. Client gửi dữ liệu bằng PATCH theo từng
+    đoạn, kèm header Upload-Offset, rồi gọi /finalize.
+    """
+    try:
+        session = await uploads.create(
+            actor.id,
+            filename=session_in.filename,
+            title=session_in.title,
+            description=session_in.description,
+            mime_type=session_in.mime_type,
+            length=upload_length,
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except UploadSessionError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    response.headers.update(_session_headers(session))
+    response.headers["Location"] = f"{router.prefix}/{session.id}"
+    return _session_read(session)
+
+
+# -----------------------------------------------------------------------
+# ENDPOINT: LẤY OFFSET HIỆN TẠI (sau khi mất kết nối)
+# -----------------------------------------------------------------------
+@router.head("/{session_id}")
+async def get_upload_offset(
+    session_id: str,
+    actor=Depends(get_current_active_user),
+    uploads: UploadSessionManager = Depends(get_upload_session_manager),
+):
+    try:
+        session = await uploads.get(session_id, actor.id)
+    except UploadSessionNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Phiên upload không tồn tại hoặc đã hết hạn")
+    return Response(status_code=status.HTTP_200_OK, headers=_session_headers(session))
+
+
+# -----------------------------------------------------------------------
+# ENDPOINT: GỬI MỘT ĐOẠN DỮ LIỆU
+# -----------------------------------------------------------------------
+@router.patch("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def upload_chunk(
+    session_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    content_type: str = Header(..., alias="Content-Type"),
+    actor=Depends(get_current_active_user),
+    uploads: UploadSessionManager = Depends(get_upload_session_manager),
+):
+    """
+    Ghi nối body (stream, không buffer toàn bộ) vào phiên tại Upload-Offset.
+    Offset sai, phiên đang được ghi ở request khác, hoặc server mất một phần
+    dữ liệu -> 409 kèm offset đúng trong header. Vượt Upload-Length -> 413.
+    """
+    if content_type.split(";")[0].strip() != OFFSET_CONTENT_TYPE:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            detail=f"Content-Type phải là {OFFSET_CONTENT_TYPE}")
+    try:
+        session = await uploads.append(session_id, upload_offset, request.stream(), actor.id)
+    except UploadSessionNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Phiên upload không tồn tại hoặc đã hết hạn")
+    except UploadOffsetMismatch as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e),
+                            headers={"Upload-Offset": str(e.expected)})
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers=_session_headers(session))
+
+
+# -----------------------------------------------------------------------
+# ENDPOINT: HOÀN TẤT -> TẠO DOCUMENT / VERSION v1
+# -----------------------------------------------------------------------
+@router.post("/{session_id}/finalize", response_model=DocumentRead, status_code=status.HTTP_201_CREATED)
+async def finalize_upload(
+    session_id: str,
+    actor=Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+    uploads: UploadSessionManager = Depends(get_upload_session_manager),
+    doc_service: DocumentService = Depends(get_document_service),
+    storage_svc: AbstractStorageService = Depends(get_storage_service),
+):
+    """
+    Hash đã được tính dần theo từng chunk: không đọc lại file, chỉ đưa vào
+    storage rồi đi qua cùng luồng tạo Document như upload một lần. Phiên chỉ
+    bị xóa sau khi Document đã commit; lỗi storage / DB -> gọi lại được.
+    """
+    try:
+        async with uploads.finalizing(session_id, actor.id) as (session, data_path, file_hash):
+            try:
+                storage_result = await storage_svc.store_file(
+                    data_path, session.filename, file_hash, session.length, keep_source=True
+                )
+            except IOError as e:
+                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+            try:
+                document = await doc_service.create_new_document(
+                    db,
+                    title=session.title,
+                    description=session.description,
+                    storage_result=storage_result,
+                    file_name=session.filename,
+                    mime_type=session.mime_type,
+                    actor_id=actor.id,
+                )
+            except Exception:
+                # Không để blob mồ côi; .part vẫn còn trong phiên để thử lại
+                await storage_svc.delete(storage_result.file_path)
+                raise
+    except UploadSessionNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Phiên upload không tồn tại hoặc đã hết hạn")
+    except UploadOffsetMismatch as e:
+        detail = "Upload chưa hoàn tất" if type(e) is UploadOffsetMismatch else str(e)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail,
+                            headers={"Upload-Offset": str(e.expected)})
+    return document
+
+
+# -----------------------------------------------------------------------
+# ENDPOINT: HỦY PHIÊN
+# -----------------------------------------------------------------------
+@router.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload(
+    session_id: str,
+    actor=Depends(get_current_active_user),
+    uploads: UploadSessionManager = Depends(get_upload_session_manager),
+):
+    try:
+        await uploads.get(session_id, actor.id)
+    except UploadSessionNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Phiên upload không tồn tại hoặc đã hết hạn")
+    await uploads.delete(session_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
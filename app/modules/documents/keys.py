@@ -0,0 +1,227 @@
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.config import settings
+from ...core.signing import InternalSigner, algorithm_for_key, get_signer, load_public_key, public_key_fingerprint
+from .models.documents import SigningKey, SigningKeyStatus
+
+
+class SigningKeyError(Exception):
+    pass
+
+
+class SigningKeyRegistry:
+    """
+    Registry khóa ký (bảng signing_keys) + cache khóa công khai đã parse theo key_id.
+    - Signature chỉ lưu key_id: verify không phải parse lại PEM ở mỗi dòng.
+    - Xoay vòng: đăng ký khóa mới ACTIVE, khóa cũ chuyển RETIRED (vẫn verify được).
+    - Thu hồi: chữ ký tạo sau revoked_at bị coi là không hợp lệ. Thu hồi có thể
+      chạy ở process khác (CLI), nên trạng thái trong cache chỉ được tin trong
+      SIGNING_KEY_STATUS_TTL_SECONDS rồi đọc lại từ DB.
+    """
+
+    # key_id -> (public key đã parse, revoked_at, thời điểm đọc trạng thái); dùng chung cho mọi purpose
+    _public_keys: Dict[UUID, Tuple[Any, Optional[datetime], float]] = {}
+
+    def __init__(self, signer):
+        self.signer = signer
+        # fingerprint -> (key_id của khóa đang ký, thời điểm đọc trạng thái)
+        self._active: Dict[str, Tuple[UUID, float]] = {}
+
+    @staticmethod
+    def _is_fresh(checked_at: float) -> bool:
+        return time.monotonic() - checked_at < settings.SIGNING_KEY_STATUS_TTL_SECONDS
+
+    @staticmethod
+    async def _read_status(db: AsyncSession, key_id: UUID) -> Optional[Tuple[SigningKeyStatus, Optional[datetime]]]:
+        result = await db.execute(
+            select(SigningKey.status, SigningKey.revoked_at).where(SigningKey.id == key_id)
+        )
+        return result.one_or_none()
+
+    async def _get_by_fingerprint(self, db: AsyncSession, fingerprint: str) -> Optional[SigningKey]:
+        result = await db.execute(select(SigningKey).where(SigningKey.fingerprint == fingerprint))
+        return result.scalar_one_or_none()
+
+    async def _register_active(self, info: Dict[str, str]) -> SigningKey:
+        """
+        Đăng ký khóa `info` (signer.adescribe()) làm ACTIVE, các khóa ACTIVE cũ cùng purpose -> RETIRED.
+        Chạy trong session riêng: không commit / rollback transaction của caller.
+        """
+        from ...db.database import SessionLocal
+
+        fingerprint = info["fingerprint"]
+        now = datetime.utcnow()
+        async with SessionLocal() as db:
+            await db.execute(
+                update(SigningKey)
+                .where(SigningKey.purpose == self.signer.purpose, SigningKey.status == SigningKeyStatus.ACTIVE)
+                .values(status=SigningKeyStatus.RETIRED, valid_to=now)
+            )
+            db_key = SigningKey(
+                fingerprint=fingerprint,
+                algorithm=info["algorithm"],
+                purpose=self.signer.purpose,
+                public_key_pem=info["public_key_pem"],
+                status=SigningKeyStatus.ACTIVE,
+                valid_from=now,
+            )
+            db.add(db_key)
+            try:
+                await db.commit()
+            except IntegrityError:
+                # Worker khác vừa đăng ký cùng khóa
+                await db.rollback()
+                db_key = await self._get_by_fingerprint(db, fingerprint)
+        self._active.clear()
+        return db_key
+
+    async def get_active_key_id(self, db: AsyncSession, fingerprint: Optional[str] = None) -> UUID:
+        """
+        key_id của khóa `fingerprint` (mặc định: khóa signer đang dùng); tự đăng ký
+        ở lần ký đầu tiên. Truyền fingerprint trả về cùng chữ ký để key_id luôn
+        khớp khóa đã ký, kể cả khi signing daemon vừa đổi khóa.
+        """
+        if not fingerprint:
+            fingerprint = (await self.signer.adescribe()).get("fingerprint")
+        if not fingerprint:
+            raise SigningKeyError("Internal Private Key chưa được tải hoặc không tồn tại.")
+        cached = self._active.get(fingerprint)
+        if cached is not None and self._is_fresh(cached[1]):
+            return cached[0]
+
+        if cached is not None:
+            # Hết TTL: chỉ đọc lại trạng thái (có thể vừa bị thu hồi ở process khác)
+            row = await self._read_status(db, cached[0])
+            key_id, key_status = cached[0], row.status if row is not None else None
+        else:
+            db_key = await self._get_by_fingerprint(db, fingerprint)
+            if db_key is None:
+                info = await self.signer.adescribe()
+                if info.get("fingerprint") != fingerprint:
+                    info = await self.signer.adescribe(refresh=True)
+                if info.get("fingerprint") != fingerprint:
+                    raise SigningKeyError(f"Khóa {fingerprint[:16]} không còn là khóa của signer, cần ký lại.")
+                db_key = await self._register_active(info)
+            key_id, key_status = db_key.id, db_key.status
+        if key_status != SigningKeyStatus.ACTIVE:
+            self._active.pop(fingerprint, None)
+            raise SigningKeyError(f"Khóa {fingerprint[:16]} đang ở trạng thái {key_status}, không được dùng để ký.")
+        self._active[fingerprint] = (key_id, time.monotonic())
+        return key_id
+
+    async def get_public_key(self, db: AsyncSession, key_id: UUID) -> Tuple[Any, Optional[datetime]]:
+        """(Khóa công khai đã parse, revoked_at) theo key_id; revoked_at được đọc lại khi hết TTL."""
+        cached = self._public_keys.get(key_id)
+        if cached is not None:
+            public_key, revoked_at, checked_at = cached
+            if not self._is_fresh(checked_at):
+                row = await self._read_status(db, key_id)
+                if row is None:
+                    self._public_keys.pop(key_id, None)
+                    raise SigningKeyError(f"Không tìm thấy khóa {key_id}")
+                revoked_at = row.revoked_at
+                self._public_keys[key_id] = (public_key, revoked_at, time.monotonic())
+            return public_key, revoked_at
+        db_key = await db.get(SigningKey, key_id)
+        if db_key is None:
+            raise SigningKeyError(f"Không tìm thấy khóa {key_id}")
+        public_key = load_public_key(db_key.public_key_pem)
+        self._public_keys[key_id] = (public_key, db_key.revoked_at, time.monotonic())
+        return public_key, db_key.revoked_at
+
+    async def rotate(self, db: AsyncSession, key_path: str, password: Optional[str] = None) -> SigningKey:
+        """Nạp private key mới cho signer và đăng ký nó; lịch sử chữ ký giữ nguyên."""
+        if not self.signer.load_key(key_path, password):
+            raise SigningKeyError(f"Không đọc được khóa tại {key_path}")
+        info = await self.signer.adescribe()
+        existing = await self._get_by_fingerprint(db, info["fingerprint"])
+        if existing is not None:
+            raise SigningKeyError("Khóa này đã có trong registry.")
+        return await self._register_active(info)
+
+    async def revoke(self, db: AsyncSession, key_id: UUID) -> SigningKey:
+        db_key = await db.get(SigningKey, key_id)
+        if db_key is None:
+            raise SigningKeyError(f"Không tìm thấy khóa {key_id}")
+        db_key.status = SigningKeyStatus.REVOKED
+        db_key.revoked_at = db_key.revoked_at or datetime.utcnow()
+        db_key.valid_to = db_key.valid_to or db_key.revoked_at
+        await db.commit()
+        self._public_keys.pop(key_id, None)
+        self._active = {fp: entry for fp, entry in self._active.items() if entry[0] != key_id}
+        return db_key
+
+
+async def register_external_key(db: AsyncSession, public_key_pem: str) -> UUID:
+    """
+    Đăng ký (hoặc tìm lại) khóa công khai do CA bên ngoài trả về, purpose EXTERNAL.
+    Không commit: caller commit cùng Signature.
+    """
+    public_key = load_public_key(public_key_pem)
+    fingerprint = public_key_fingerprint(public_key)
+    result = await db.execute(select(SigningKey.id).where(SigningKey.fingerprint == fingerprint))
+    key_id = result.scalar_one_or_none()
+    if key_id is not None:
+        return key_id
+    db_key = SigningKey(
+        fingerprint=fingerprint,
+        algorithm=algorithm_for_key(public_key).name,
+        purpose="EXTERNAL",
+        public_key_pem=public_key_pem,
+        status=SigningKeyStatus.ACTIVE,
+    )
+    db.add(db_key)
+    await db.flush()
+    return db_key.id
+
+
+_registries: Dict[str, SigningKeyRegistry] = {}
+
+
+def get_signing_key_registry(purpose: str = "FINAL") -> SigningKeyRegistry:
+    """Registry của signer theo purpose (INITIAL dùng khóa FINAL nếu chưa cấu hình khóa riêng)."""
+    signer = get_signer(purpose)
+    registry = _registries.get(signer.purpose)
+    if registry is None:
+        registry = _registries[signer.purpose] = SigningKeyRegistry(signer)
+    return registry
+
+
+signing_key_registry = get_signing_key_registry()
+
+
+async def _main(args) -> None:
+    from ...db.database import SessionLocal
+
+    async with SessionLocal() as db:
+        if args.command == "rotate":
+            # Signer cục bộ: hoạt động cả khi API ký qua signing daemon
+            signer = InternalSigner(args.key_path, args.purpose, args.password or "")
+            db_key = await SigningKeyRegistry(signer).rotate(db, args.key_path, args.password)
+            print(f"ACTIVE {db_key.id} {db_key.fingerprint}")
+        elif args.command == "revoke":
+            db_key = await signing_key_registry.revoke(db, UUID(args.key_id))
+            print(f"REVOKED {db_key.id} at {db_key.revoked_at.isoformat()}")
+
+
+if __name__ == "__main__":
+    # Xoay vòng / thu hồi khóa: python -m app.modules.documents.keys rotate keys/new.pem
+    # (các worker / signing daemon đang chạy cần restart với INTERNAL_PRIVATE_KEY_PATH mới)
+    parser = argparse.ArgumentParser(description="Quản lý registry khóa ký nội bộ")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rotate_parser = sub.add_parser("rotate")
+    rotate_parser.add_argument("key_path")
+    rotate_parser.add_argument("--password")
+    rotate_parser.add_argument("--purpose", choices=("FINAL", "INITIAL"), default="FINAL")
+    revoke_parser = sub.add_parser("revoke")
+    revoke_parser.add_argument("key_id")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,426 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterator, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import column, select, table
+
+from ...core.config import settings
+from ...core.ids import uuid7
+from .models.documents import AUDIT_ACTION_CODES, DOCUMENT_STATUS_CODES, AuditAction, AuditLog, DocumentStatus
+from .storage import AbstractStorageService, StorageResult, storage_service
+from .utils.merkle import ChunkTree, digest_file
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------------------
+# Nhập hồ sơ từ hệ thống cũ
+# -----------------------------------------------------------------------
+# Bố cục cũ (utils/file_handler.py): <root>/<DEPT>/<DOC>/V{n}_<tên>.pdf
+# - Quét cây thư mục song song theo phòng ban (thread).
+# - SHA-256 + chunk tree mỗi file trong process pool (một lần đọc).
+# - Ghi blob vào storage hiện tại (LOCAL / S3), giữ nguyên file gốc: mỗi file được
+#   copy ra thư mục tạm trong cùng lần đọc để băm, blob lưu từ bản sao đó, nên hệ
+#   thống cũ sửa file tại chỗ sau này không làm lệch file_hash đã ghi.
+# - Document / DocumentVersion / AuditLog ghi bằng COPY, mỗi batch một transaction.
+# - Checkpoint: file text, mỗi dòng DEPT/DOC đã commit; chạy lại thì bỏ qua.
+
+SOURCE = "legacy_import"
+VERSION_FILE = re.compile(r"^V(\d+)_.*\.pdf$", re.IGNORECASE)
+
+DOCUMENT_COLUMNS = (
+    "id", "title", "description", "status", "creator_id", "latest_version_id", "version_counter",
+    "created_at", "updated_at",
+)
+VERSION_COLUMNS = (
+    "id", "document_id", "version_number", "file_path", "file_name", "file_size", "mime_type",
+    "file_hash", "merkle_root", "uploaded_by_id", "created_at", "updated_at",
+)
+AUDIT_COLUMNS = ("id", "timestamp", "actor_id", "action", "document_id", "details")
+
+users = table("users", column("id"))
+
+
+@dataclass
+class LegacyVersion:
+    legacy_number: int
+    path: str
+    file_name: str
+    mtime: float
+
+
+@dataclass
+class LegacyDossier:
+    dept_code: str
+    doc_code: str
+    versions: List[LegacyVersion]
+
+    @property
+    def key(self) -> str:
+        return f"{self.dept_code}/{self.doc_code}"
+
+
+@dataclass
+class DossierRows:
+    """Các dòng COPY của một hồ sơ + blob đã ghi (để dọn nếu batch lỗi)."""
+    key: str
+    document: tuple
+    versions: List[tuple]
+    audits: List[tuple]
+    blob_paths: List[str]
+    size: int
+
+
+@dataclass
+class ImportReport:
+    dossiers: int = 0
+    files: int = 0
+    bytes: int = 0
+    skipped: int = 0
+    failed: int = 0
+    empty: int = 0
+    # Thời gian bận cộng dồn của từng bước (các hồ sơ chạy chồng lên nhau)
+    scan_seconds: float = 0.0
+    hash_seconds: float = 0.0
+    store_seconds: float = 0.0
+    copy_seconds: float = 0.0
+    started: float = field(default_factory=time.perf_counter)
+
+    def lines(self, dry_run: bool, hash_workers: int) -> List[str]:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        mode = " (dry run)" if dry_run else ""
+        return [
+            f"Legacy import{mode}: {self.dossiers} dossiers, {self.files} files, "
+            f"{self.bytes / 2**30:.2f} GiB in {elapsed:.1f}s",
+            f"  throughput: {self.dossiers / elapsed:.1f} dossiers/s, {self.files / elapsed:.1f} files/s, "
+            f"{self.bytes / 2**20 / elapsed:.1f} MiB/s",
+            f"  skipped (already imported): {self.skipped}, failed: {self.failed}, empty folders: {self.empty}",
+            f"  busy time: scan {self.scan_seconds:.1f}s, hash {self.hash_seconds:.1f}s "
+            f"({hash_workers} processes), store {self.store_seconds:.1f}s, COPY {self.copy_seconds:.1f}s",
+        ]
+
+
+# -----------------------------------------------------------------------
+# Quét cây thư mục
+# -----------------------------------------------------------------------
+def scan_department(dept_path: str, dept_code: str) -> Tuple[List[LegacyDossier], int]:
+    """Các hồ sơ của một phòng ban và số thư mục không có file V{n}_*.pdf."""
+    dossiers: List[LegacyDossier] = []
+    empty = 0
+    with os.scandir(dept_path) as entries:
+        for entry in entries:
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            versions = []
+            with os.scandir(entry.path) as files:
+                for f in files:
+                    match = VERSION_FILE.match(f.name)
+                    if match and f.is_file(follow_symlinks=False):
+                        versions.append(LegacyVersion(int(match.group(1)), f.path, f.name, f.stat().st_mtime))
+            if not versions:
+                empty += 1
+                continue
+            # Đánh số lại 1..n theo V{n} (hệ thống cũ có thể trùng / nhảy số), tên gốc giữ ở file_name
+            versions.sort(key=lambda v: (v.legacy_number, v.file_name))
+            dossiers.append(LegacyDossier(dept_code, entry.name, versions))
+    return dossiers, empty
+
+
+async def scan_tree(root: str) -> Tuple[List[LegacyDossier], int]:
+    with os.scandir(root) as entries:
+        departments = [(entry.path, entry.name) for entry in entries if entry.is_dir(follow_symlinks=False)]
+    results = await asyncio.gather(*(asyncio.to_thread(scan_department, path, name) for path, name in departments))
+    dossiers = [dossier for found, _ in results for dossier in found]
+    return dossiers, sum(empty for _, empty in results)
+
+
+# -----------------------------------------------------------------------
+# Checkpoint
+# -----------------------------------------------------------------------
+class ImportCheckpoint:
+    """File text append-only: một dòng DEPT/DOC cho mỗi hồ sơ đã commit, fsync sau mỗi batch."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+
+    def load(self) -> None:
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                self.done = {line.strip() for line in f if line.strip()}
+
+    def record(self, keys: List[str]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(key + "\n" for key in keys))
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update(keys)
+
+
+async def imported_keys() -> Set[str]:
+    """
+    Hồ sơ đã có trong DB (audit CREATE của lần nhập trước). Bù cho trường hợp
+    batch đã commit nhưng tiến trình dừng trước khi kịp ghi checkpoint.
+    """
+    from ...db.database import SessionLocal
+
+    async with SessionLocal() as db:
+        rows = await db.execute(
+            select(AuditLog.details["legacy_key"].astext)
+            .where(AuditLog.action == AuditAction.CREATE, AuditLog.details.contains({"source": SOURCE}))
+        )
+        return {key for key in rows.scalars() if key}
+
+
+async def copy_batch(batch: List[DossierRows]) -> None:
+    """Ghi một batch bằng COPY (giao thức binary của asyncpg) trong một transaction."""
+    from ...db.database import engine
+
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        driver = raw.driver_connection
+        async with driver.transaction():
+            await driver.copy_records_to_table(
+                "documents", records=[rows.document for rows in batch], columns=DOCUMENT_COLUMNS
+            )
+            await driver.copy_records_to_table(
+                "document_versions", records=[v for rows in batch for v in rows.versions], columns=VERSION_COLUMNS
+            )
+            await driver.copy_records_to_table(
+                "audit_logs", records=[a for rows in batch for a in rows.audits], columns=AUDIT_COLUMNS
+            )
+
+
+# -----------------------------------------------------------------------
+# Importer
+# -----------------------------------------------------------------------
+class LegacyImporter:
+    def __init__(
+        self,
+        root: str,
+        creator_id: UUID,
+        checkpoint_path: str,
+        status: DocumentStatus = DocumentStatus.DRAFT,
+        storage: AbstractStorageService = storage_service,
+        batch_size: int = settings.LEGACY_IMPORT_BATCH_SIZE,
+        hash_workers: int = settings.LEGACY_IMPORT_HASH_WORKERS,
+        store_concurrency: int = settings.LEGACY_IMPORT_STORE_CONCURRENCY,
+        dry_run: bool = False,
+        work_dir: str = settings.UPLOAD_SESSION_DIR,
+    ):
+        self.root = root
+        self.creator_id = creator_id
+        self.checkpoint = ImportCheckpoint(checkpoint_path)
+        self.status = status
+        self.storage = storage
+        self.batch_size = batch_size
+        self.hash_workers = hash_workers
+        self.store_concurrency = store_concurrency
+        self.dry_run = dry_run
+        # Cùng filesystem với LOCAL_STORAGE_DIR: store_file chỉ cần đổi tên bản sao
+        self.work_dir = work_dir
+        self.report = ImportReport()
+        self._store_semaphore = asyncio.Semaphore(store_concurrency)
+        self._flush_lock = asyncio.Lock()
+        self._batch: List[DossierRows] = []
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def build_rows(self, dossier: LegacyDossier, stored: List[StorageResult], blob_paths: List[str]) -> DossierRows:
+        document_id = uuid7()
+        version_rows, audit_rows = [], []
+        latest_version_id = None
+        for number, (version, result) in enumerate(zip(dossier.versions, stored), start=1):
+            version_id = uuid7()
+            # Mốc thời gian lịch sử = mtime của file (timeline / sổ hồ sơ theo đúng ngày cũ)
+            at = datetime.utcfromtimestamp(version.mtime)
+            version_rows.append((
+                version_id, document_id, number, result.file_path, version.file_name, result.file_size,
+                "application/pdf", result.file_hash, result.merkle_root, self.creator_id, at, at,
+            ))
+            details = {"filename": version.file_name, "size": result.file_size, "version": number,
+                       "source": SOURCE, "legacy_path": os.path.relpath(version.path, self.root)}
+            action = AuditAction.CREATE if number == 1 else AuditAction.UPLOAD_VERSION
+            if action == AuditAction.CREATE:
+                details["legacy_key"] = dossier.key
+            audit_rows.append((
+                uuid7(), at, self.creator_id, AUDIT_ACTION_CODES[action], document_id,
+                json.dumps(details, ensure_ascii=False),
+            ))
+            latest_version_id = version_id
+
+        created_at = datetime.utcfromtimestamp(dossier.versions[0].mtime)
+        updated_at = datetime.utcfromtimestamp(dossier.versions[-1].mtime)
+        document_row = (
+            document_id, dossier.doc_code, f"Nhập từ hệ thống cũ: {dossier.key}",
+            DOCUMENT_STATUS_CODES[self.status], self.creator_id, latest_version_id, len(version_rows),
+            created_at, updated_at,
+        )
+        return DossierRows(dossier.key, document_row, version_rows, audit_rows, blob_paths,
+                           sum(result.file_size for result in stored))
+
+    async def _delete_blobs(self, paths: List[str]) -> None:
+        for path in paths:
+            try:
+                await self.storage.delete(path)
+            except Exception as e:
+                logger.warning(f"Could not remove orphan blob {path}: {e}")
+
+    async def _store(self, snapshot_path: str, version: LegacyVersion, file_hash: str,
+                     tree: ChunkTree) -> StorageResult:
+        async with self._store_semaphore:
+            # Bản sao thuộc về importer: store_file được chuyển / xóa nó
+            return await self.storage.store_file(snapshot_path, version.file_name, file_hash, tree.file_size, tree=tree)
+
+    async def import_dossier(self, dossier: LegacyDossier) -> DossierRows:
+        loop = asyncio.get_running_loop()
+        if self.dry_run:
+            start = time.perf_counter()
+            digests = await asyncio.gather(*(
+                loop.run_in_executor(self._pool, digest_file, version.path) for version in dossier.versions
+            ))
+            self.report.hash_seconds += time.perf_counter() - start
+            stored = [
+                StorageResult(file_path=version.path, file_hash=file_hash, file_size=tree.file_size,
+                              merkle_root=tree.root_hex)
+                for version, (file_hash, tree) in zip(dossier.versions, digests)
+            ]
+            return self.build_rows(dossier, stored, [])
+
+        os.makedirs(self.work_dir, exist_ok=True)
+        snapshots = [os.path.join(self.work_dir, f"legacy-{uuid7().hex}.pdf") for _ in dossier.versions]
+        try:
+            start = time.perf_counter()
+            digests = await asyncio.gather(*(
+                loop.run_in_executor(self._pool, digest_file, version.path, settings.MERKLE_LEAF_SIZE, snapshot)
+                for version, snapshot in zip(dossier.versions, snapshots)
+            ))
+            self.report.hash_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            results = await asyncio.gather(
+                *(self._store(snapshot, version, file_hash, tree)
+                  for snapshot, version, (file_hash, tree) in zip(snapshots, dossier.versions, digests)),
+                return_exceptions=True,
+            )
+            self.report.store_seconds += time.perf_counter() - start
+        finally:
+            for snapshot in snapshots:
+                if os.path.exists(snapshot):
+                    os.remove(snapshot)
+        stored = [result for result in results if isinstance(result, StorageResult)]
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            await self._delete_blobs([result.file_path for result in stored])
+            raise errors[0]
+        return self.build_rows(dossier, stored, [result.file_path for result in stored])
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            batch, self._batch = self._batch, []
+            if not batch:
+                return
+            if not self.dry_run:
+                start = time.perf_counter()
+                try:
+                    await copy_batch(batch)
+                except Exception:
+                    # Batch không vào DB: dọn blob để chạy lại không để file mồ côi
+                    await self._delete_blobs([path for rows in batch for path in rows.blob_paths])
+                    raise
+                self.report.copy_seconds += time.perf_counter() - start
+                self.checkpoint.record([rows.key for rows in batch])
+            self.report.dossiers += len(batch)
+            self.report.files += sum(len(rows.versions) for rows in batch)
+            self.report.bytes += sum(rows.size for rows in batch)
+            logger.info(f"{self.report.dossiers} dossiers / {self.report.files} files imported")
+
+    async def _worker(self, dossiers: Iterator[LegacyDossier]) -> None:
+        # Một event loop: next() trên iterator chung không cần khóa
+        for dossier in dossiers:
+            try:
+                rows = await self.import_dossier(dossier)
+            except Exception as e:
+                self.report.failed += 1
+                logger.warning(f"{dossier.key}: {e}")
+                continue
+            self._batch.append(rows)
+            if len(self._batch) >= self.batch_size:
+                await self.flush()
+
+    async def run(self) -> ImportReport:
+        self.checkpoint.load()
+        if not self.dry_run:
+            self.checkpoint.done |= await imported_keys()
+
+        start = time.perf_counter()
+        dossiers, self.report.empty = await scan_tree(self.root)
+        self.report.scan_seconds = time.perf_counter() - start
+        pending = [dossier for dossier in dossiers if dossier.key not in self.checkpoint.done]
+        self.report.skipped = len(dossiers) - len(pending)
+        logger.info(f"Found {len(dossiers)} dossiers, {len(pending)} to import")
+
+        shared = iter(pending)
+        with ProcessPoolExecutor(max_workers=self.hash_workers) as pool:
+            self._pool = pool
+            # Đủ hồ sơ đang xử lý để process pool và storage cùng bận
+            workers = [asyncio.create_task(self._worker(shared))
+                       for _ in range(self.hash_workers + self.store_concurrency)]
+            try:
+                await asyncio.gather(*workers)
+                await self.flush()
+            except BaseException:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                await self._delete_blobs([path for rows in self._batch for path in rows.blob_paths])
+                raise
+        return self.report
+
+
+async def _main(args) -> None:
+    from ...db.database import SessionLocal
+
+    creator_id = UUID(args.creator_id)
+    if not args.dry_run:
+        async with SessionLocal() as db:
+            if (await db.execute(select(users.c.id).where(users.c.id == creator_id))).first() is None:
+                raise SystemExit(f"User {creator_id} does not exist")
+    importer = LegacyImporter(
+        root=args.root,
+        creator_id=creator_id,
+        checkpoint_path=args.checkpoint,
+        status=DocumentStatus[args.status],
+        batch_size=args.batch_size,
+        hash_workers=args.hash_workers,
+        store_concurrency=args.store_concurrency,
+        dry_run=args.dry_run,
+    )
+    report = await importer.run()
+    for line in report.lines(args.dry_run, args.hash_workers):
+        print(line)
+    if not args.dry_run and report.dossiers:
+        print("Build the search index for imported dossiers: python -m app.modules.documents.search reindex")
+
+
+if __name__ == "__main__":
+    # python -m app.modules.documents.legacy_import --creator-id <uuid> [--root /var/data/hoso] [--dry-run]
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Nhập hồ sơ từ cây thư mục của hệ thống cũ")
+    parser.add_argument("--root", default=settings.LEGACY_IMPORT_ROOT)
+    parser.add_argument("--creator-id", required=True, help="User đứng tên người tạo / upload các hồ sơ nhập")
+    parser.add_argument("--status", default=DocumentStatus.DRAFT.name, choices=[s.name for s in DocumentStatus])
+    parser.add_argument("--checkpoint", default="legacy_import.checkpoint",
+                        help="File ghi các hồ sơ đã nhập (chạy lại sẽ tiếp tục từ đây)")
+    parser.add_argument("--batch-size", type=int, default=settings.LEGACY_IMPORT_BATCH_SIZE)
+    parser.add_argument("--hash-workers", type=int, default=settings.LEGACY_IMPORT_HASH_WORKERS)
+    parser.add_argument("--store-concurrency", type=int, default=settings.LEGACY_IMPORT_STORE_CONCURRENCY)
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ quét và băm, không ghi storage / DB")
+    asyncio.run(_main(parser.parse_args()))
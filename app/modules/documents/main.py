@@ -0,0 +1,8 @@
+from fastapi import APIRouter
+
+from .api import router_documents, router_external_ca, router_uploads
+
+router = APIRouter()
+router.include_router(router_documents.router)
+router.include_router(router_uploads.router)
+router.include_router(router_external_ca.router)
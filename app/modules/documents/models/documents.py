@@ -3,10 +3,12 @@ from enum import Enum
 from typing import TYPE_CHECKING, List, Optional
 from uuid import UUID, uuid4
 
-from sqlalchemy import Column, ForeignKey, Index, String, Text
-from sqlalchemy.dialects.postgresql import JSONB, UUID as PG_UUID
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, LargeBinary, String, Text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR, UUID as PG_UUID
 from sqlmodel import Field, Relationship, SQLModel
 
+from ....core.ids import uuid7
+from ....db.types import SmallIntEnum
 from .mixins import TimestampMixin
 
 if TYPE_CHECKING:
@@ -42,6 +44,49 @@ class AuditAction(str, Enum):
     DELETE = "DELETE"  # Chỉ dùng cho Soft Delete hoặc Admin đặc biệt
 
 
+# Mã smallint lưu trong DB (xem SmallIntEnum). Chỉ thêm mã mới, không đổi mã cũ.
+DOCUMENT_STATUS_CODES = {
+    DocumentStatus.DRAFT: 1,
+    DocumentStatus.SUBMITTED: 2,
+    DocumentStatus.LOCKED_BY_CHECKER: 3,
+    DocumentStatus.REJECTED: 4,
+    DocumentStatus.APPROVED: 5,
+    DocumentStatus.COMPLETED: 6,
+}
+
+AUDIT_ACTION_CODES = {
+    AuditAction.CREATE: 1,
+    AuditAction.UPLOAD_VERSION: 2,
+    AuditAction.SUBMIT: 3,
+    AuditAction.LOCK: 4,
+    AuditAction.APPROVE: 5,
+    AuditAction.REJECT: 6,
+    AuditAction.SIGN_INTERNAL: 7,
+    AuditAction.SIGN_EXTERNAL: 8,
+    AuditAction.DELETE: 9,
+}
+
+
+class SigningKeyStatus(str, Enum):
+    """
+    Vòng đời của một khóa ký trong registry.
+    """
+    ACTIVE = "ACTIVE"      # Khóa đang dùng để ký (tối đa một khóa ACTIVE cho mỗi purpose)
+    RETIRED = "RETIRED"    # Đã xoay vòng: không ký mới, vẫn dùng để verify chữ ký cũ
+    REVOKED = "REVOKED"    # Bị thu hồi (lộ khóa): chữ ký sau revoked_at không còn tin cậy
+
+
+class ExternalSignStatus(str, Enum):
+    """
+    Trạng thái một yêu cầu ký qua CA bên ngoài.
+    """
+    PENDING = "PENDING"        # Đã ghi nhận, chưa gửi được tới CA
+    REQUESTED = "REQUESTED"    # CA đã nhận, chờ callback
+    COMPLETED = "COMPLETED"    # Callback trả chữ ký
+    REJECTED = "REJECTED"      # Người ký / CA từ chối
+    FAILED = "FAILED"          # Không gửi được (CA lỗi, mạch mở)
+
+
 # --- Models ---
 
 class Document(TimestampMixin, SQLModel, table=True):
@@ -52,8 +97,8 @@ class Document(TimestampMixin, SQLModel, table=True):
     __tablename__ = "documents"
 
     id: UUID = Field(
-        default_factory=uuid4,
-        sa_column=Column(PG_UUID(as_uuid=True), primary_key=True, index=True),
+        default_factory=uuid7,
+        sa_column=Column(PG_UUID(as_uuid=True), primary_key=True),
     )
 
     title: str = Field(index=True, max_length=255, nullable=False)
@@ -62,7 +107,7 @@ class Document(TimestampMixin, SQLModel, table=True):
     # Trạng thái hiện tại của quy trình
     status: DocumentStatus = Field(
         default=DocumentStatus.DRAFT,
-        sa_column=Column(String, nullable=False, index=True) 
+        sa_column=Column(SmallIntEnum(DocumentStatus, DOCUMENT_STATUS_CODES), nullable=False, index=True)
     )
 
     # Người tạo hồ sơ (thường là SENDER)
@@ -80,6 +125,12 @@ class Document(TimestampMixin, SQLModel, table=True):
         sa_column=Column(PG_UUID(as_uuid=True), nullable=True)
     )
 
+    # Bộ đếm cấp version_number (xem versions.insert_next_version), tăng cùng câu INSERT phiên bản
+    version_counter: int = Field(
+        default=0,
+        sa_column=Column(Integer, nullable=False, server_default="0")
+    )
+
     # Quan hệ
     creator: "User" = Relationship(back_populates="documents")
     versions: List["DocumentVersion"] = Relationship(
@@ -100,7 +151,7 @@ class DocumentVersion(TimestampMixin, SQLModel, table=True):
     )
 
     id: UUID = Field(
-        default_factory=uuid4,
+        default_factory=uuid7,
         sa_column=Column(PG_UUID(as_uuid=True), primary_key=True),
     )
 
@@ -127,6 +178,14 @@ class DocumentVersion(TimestampMixin, SQLModel, table=True):
         description="SHA-256 Hash của file"
     )
 
+    # Merkle root của các leaf cố định (MERKLE_LEAF_SIZE); leaf hash nằm trong
+    # sidecar <file_path>.merkle. NULL với phiên bản cũ chỉ có file_hash.
+    merkle_root: Optional[str] = Field(
+        default=None,
+        max_length=64,
+        description="Chunk-tree (Merkle) root, hex",
+    )
+
     # Người upload phiên bản này
     uploaded_by_id: UUID = Field(
         sa_column=Column(PG_UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
@@ -135,7 +194,45 @@ class DocumentVersion(TimestampMixin, SQLModel, table=True):
     # Quan hệ
     document: Document = Relationship(back_populates="versions")
     uploaded_by: "User" = Relationship()
-    signatures: List["Signature"] = Relationship(back_populates="document_version")
+    signatures: List["Signature"] = Relationship(
+        back_populates="document_version",
+        sa_relationship_kwargs={"foreign_keys": "[Signature.document_version_id]"},
+    )
+
+
+class SigningKey(TimestampMixin, SQLModel, table=True):
+    """
+    Registry khóa công khai dùng để ký.
+    Signature chỉ tham chiếu key_id thay vì lưu lại PEM trên mỗi dòng;
+    xoay vòng khóa chỉ thêm dòng mới, không sửa lịch sử chữ ký.
+    """
+    __tablename__ = "signing_keys"
+
+    id: UUID = Field(
+        default_factory=uuid4,
+        sa_column=Column(PG_UUID(as_uuid=True), primary_key=True),
+    )
+
+    # SHA-256 (hex) của SubjectPublicKeyInfo DER
+    fingerprint: str = Field(
+        sa_column=Column(String(64), nullable=False, unique=True, index=True)
+    )
+    algorithm: str = Field(max_length=32, description="RSA_PSS_SHA256 / ED25519 / ECDSA_P256_SHA256")
+    # FINAL: chữ ký pháp lý (Manager), INITIAL: ký nháy. Mỗi purpose có tối đa một khóa ACTIVE.
+    purpose: str = Field(default="FINAL", max_length=16, index=True)
+    public_key_pem: str = Field(sa_column=Column(Text, nullable=False))
+
+    status: SigningKeyStatus = Field(
+        default=SigningKeyStatus.ACTIVE,
+        sa_column=Column(String, nullable=False, index=True)
+    )
+
+    # Khoảng thời gian khóa được dùng để ký
+    valid_from: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime, nullable=False))
+    valid_to: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, nullable=True))
+    revoked_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, nullable=True))
+
+    signatures: List["Signature"] = Relationship(back_populates="key")
 
 
 class Signature(TimestampMixin, SQLModel, table=True):
@@ -145,7 +242,7 @@ class Signature(TimestampMixin, SQLModel, table=True):
     __tablename__ = "signatures"
 
     id: UUID = Field(
-        default_factory=uuid4,
+        default_factory=uuid7,
         sa_column=Column(PG_UUID(as_uuid=True), primary_key=True),
     )
 
@@ -153,7 +250,8 @@ class Signature(TimestampMixin, SQLModel, table=True):
         sa_column=Column(
             PG_UUID(as_uuid=True), 
             ForeignKey("document_versions.id", ondelete="CASCADE"), 
-            nullable=False
+            nullable=False,
+            index=True,
         )
     )
 
@@ -166,12 +264,116 @@ class Signature(TimestampMixin, SQLModel, table=True):
     signature_type: str = Field(default="INTERNAL", description="INTERNAL (RSA) hoặc EXTERNAL (USB Token)")
 
     # Dữ liệu kỹ thuật
-    signature_value: Optional[str] = Field(sa_column=Column(Text), description="Chuỗi ký tự chữ ký (Base64)")
-    public_key: Optional[str] = Field(sa_column=Column(Text), description="Public Key dùng để verify")
+    signature_value: Optional[bytes] = Field(
+        default=None, sa_column=Column(LargeBinary), description="Chữ ký dạng raw bytes (bytea)"
+    )
+    # Khóa dùng để verify (registry). NULL với chữ ký EXTERNAL chưa đăng ký khóa.
+    key_id: Optional[UUID] = Field(
+        default=None,
+        sa_column=Column(
+            PG_UUID(as_uuid=True),
+            ForeignKey("signing_keys.id", ondelete="RESTRICT"),
+            nullable=True,
+            index=True,
+        )
+    )
+
+    # Ký theo lô (Merkle-batched): signature_value là chữ ký trên batch_root, dùng chung cho cả lô;
+    # batch_proof là inclusion proof của file_hash trong lô. NULL với chữ ký đơn lẻ.
+    batch_root: Optional[str] = Field(default=None, max_length=64, description="Merkle root đã ký (hex)")
+    batch_proof: Optional[list] = Field(default=None, sa_column=Column(JSONB))
+
+    # Phiên bản PDF mang chữ ký PAdES nhúng (incremental update của phiên bản đã ký hash)
+    embedded_version_id: Optional[UUID] = Field(
+        default=None,
+        sa_column=Column(
+            PG_UUID(as_uuid=True),
+            ForeignKey("document_versions.id", ondelete="SET NULL"),
+            nullable=True,
+        )
+    )
+
+    # PDF ký bằng USB Token (PAdES): kết quả xác thực chữ ký nhúng và bộ Root CA đã dùng
+    validation: Optional[dict] = Field(default=None, sa_column=Column(JSONB))
+    trust_store_version: Optional[str] = Field(default=None, max_length=16)
+    validated_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, nullable=True))
 
     # Quan hệ
-    document_version: DocumentVersion = Relationship(back_populates="signatures")
+    document_version: DocumentVersion = Relationship(
+        back_populates="signatures",
+        sa_relationship_kwargs={"foreign_keys": "[Signature.document_version_id]"},
+    )
     signer: "User" = Relationship()
+    key: Optional[SigningKey] = Relationship(back_populates="signatures")
+
+
+class ExternalSignRequest(TimestampMixin, SQLModel, table=True):
+    """
+    Yêu cầu ký qua CA bên ngoài. `id` chính là external_request_id gửi cho CA
+    (kiêm Idempotency-Key); callback được khớp theo id này và chỉ xử lý một lần.
+    """
+    __tablename__ = "external_sign_requests"
+
+    id: UUID = Field(
+        default_factory=uuid4,
+        sa_column=Column(PG_UUID(as_uuid=True), primary_key=True),
+    )
+
+    document_version_id: UUID = Field(
+        sa_column=Column(
+            PG_UUID(as_uuid=True),
+            ForeignKey("document_versions.id", ondelete="CASCADE"),
+            nullable=False,
+            index=True,
+        )
+    )
+    signer_id: UUID = Field(
+        sa_column=Column(PG_UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    )
+
+    provider: str = Field(max_length=32)
+    provider_reference: Optional[str] = Field(default=None, max_length=255)
+    status: ExternalSignStatus = Field(
+        default=ExternalSignStatus.PENDING,
+        sa_column=Column(String, nullable=False, index=True)
+    )
+    error: Optional[str] = Field(default=None, sa_column=Column(Text))
+
+    # Chữ ký tạo ra từ callback (NULL khi chưa hoàn tất)
+    signature_id: Optional[UUID] = Field(
+        default=None,
+        sa_column=Column(PG_UUID(as_uuid=True), ForeignKey("signatures.id", ondelete="SET NULL"), nullable=True)
+    )
+    completed_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime, nullable=True))
+
+
+class DocumentSearch(SQLModel, table=True):
+    """
+    Chỉ mục tìm kiếm của hồ sơ (một dòng / hồ sơ, theo phiên bản mới nhất).
+    Tách khỏi bảng documents để text trích từ PDF không làm phình các truy vấn trạng thái.
+    Mọi text đã được chuẩn hóa (chữ thường, bỏ dấu tiếng Việt) bằng search.fold_text.
+    """
+    __tablename__ = "document_search"
+    __table_args__ = (
+        Index("ix_document_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_document_search_title_trgm", "search_title", postgresql_using="gin",
+              postgresql_ops={"search_title": "gin_trgm_ops"}),
+    )
+
+    document_id: UUID = Field(
+        sa_column=Column(PG_UUID(as_uuid=True), ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True)
+    )
+    # Phiên bản đã trích text; khác latest_version_id -> cần trích lại
+    version_id: Optional[UUID] = Field(default=None, sa_column=Column(PG_UUID(as_uuid=True), nullable=True))
+
+    # Tiêu đề + mô tả (trigram: tìm một phần tên, có / không dấu)
+    search_title: str = Field(default="", sa_column=Column(Text, nullable=False, server_default=""))
+    # Text trích từ PDF (cắt ở SEARCH_MAX_TEXT_CHARS)
+    body: str = Field(default="", sa_column=Column(Text, nullable=False, server_default=""))
+    # Tiêu đề (A) + mô tả (B) + nội dung (C)
+    search_vector: Optional[str] = Field(default=None, sa_column=Column(TSVECTOR))
+
+    indexed_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime, nullable=False))
 
 
 class AuditLog(SQLModel, table=True):
@@ -180,9 +382,16 @@ class AuditLog(SQLModel, table=True):
     Không kế thừa TimestampMixin vì chỉ cần created_at (timestamp), không cần updated_at.
     """
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        # "Mọi thao tác trên hồ sơ Y / của người X trong khoảng thời gian": equality + range trên một index
+        Index("ix_audit_logs_document_timestamp", "document_id", "timestamp"),
+        Index("ix_audit_logs_actor_timestamp", "actor_id", "timestamp"),
+        # details @> '{...}' / details @? '$.path ? (...)'; jsonb_path_ops nhỏ hơn jsonb_ops nhiều lần
+        Index("ix_audit_logs_details", "details", postgresql_using="gin", postgresql_ops={"details": "jsonb_path_ops"}),
+    )
 
     id: UUID = Field(
-        default_factory=uuid4,
+        default_factory=uuid7,
         sa_column=Column(PG_UUID(as_uuid=True), primary_key=True),
     )
 
@@ -194,7 +403,7 @@ class AuditLog(SQLModel, table=True):
         sa_column=Column(PG_UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"))
     )
 
-    action: AuditAction = Field(sa_column=Column(String, nullable=False))
+    action: AuditAction = Field(sa_column=Column(SmallIntEnum(AuditAction, AUDIT_ACTION_CODES), nullable=False))
 
     # Context (Liên quan đến hồ sơ nào)
     document_id: Optional[UUID] = Field(
@@ -0,0 +1,414 @@
+import asyncio
+import glob
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+import aiofiles
+
+from ...core.config import settings
+from ...core.metrics import registry
+
+if TYPE_CHECKING:
+    from .storage import AbstractStorageService, StorageResult
+
+logger = logging.getLogger(__name__)
+
+PADES_VALIDATION_LATENCY = registry.histogram(
+    "pades_validation_duration_seconds", "Time spent validating embedded PDF signatures (cache misses)."
+)
+PADES_VALIDATION_CACHE = registry.counter(
+    "pades_validation_cache_total", "PAdES validation cache lookups.", ("outcome",)
+)
+PADES_EMBED_LATENCY = registry.histogram(
+    "pades_embed_duration_seconds", "Time spent appending a PAdES signature to a PDF (incl. spooling)."
+)
+
+TRUST_ROOT_PATTERNS = ("*.pem", "*.crt", "*.cer", "*.der")
+EOF_MARKER = b"%%EOF"
+READ_SIZE = 1024 * 1024
+
+
+class PAdESValidationError(Exception):
+    pass
+
+
+def trust_root_paths(trust_dir: str = settings.PADES_TRUST_ROOTS_DIR) -> List[str]:
+    paths = set()
+    for pattern in TRUST_ROOT_PATTERNS:
+        paths.update(glob.glob(os.path.join(trust_dir, pattern)))
+    return sorted(paths)
+
+
+def compute_trust_store_version(paths: List[str]) -> str:
+    """Hash nội dung các chứng thư Root CA: thêm/bớt/đổi một file là ra version mới."""
+    cert_hashes = []
+    for path in paths:
+        with open(path, "rb") as f:
+            cert_hashes.append(hashlib.sha256(f.read()).digest())
+    digest = hashlib.sha256()
+    for cert_hash in sorted(cert_hashes):
+        digest.update(cert_hash)
+    return digest.hexdigest()[:16]
+
+
+# -----------------------------------------------------------------------
+# Worker process: ValidationContext sống suốt vòng đời process
+# -----------------------------------------------------------------------
+_validation_context = None
+
+
+def _init_worker(paths: List[str], allow_fetching: bool) -> None:
+    global _validation_context
+    from pyhanko.keys import load_cert_from_pemder
+    from pyhanko_certvalidator import ValidationContext
+
+    # Parse trust roots một lần cho mỗi worker, không parse lại ở mỗi file
+    trust_roots = [load_cert_from_pemder(path) for path in paths]
+    _validation_context = ValidationContext(trust_roots=trust_roots, allow_fetching=allow_fetching)
+
+
+def _check_approved_revision(f, embedded, approved_hash: str, approved_size: int) -> Optional[str]:
+    """
+    None nếu file ký đúng là bản đã duyệt + các incremental update: `approved_size`
+    byte đầu có SHA-256 = `approved_hash`, chữ ký đầu tiên bao phủ trọn phần đó
+    và được thêm ngay sau nó (không có revision chen giữa). Ngược lại: lý do.
+    """
+    sha256_hash = hashlib.sha256()
+    f.seek(0)
+    remaining = approved_size
+    while remaining:
+        chunk = f.read(min(READ_SIZE, remaining))
+        if not chunk:
+            return "File ngắn hơn bản đã duyệt."
+        sha256_hash.update(chunk)
+        remaining -= len(chunk)
+    if sha256_hash.hexdigest() != approved_hash:
+        return "Phần gốc của file không khớp phiên bản đã duyệt."
+
+    # ByteRange = [0, đầu /Contents, cuối /Contents, độ dài phần sau]
+    ranges = sorted([int(x) for x in sig.sig_object["/ByteRange"]] for sig in embedded)
+    start, contents_start, contents_end, tail = ranges[0]
+    if start != 0 or contents_start < approved_size:
+        return "Chữ ký không bao phủ phiên bản đã duyệt."
+    f.seek(approved_size)
+    update = f.read(contents_start - approved_size)
+    f.seek(contents_end)
+    update += f.read(tail)
+    # Revision đầu tiên sau bản duyệt chỉ được có một %%EOF (của chính nó) ở cuối
+    if update.count(EOF_MARKER) != 1 or not update.rstrip().endswith(EOF_MARKER):
+        return "File có chỉnh sửa giữa phiên bản đã duyệt và chữ ký."
+    return None
+
+
+def _validate_pdf(path: str, approved_hash: Optional[str] = None, approved_size: Optional[int] = None) -> dict:
+    """
+    Xác thực mọi chữ ký nhúng trong PDF tại `path`. Hồ sơ hợp lệ khi mọi chữ ký
+    intact + valid + trusted (và DocMDP ok), chữ ký cuối bao phủ toàn bộ file,
+    và (nếu có `approved_hash`) chữ ký được đặt trên đúng bản đã duyệt.
+    """
+    from pyhanko.pdf_utils.reader import PdfFileReader
+    from pyhanko.sign.validation import validate_pdf_signature
+    from pyhanko.sign.validation.status import SignatureCoverageLevel
+
+    with open(path, "rb") as f:
+        try:
+            reader = PdfFileReader(f)
+            embedded = reader.embedded_signatures
+        except Exception as e:
+            return {"valid": False, "error": f"Không đọc được PDF: {e}", "signatures": []}
+
+        signatures = []
+        for sig in embedded:
+            try:
+                status = validate_pdf_signature(sig, _validation_context)
+            except Exception as e:
+                signatures.append({"field_name": sig.field_name, "ok": False, "error": str(e)})
+                continue
+            cert = status.signing_cert
+            signatures.append({
+                "field_name": sig.field_name,
+                "signer_subject": cert.subject.human_friendly if cert else None,
+                "signer_cert_sha256": hashlib.sha256(cert.dump()).hexdigest() if cert else None,
+                "signing_time": status.signer_reported_dt.isoformat() if status.signer_reported_dt else None,
+                "intact": status.intact,
+                "valid": status.valid,
+                "trusted": status.trusted,
+                "coverage": status.coverage.name if status.coverage else None,
+                "docmdp_ok": status.docmdp_ok,
+                "md_algorithm": status.md_algorithm,
+                "summary": status.summary(),
+                "ok": status.bottom_line,
+            })
+
+        error = None if signatures else "File không có chữ ký."
+        approved_revision_ok = None
+        if approved_hash is not None and embedded:
+            try:
+                error = _check_approved_revision(f, embedded, approved_hash, approved_size)
+            except Exception as e:
+                error = f"Không đọc được ByteRange: {e}"
+            approved_revision_ok = error is None
+
+    last = signatures[-1] if signatures else None
+    valid = bool(signatures) and all(s["ok"] for s in signatures) and approved_revision_ok is not False \
+        and last.get("coverage") == SignatureCoverageLevel.ENTIRE_FILE.name
+    return {"valid": valid, "error": error, "signatures": signatures, "approved_revision_ok": approved_revision_ok}
+
+
+# -----------------------------------------------------------------------
+# Service
+# -----------------------------------------------------------------------
+@asynccontextmanager
+async def local_file(storage: "AbstractStorageService", relative_path: str, work_dir: str) -> AsyncIterator[str]:
+    """
+    Đường dẫn cục bộ của file trong storage cho worker process: file gốc nếu
+    backend lưu trên đĩa, ngược lại spool ra `work_dir` theo chunk (không qua RAM).
+    """
+    source_path = storage.get_local_path(relative_path)
+    if source_path is not None:
+        yield source_path
+        return
+    os.makedirs(work_dir, exist_ok=True)
+    spooled_path = os.path.join(work_dir, f"pades-{uuid4().hex}.src")
+    try:
+        async with aiofiles.open(spooled_path, "wb") as f:
+            async for chunk in storage.read_chunks(relative_path):
+                await f.write(chunk)
+        yield spooled_path
+    finally:
+        if os.path.exists(spooled_path):
+            os.remove(spooled_path)
+
+
+# Khóa cache: (file_hash, hash bản đã duyệt hoặc "", trust-store version)
+CacheKey = Tuple[str, str, str]
+
+
+class PAdESValidator:
+    """
+    Xác thực chữ ký PAdES trong process pool; mỗi worker giữ một
+    ValidationContext với trust roots đã parse sẵn và đọc PDF từ đường dẫn
+    (không pickle cả file sang worker). Kết quả cache theo (file_hash, bản đã
+    duyệt, trust-store version): cùng file, cùng bộ Root CA -> không xác thực
+    lại; yêu cầu đồng thời cho cùng file dùng chung một lần chạy.
+    """
+
+    def __init__(self, trust_dir: str = settings.PADES_TRUST_ROOTS_DIR,
+                 workers: int = settings.PADES_VALIDATION_WORKERS,
+                 cache_size: int = settings.PADES_VALIDATION_CACHE_SIZE,
+                 allow_fetching: bool = settings.PADES_ALLOW_FETCHING,
+                 work_dir: str = settings.UPLOAD_SESSION_DIR):
+        self.trust_dir = trust_dir
+        self.workers = workers
+        self.cache_size = cache_size
+        self.allow_fetching = allow_fetching
+        self.work_dir = work_dir
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._paths: List[str] = []
+        self._version: Optional[str] = None
+        self._cache: "OrderedDict[CacheKey, dict]" = OrderedDict()
+        self._in_flight: Dict[CacheKey, asyncio.Future] = {}
+
+    @property
+    def trust_store_version(self) -> str:
+        if self._version is None:
+            self._paths = trust_root_paths(self.trust_dir)
+            self._version = compute_trust_store_version(self._paths)
+            logger.info(f"PAdES trust store {self._version}: {len(self._paths)} root(s)")
+        return self._version
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            version = self.trust_store_version
+            if not self._paths:
+                raise PAdESValidationError(f"Chưa cấu hình Root CA tin cậy trong {self.trust_dir}")
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=(self._paths, self.allow_fetching)
+            )
+            logger.info(f"PAdES validation pool started ({self.workers} workers, trust store {version})")
+        return self._pool
+
+    def reload_trust_store(self) -> str:
+        """Đọc lại thư mục Root CA; worker mới dựng ValidationContext mới, cache cũ tự hết hiệu lực."""
+        self._version = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        self._cache.clear()
+        return self.trust_store_version
+
+    def _remember(self, key: CacheKey, result: dict) -> None:
+        self._cache[key] = result
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _run(self, key: CacheKey, storage: "AbstractStorageService", relative_path: str,
+                   approved: Optional[Tuple[str, int]]) -> dict:
+        approved_hash, approved_size = approved or (None, None)
+        start = time.perf_counter()
+        try:
+            async with local_file(storage, relative_path, self.work_dir) as path:
+                result = await asyncio.wait_for(
+                    asyncio.get_running_loop().run_in_executor(
+                        self._get_pool(), _validate_pdf, path, approved_hash, approved_size
+                    ),
+                    settings.PADES_VALIDATION_TIMEOUT_SECONDS,
+                )
+        finally:
+            PADES_VALIDATION_LATENCY.observe(time.perf_counter() - start)
+        result["trust_store_version"] = key[2]
+        self._remember(key, result)
+        return result
+
+    async def validate(self, storage: "AbstractStorageService", relative_path: str, file_hash: str,
+                       approved: Optional[Tuple[str, int]] = None) -> dict:
+        """
+        Kết quả có cấu trúc: {"valid", "error", "signatures": [...], "approved_revision_ok",
+        "trust_store_version"}. `file_hash` là SHA-256 của file (đã tính khi lưu);
+        `approved` = (file_hash, file_size) của phiên bản đã duyệt mà chữ ký phải đặt lên.
+        """
+        key = (file_hash, approved[0] if approved else "", self.trust_store_version)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            PADES_VALIDATION_CACHE.inc("hit")
+            return cached
+
+        future = self._in_flight.get(key)
+        if future is not None:
+            PADES_VALIDATION_CACHE.inc("shared")
+            return await asyncio.shield(future)
+
+        PADES_VALIDATION_CACHE.inc("miss")
+        future = self._in_flight[key] = asyncio.ensure_future(self._run(key, storage, relative_path, approved))
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if future.done():
+                self._in_flight.pop(key, None)
+            else:
+                future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+    async def aclose(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+pades_validator = PAdESValidator()
+
+
+def get_pades_validator() -> PAdESValidator:
+    return pades_validator
+
+
+# -----------------------------------------------------------------------
+# Nhúng chữ ký nội bộ (incremental update)
+# -----------------------------------------------------------------------
+_pades_signer = None
+EMBED_READ_SIZE = 1024 * 1024
+
+
+def _init_embed_worker(key_path: str, cert_path: str, password: str) -> None:
+    global _pades_signer
+    from pyhanko.sign import signers
+
+    # None nếu không đọc được khóa/chứng thư; _embed_pades báo lỗi cho từng yêu cầu
+    _pades_signer = signers.SimpleSigner.load(
+        key_path, cert_path, key_passphrase=password.encode() or None, prefer_pss=True
+    )
+
+
+def _embed_pades(source_path: str, output_path: str, field_name: str, reason: Optional[str]) -> Tuple[str, int]:
+    """
+    Ghi bản gốc + một incremental update chứa chữ ký vào output_path.
+    pyhanko đọc xref/đối tượng cần thiết theo kiểu random access và copy phần
+    gốc theo chunk, nên không nạp cả file vào RAM. Trả về (sha256 hex, size).
+    """
+    from pyhanko.pdf_utils.incremental_writer import IncrementalPdfFileWriter
+    from pyhanko.sign import fields, signers
+
+    if _pades_signer is None:
+        raise PAdESValidationError("Không nạp được khóa/chứng thư ký PAdES")
+
+    # "w+b": pyhanko đọc lại output để băm ByteRange rồi ghi /Contents tại chỗ
+    with open(source_path, "rb") as source, open(output_path, "w+b") as output:
+        writer = IncrementalPdfFileWriter(source)
+        meta = signers.PdfSignatureMetadata(
+            field_name=field_name, reason=reason, md_algorithm="sha256", subfilter=fields.SigSeedSubFilter.PADES
+        )
+        signers.PdfSigner(meta, signer=_pades_signer).sign_pdf(writer, output=output)
+
+    sha256_hash = hashlib.sha256()
+    file_size = 0
+    with open(output_path, "rb") as f:
+        while chunk := f.read(EMBED_READ_SIZE):
+            sha256_hash.update(chunk)
+            file_size += len(chunk)
+    return sha256_hash.hexdigest(), file_size
+
+
+class PAdESEmbedder:
+    """
+    Nhúng chữ ký nội bộ vào PDF đã duyệt bằng incremental update: file gốc
+    giữ nguyên byte-for-byte, chữ ký được nối vào cuối, kết quả là một blob mới.
+    Chạy trong process pool (mỗi worker nạp SimpleSigner một lần); file trên
+    object storage được spool ra đĩa theo chunk, không qua RAM.
+    """
+
+    def __init__(self, workers: int = settings.PADES_EMBED_WORKERS,
+                 key_path: str = settings.INTERNAL_PRIVATE_KEY_PATH,
+                 cert_path: str = settings.PADES_SIGNING_CERT_PATH,
+                 password: str = settings.INTERNAL_PRIVATE_KEY_PASSWORD,
+                 work_dir: str = settings.UPLOAD_SESSION_DIR):
+        self.workers = workers
+        self.key_path = key_path
+        self.cert_path = cert_path
+        self.password = password
+        # Cùng filesystem với LOCAL_STORAGE_DIR: store_file chỉ cần đổi tên
+        self.work_dir = work_dir
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_embed_worker,
+                initargs=(self.key_path, self.cert_path, self.password),
+            )
+        return self._pool
+
+    async def embed(self, storage: "AbstractStorageService", relative_path: str, file_name: str,
+                    reason: Optional[str] = None) -> "StorageResult":
+        os.makedirs(self.work_dir, exist_ok=True)
+        output_path = os.path.join(self.work_dir, f"pades-{uuid4().hex}.pdf")
+        start = time.perf_counter()
+        try:
+            async with local_file(storage, relative_path, self.work_dir) as source_path:
+                field_name = f"SecureDoc-{uuid4().hex[:12]}"
+                file_hash, file_size = await asyncio.wait_for(
+                    asyncio.get_running_loop().run_in_executor(
+                        self._get_pool(), _embed_pades, source_path, output_path, field_name, reason
+                    ),
+                    settings.PADES_EMBED_TIMEOUT_SECONDS,
+                )
+            # store_file chuyển output vào storage và dựng chunk tree
+            return await storage.store_file(output_path, file_name, file_hash, file_size)
+        finally:
+            PADES_EMBED_LATENCY.observe(time.perf_counter() - start)
+            if os.path.exists(output_path):
+                os.remove(output_path)
+
+    async def aclose(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+pades_embedder = PAdESEmbedder()
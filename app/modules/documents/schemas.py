@@ -0,0 +1,104 @@
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+from .models.documents import AuditAction, DocumentStatus, ExternalSignStatus
+
+
+class DocumentRead(BaseModel):
+    """Thông tin hồ sơ trả về từ API."""
+    id: UUID
+    title: str
+    description: Optional[str] = None
+    status: DocumentStatus
+    creator_id: UUID
+    latest_version_id: Optional[UUID] = None
+
+    model_config = {"from_attributes": True}
+
+
+class DocumentSearchHit(DocumentRead):
+    score: float
+
+
+class DocumentSearchPage(BaseModel):
+    """Một trang kết quả tìm kiếm; next_cursor = None khi hết."""
+    items: List[DocumentSearchHit]
+    next_cursor: Optional[str] = None
+
+
+class UploadSessionCreate(BaseModel):
+    """Khởi tạo phiên upload tiếp nối (resumable)."""
+    filename: str = Field(max_length=255)
+    title: str = Field(max_length=255)
+    description: Optional[str] = None
+    mime_type: str = "application/pdf"
+
+
+class UploadSessionRead(BaseModel):
+    id: str
+    offset: int
+    length: int
+    expires_at: datetime
+
+
+class DocumentSign(BaseModel):
+    """Input của request ký số."""
+    notes: Optional[str] = Field(None, description="Ghi chú về chữ ký.")
+
+
+class SignatureRead(BaseModel):
+    id: UUID
+    document_version_id: UUID
+    signer_id: UUID
+    role: str
+    signature_type: str
+    key_id: Optional[UUID] = None
+    batch_root: Optional[str] = None
+    embedded_version_id: Optional[UUID] = None
+    validation: Optional[dict] = None
+    trust_store_version: Optional[str] = None
+
+    model_config = {"from_attributes": True}
+
+
+class TimelineEvent(BaseModel):
+    """Một sự kiện trong lịch sử hồ sơ: VERSION, SIGNATURE hoặc AUDIT."""
+    kind: str
+    at: datetime
+    event_id: UUID
+    actor_id: Optional[UUID] = None
+    version_id: Optional[UUID] = None
+    action: Optional[AuditAction] = None
+    details: Optional[dict] = None
+
+
+class TimelinePage(BaseModel):
+    items: List[TimelineEvent]
+    next_cursor: Optional[str] = None
+
+
+class SignatureVerification(BaseModel):
+    signature_id: UUID
+    signer_id: UUID
+    signature_type: str
+    key_id: Optional[UUID] = None
+    batched: bool
+    valid: bool
+
+
+class ExternalSignCreate(BaseModel):
+    provider: Optional[str] = Field(None, description="VIETTEL_CA / VNPT_CA / FPT_CA (mặc định theo cấu hình)")
+
+
+class ExternalSignRequestRead(BaseModel):
+    id: UUID
+    document_version_id: UUID
+    provider: str
+    provider_reference: Optional[str] = None
+    status: ExternalSignStatus
+    signature_id: Optional[UUID] = None
+
+    model_config = {"from_attributes": True}
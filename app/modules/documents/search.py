@@ -0,0 +1,309 @@
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Set, Tuple
+from uuid import UUID, uuid4
+
+import aiofiles
+from sqlalchemy import Float, event, func, literal, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ...core.config import settings
+from ...core.metrics import registry
+from .models.documents import Document, DocumentSearch, DocumentVersion
+from .storage import AbstractStorageService, get_storage_service
+
+logger = logging.getLogger(__name__)
+
+SEARCH_EXTRACT_LATENCY = registry.histogram(
+    "search_extract_duration_seconds", "Time spent extracting PDF text for the search index."
+)
+SEARCH_INDEXED = registry.counter("search_documents_indexed_total", "Documents (re)indexed for search.", ("outcome",))
+
+REINDEX_KEY = "search_reindex"
+# Độ dài tối thiểu của từ khóa SAU khi fold (trigram cần >= 2 ký tự để có nghĩa)
+MIN_QUERY_LENGTH = 2
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fold_text(value: Optional[str]) -> str:
+    """Chữ thường, bỏ dấu tiếng Việt (kể cả đ -> d), gộp khoảng trắng: dùng chung cho index và truy vấn."""
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFD", value.lower().replace("đ", "d").replace("Đ", "d"))
+    stripped = "".join(ch for ch in decomposed if unicodedata.category(ch) != "Mn")
+    return _WHITESPACE.sub(" ", stripped).strip()
+
+
+# -----------------------------------------------------------------------
+# Worker process: trích text PDF
+# -----------------------------------------------------------------------
+def _extract_pdf_text(path: str, max_chars: int) -> str:
+    from pypdf import PdfReader
+
+    parts: List[str] = []
+    total = 0
+    for page in PdfReader(path).pages:
+        try:
+            page_text = page.extract_text() or ""
+        except Exception:
+            # Trang hỏng / font lạ: bỏ qua trang, không bỏ cả file
+            continue
+        parts.append(page_text)
+        total += len(page_text)
+        if total >= max_chars:
+            break
+    return fold_text(" ".join(parts))[:max_chars]
+
+
+# -----------------------------------------------------------------------
+# Indexer
+# -----------------------------------------------------------------------
+class SearchIndexer:
+    """
+    Cập nhật bảng document_search ở nền. Hồ sơ được đưa vào hàng đợi sau khi
+    transaction tạo phiên bản mới commit (mark_for_reindex); text PDF chỉ được
+    trích lại khi latest_version_id đổi, tiêu đề / mô tả luôn được làm mới.
+    """
+
+    def __init__(self, workers: int = settings.SEARCH_EXTRACT_WORKERS,
+                 max_chars: int = settings.SEARCH_MAX_TEXT_CHARS,
+                 work_dir: str = settings.UPLOAD_SESSION_DIR):
+        self.workers = workers
+        self.max_chars = max_chars
+        self.work_dir = work_dir
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._queue: Optional["asyncio.Queue[UUID]"] = None
+        self._queued: Set[UUID] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def enqueue(self, document_id: UUID) -> None:
+        # Chưa start (CLI, script): bỏ qua, reindex bằng lệnh riêng
+        if self._queue is None or document_id in self._queued:
+            return
+        self._queued.add(document_id)
+        self._queue.put_nowait(document_id)
+
+    async def extract_text(self, storage: AbstractStorageService, relative_path: str) -> str:
+        start = time.perf_counter()
+        spooled_path = None
+        try:
+            source_path = storage.get_local_path(relative_path)
+            if source_path is None:
+                os.makedirs(self.work_dir, exist_ok=True)
+                spooled_path = source_path = os.path.join(self.work_dir, f"search-{uuid4().hex}.pdf")
+                async with aiofiles.open(spooled_path, "wb") as f:
+                    async for chunk in storage.read_chunks(relative_path):
+                        await f.write(chunk)
+            return await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(
+                    self._get_pool(), _extract_pdf_text, source_path, self.max_chars
+                ),
+                settings.SEARCH_EXTRACT_TIMEOUT_SECONDS,
+            )
+        finally:
+            SEARCH_EXTRACT_LATENCY.observe(time.perf_counter() - start)
+            if spooled_path and os.path.exists(spooled_path):
+                os.remove(spooled_path)
+
+    async def index_document(self, db: AsyncSession, document_id: UUID,
+                             storage: Optional[AbstractStorageService] = None) -> bool:
+        db_document = await db.get(Document, document_id)
+        if db_document is None:
+            return False
+        db_index = await db.get(DocumentSearch, document_id)
+        body = db_index.body if db_index else ""
+        version_id = db_index.version_id if db_index else None
+
+        if db_document.latest_version_id and db_document.latest_version_id != version_id:
+            db_version = await db.get(DocumentVersion, db_document.latest_version_id)
+            version_id = db_version.id
+            body = ""
+            if db_version.mime_type == "application/pdf":
+                try:
+                    body = await self.extract_text(storage or get_storage_service(), db_version.file_path)
+                except Exception as e:
+                    # PDF scan / hỏng: vẫn index tiêu đề + mô tả
+                    logger.warning(f"Search: cannot extract text of version {db_version.id}: {e}")
+                    SEARCH_INDEXED.inc("extract_failed")
+
+        title = fold_text(db_document.title)
+        description = fold_text(db_document.description)
+        values = {
+            "document_id": document_id,
+            "version_id": version_id,
+            "search_title": f"{title} {description}".strip(),
+            "body": body,
+            "search_vector": (
+                func.setweight(func.to_tsvector("simple", title), "A")
+                .op("||")(func.setweight(func.to_tsvector("simple", description), "B"))
+                .op("||")(func.setweight(func.to_tsvector("simple", body), "C"))
+            ),
+            "indexed_at": datetime.utcnow(),
+        }
+        stmt = pg_insert(DocumentSearch).values(**values)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[DocumentSearch.document_id],
+            set_={key: stmt.excluded[key] for key in values if key != "document_id"},
+        ))
+        await db.commit()
+        SEARCH_INDEXED.inc("ok")
+        return True
+
+    async def _loop(self) -> None:
+        from ...db.database import SessionLocal
+
+        while True:
+            document_id = await self._queue.get()
+            self._queued.discard(document_id)
+            try:
+                async with SessionLocal() as db:
+                    await self.index_document(db, document_id)
+            except Exception:
+                SEARCH_INDEXED.inc("error")
+                logger.exception(f"Search indexing failed for document {document_id}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._queue = None
+            self._queued.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+search_indexer = SearchIndexer()
+
+
+def mark_for_reindex(db: AsyncSession, document_id: UUID) -> None:
+    """Reindex hồ sơ sau khi transaction hiện tại commit (bỏ qua nếu rollback)."""
+    db.sync_session.info.setdefault(REINDEX_KEY, set()).add(document_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_after_commit(session: Session) -> None:
+    for document_id in session.info.pop(REINDEX_KEY, ()):
+        search_indexer.enqueue(document_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(REINDEX_KEY, None)
+
+
+# -----------------------------------------------------------------------
+# Truy vấn: xếp hạng + keyset pagination
+# -----------------------------------------------------------------------
+def encode_cursor(score: float, document_id: UUID) -> str:
+    return base64.urlsafe_b64encode(json.dumps([score, str(document_id)]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, UUID]:
+    try:
+        score, document_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), UUID(document_id)
+    except (AttributeError, TypeError, ValueError) as e:
+        # AttributeError: UUID() nhận giá trị không phải chuỗi (cursor bị sửa tay)
+        raise ValueError(f"Invalid search cursor: {e}")
+
+
+class InvalidSearchQuery(ValueError):
+    """Từ khóa rỗng / quá ngắn sau khi fold (vd. chỉ gồm dấu hoặc khoảng trắng)."""
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def search_documents(db: AsyncSession, query: str, limit: int = settings.SEARCH_PAGE_SIZE,
+                           cursor: Optional[str] = None) -> Tuple[List[Tuple[Document, float]], Optional[str]]:
+    """
+    Khớp full-text (tsvector, có / không dấu) hoặc một phần tiêu đề / mô tả
+    (ILIKE trên GIN trigram). Điểm = ts_rank_cd + word_similarity; trang kế
+    tiếp theo keyset (score, document_id), không dùng OFFSET.
+    """
+    folded = fold_text(query)
+    if len(folded) < MIN_QUERY_LENGTH:
+        # "%%" khớp mọi hồ sơ -> quét toàn bảng; chặn trước khi chạm DB
+        raise InvalidSearchQuery(f"Từ khóa phải có ít nhất {MIN_QUERY_LENGTH} ký tự sau khi chuẩn hóa.")
+    tsquery = func.websearch_to_tsquery("simple", folded)
+    score = (
+        func.ts_rank_cd(DocumentSearch.search_vector, tsquery)
+        + func.word_similarity(folded, DocumentSearch.search_title)
+    ).label("score")
+    matches = (
+        select(DocumentSearch.document_id, score)
+        .where(or_(
+            DocumentSearch.search_vector.op("@@")(tsquery),
+            DocumentSearch.search_title.ilike(f"%{_escape_like(folded)}%", escape="\\"),
+        ))
+        .subquery()
+    )
+
+    stmt = select(Document, matches.c.score).join(matches, matches.c.document_id == Document.id)
+    if cursor:
+        after_score, after_id = decode_cursor(cursor)
+        stmt = stmt.where(
+            tuple_(matches.c.score, matches.c.document_id) < tuple_(literal(after_score, Float), literal(after_id))
+        )
+    stmt = stmt.order_by(matches.c.score.desc(), matches.c.document_id.desc()).limit(limit + 1)
+
+    rows = [(document, float(row_score)) for document, row_score in (await db.execute(stmt)).all()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_document, last_score = rows[-1]
+        next_cursor = encode_cursor(last_score, last_document.id)
+    return rows, next_cursor
+
+
+async def _main(args) -> None:
+    from ...db.database import SessionLocal
+
+    async with SessionLocal() as db:
+        if args.document_id:
+            document_ids = [UUID(args.document_id)]
+        else:
+            document_ids = list((await db.execute(select(Document.id))).scalars())
+    indexed = 0
+    for document_id in document_ids:
+        async with SessionLocal() as db:
+            indexed += await search_indexer.index_document(db, document_id)
+    await search_indexer.stop()
+    print(f"Indexed {indexed}/{len(document_ids)} documents")
+
+
+if __name__ == "__main__":
+    # Backfill / dựng lại chỉ mục: python -m app.modules.documents.search reindex [--document-id ...]
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Quản lý chỉ mục tìm kiếm hồ sơ")
+    sub = parser.add_subparsers(dest="command", required=True)
+    reindex_parser = sub.add_parser("reindex")
+    reindex_parser.add_argument("--document-id")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,508 @@
+import asyncio
+import base64
+import binascii
+import os
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from ...core.config import settings
+from ...core.merkle import decode_proof, encode_proof
+from ...core.profiler import profiled
+from ...core.external_ca import CircuitOpenError, ExternalCAError
+from ...core.signing import (
+    batch_signer,
+    external_ca_service,
+    algorithm_for_key,
+    internal_signer,
+    load_public_key,
+    verify_batch_signature,
+    verify_signature,
+)
+from ..audit.services import create_audit_log
+from .keys import SigningKeyError, register_external_key, signing_key_registry
+from .models.documents import (
+    AuditAction,
+    Document,
+    DocumentStatus,
+    DocumentVersion,
+    ExternalSignRequest,
+    ExternalSignStatus,
+    Signature,
+)
+from .pades import PAdESValidationError, pades_embedder, pades_validator
+from .search import mark_for_reindex
+from .storage import AbstractStorageService, StorageResult, get_storage_service
+from .versions import insert_next_version
+
+
+class DocumentService:
+    """
+    Logic nghiệp vụ chính cho Document và DocumentVersion.
+    """
+
+    @profiled("service", "DocumentService.create_new_document")
+    async def create_new_document(
+        self,
+        db: AsyncSession,
+        title: str,
+        description: Optional[str],
+        storage_result: StorageResult,
+        file_name: str,
+        mime_type: str,
+        actor_id,
+    ) -> Document:
+        """
+        Nghiệp vụ Upload (file đã được lưu và tính hash bởi storage):
+        1. Tạo Document (DRAFT).
+        2. Tạo DocumentVersion v1.
+        3. Ghi AuditLog CREATE.
+        """
+        db_document = Document(
+            title=title,
+            description=description,
+            creator_id=actor_id,
+            status=DocumentStatus.DRAFT,
+            version_counter=1,
+        )
+        db.add(db_document)
+
+        db_version = DocumentVersion(
+            document_id=db_document.id,
+            version_number=1,
+            file_path=storage_result.file_path,
+            file_name=file_name,
+            file_size=storage_result.file_size,
+            mime_type=mime_type,
+            file_hash=storage_result.file_hash,
+            merkle_root=storage_result.merkle_root,
+            uploaded_by_id=actor_id,
+        )
+        db.add(db_version)
+        db_document.latest_version_id = db_version.id
+
+        create_audit_log(
+            db,
+            actor_id=actor_id,
+            action=AuditAction.CREATE,
+            document_id=db_document.id,
+            details={"filename": file_name, "size": storage_result.file_size, "version": 1},
+        )
+        mark_for_reindex(db, db_document.id)
+
+        await db.commit()
+        return db_document
+
+    # =======================================================================
+    # KÝ SỐ NỘI BỘ (MANAGER)
+    # =======================================================================
+    async def _get_document_and_version(self, db: AsyncSession, document_id, for_update: bool = False) -> tuple:
+        db_document = await db.get(Document, document_id, with_for_update=for_update)
+        if not db_document:
+            raise HTTPException(status_code=404, detail="Không tìm thấy tài liệu.")
+        db_version = await db.get(DocumentVersion, db_document.latest_version_id) \
+            if db_document.latest_version_id else None
+        if not db_version:
+            raise HTTPException(status_code=500, detail="Lỗi hệ thống: Tài liệu chưa có phiên bản.")
+        return db_document, db_version
+
+    @profiled("service", "DocumentService.sign_document_internal")
+    async def sign_document_internal(self, db: AsyncSession, document_id, actor, notes: Optional[str] = None) -> Signature:
+        """
+        Ký số nội bộ (RSA-PSS) phiên bản mới nhất của hồ sơ APPROVED.
+        SIGN_BATCH_ENABLED: hash được gom với các yêu cầu ký đồng thời, cả lô
+        dùng chung một chữ ký trên Merkle root, mỗi Signature lưu proof riêng.
+        Hồ sơ bị khóa (FOR UPDATE) tới commit: hai yêu cầu ký đồng thời không thể
+        cùng thấy APPROVED rồi ký/nhúng PAdES hai lần.
+        """
+        db_document, db_version = await self._get_document_and_version(db, document_id, for_update=True)
+        if db_document.status != DocumentStatus.APPROVED:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Tài liệu đang ở trạng thái '{db_document.status.value}'. Chỉ APPROVED mới được ký.",
+            )
+
+        batch = None
+        try:
+            if settings.SIGN_BATCH_ENABLED:
+                batch = await batch_signer.sign(db_version.file_hash)
+                signature_blob, fingerprint = batch.signature, batch.fingerprint
+            else:
+                signature_blob, fingerprint = await internal_signer.asign_hash_with_fingerprint(db_version.file_hash)
+            # key_id theo khóa đã thực sự ký (signing daemon có thể vừa restart với khóa mới)
+            key_id = await signing_key_registry.get_active_key_id(db, fingerprint)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Lỗi khi thực hiện ký số nội bộ: {e}")
+
+        signed_version = None
+        if settings.PADES_EMBED_ENABLED and db_version.mime_type == "application/pdf":
+            signed_version = await self._embed_pades_version(db, db_document, db_version, actor, notes)
+
+        db_signature = Signature(
+            document_version_id=db_version.id,
+            signer_id=actor.id,
+            role=str(actor.role),
+            signature_type="INTERNAL",
+            signature_value=signature_blob,
+            key_id=key_id,
+            batch_root=batch.root if batch else None,
+            batch_proof=encode_proof(batch.proof) if batch else None,
+            embedded_version_id=signed_version.id if signed_version else None,
+        )
+        db.add(db_signature)
+        db_document.status = DocumentStatus.COMPLETED
+
+        details = {"notes": notes or "Ký số nội bộ", "version": db_version.version_number}
+        if batch:
+            details.update(batch_root=batch.root, batch_size=batch.batch_size)
+        if signed_version:
+            details.update(signed_version=signed_version.version_number, signed_file_hash=signed_version.file_hash)
+        create_audit_log(db, actor_id=actor.id, action=AuditAction.SIGN_INTERNAL,
+                         document_id=db_document.id, details=details)
+
+        await db.commit()
+        return db_signature
+
+    async def _embed_pades_version(self, db: AsyncSession, db_document: Document, db_version: DocumentVersion,
+                                   actor, notes: Optional[str]) -> DocumentVersion:
+        """
+        Nối chữ ký PAdES (incremental update) vào PDF đã duyệt -> phiên bản mới
+        (trở thành latest) tự kiểm chứng được; phiên bản đã duyệt giữ nguyên.
+        """
+        storage_svc = get_storage_service()
+        stem = os.path.splitext(db_version.file_name)[0]
+        try:
+            storage_result = await pades_embedder.embed(
+                storage_svc, db_version.file_path, f"{stem}_signed.pdf", reason=notes or "Ký số nội bộ"
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Lỗi khi nhúng chữ ký vào PDF: {str(e) or type(e).__name__}")
+        return await insert_next_version(
+            db,
+            db_document,
+            file_path=storage_result.file_path,
+            file_name=f"{stem}_signed.pdf",
+            file_size=storage_result.file_size,
+            mime_type="application/pdf",
+            file_hash=storage_result.file_hash,
+            merkle_root=storage_result.merkle_root,
+            uploaded_by_id=actor.id,
+        )
+
+    # =======================================================================
+    # KÝ SỐ QUA CA BÊN NGOÀI (MANAGER)
+    # =======================================================================
+    @profiled("service", "DocumentService.request_external_signature")
+    async def request_external_signature(self, db: AsyncSession, document_id, actor,
+                                         provider: Optional[str] = None) -> ExternalSignRequest:
+        """
+        1. Ghi ExternalSignRequest (PENDING) và commit trước khi gọi CA,
+           để callback luôn tìm được yêu cầu.
+        2. Gọi CA (pool + retry + circuit breaker), ngoài transaction.
+        3. REQUESTED nếu CA nhận, FAILED nếu CA lỗi (503 cho client). Callback có
+           thể đến trước khi CA trả lời: chỉ chuyển từ PENDING (UPDATE có điều kiện),
+           không ghi đè COMPLETED / REJECTED.
+        """
+        db_document, db_version = await self._get_document_and_version(db, document_id)
+        if db_document.status != DocumentStatus.APPROVED:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Tài liệu đang ở trạng thái '{db_document.status.value}'. Chỉ APPROVED mới được ký.",
+            )
+
+        provider = provider or settings.EXTERNAL_CA_DEFAULT_PROVIDER
+        db_request = ExternalSignRequest(document_version_id=db_version.id, signer_id=actor.id, provider=provider)
+        db.add(db_request)
+        await db.commit()
+
+        try:
+            result = await external_ca_service.request_external_sign(
+                db_version, actor, external_request_id=str(db_request.id), provider=provider
+            )
+        except ExternalCAError as e:
+            failed = await self._advance_external_request(db, db_request, status=ExternalSignStatus.FAILED, error=str(e))
+            if not failed:
+                # CA đã xử lý xong (callback đến trước lỗi / timeout phía ta)
+                return db_request
+            if isinstance(e, CircuitOpenError):
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Dịch vụ CA tạm thời không khả dụng, vui lòng thử lại sau.",
+                    headers={"Retry-After": str(int(settings.EXTERNAL_CA_BREAKER_RESET_SECONDS))},
+                )
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Lỗi từ dịch vụ CA: {e}")
+
+        # Callback đã đến trước: bỏ qua, giữ trạng thái của callback
+        await self._advance_external_request(
+            db, db_request, status=ExternalSignStatus.REQUESTED, provider_reference=result.get("provider_reference"),
+            audit=dict(actor_id=actor.id, action=AuditAction.SIGN_EXTERNAL, document_id=db_document.id,
+                       details={"external_request_id": str(db_request.id), "provider": provider, "stage": "REQUESTED"}),
+        )
+        return db_request
+
+    async def _advance_external_request(self, db: AsyncSession, db_request: ExternalSignRequest,
+                                        audit: Optional[dict] = None, **values) -> bool:
+        """PENDING -> `values` nếu yêu cầu vẫn đang PENDING; False nếu callback đã xử lý trước."""
+        claimed = await db.execute(
+            update(ExternalSignRequest)
+            .where(ExternalSignRequest.id == db_request.id, ExternalSignRequest.status == ExternalSignStatus.PENDING)
+            .values(**values)
+        )
+        if claimed.rowcount and audit:
+            create_audit_log(db, **audit)
+        await db.commit()
+        await db.refresh(db_request)
+        return bool(claimed.rowcount)
+
+    @staticmethod
+    def _verified_external_signature(payload: dict, file_hash: str) -> tuple:
+        """(chữ ký, public key PEM) của callback SIGNED, đã xác minh trên file_hash; lỗi -> 422."""
+        signature_b64, public_key_pem = payload.get("signature"), payload.get("public_key_pem")
+        if not isinstance(signature_b64, str) or not isinstance(public_key_pem, str):
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                                detail="Callback SIGNED thiếu signature / public_key_pem")
+        try:
+            signature_value = base64.b64decode(signature_b64, validate=True)
+        except binascii.Error:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="signature không phải base64")
+        try:
+            algorithm_for_key(load_public_key(public_key_pem))
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"public_key_pem không hợp lệ: {e}")
+        if not signature_value or not verify_signature(file_hash, signature_value, public_key_pem):
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                                detail="Chữ ký không khớp phiên bản được yêu cầu ký")
+        return signature_value, public_key_pem
+
+    async def handle_external_callback(self, db: AsyncSession, provider: str, payload: dict) -> ExternalSignRequest:
+        """
+        Callback từ CA, idempotent: chỉ lần đầu chuyển REQUESTED/PENDING -> COMPLETED/REJECTED
+        (UPDATE có điều kiện), các lần gửi lại trả về kết quả đã lưu.
+        Callback SIGNED phải kèm chữ ký xác minh được trên file_hash của phiên bản;
+        hồ sơ chỉ chuyển COMPLETED nếu còn APPROVED và phiên bản đó vẫn là mới nhất.
+        """
+        if not isinstance(payload, dict):
+            raise HTTPException(status_code=400, detail="Body phải là JSON object")
+        try:
+            request_id = UUID(str(payload.get("request_id")))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="request_id không hợp lệ")
+
+        db_request = await db.get(ExternalSignRequest, request_id)
+        if db_request is None or db_request.provider != provider:
+            raise HTTPException(status_code=404, detail="Không tìm thấy yêu cầu ký")
+
+        db_version = await db.get(DocumentVersion, db_request.document_version_id)
+        signed = payload.get("status") == "SIGNED"
+        if signed and db_request.status in (ExternalSignStatus.PENDING, ExternalSignStatus.REQUESTED):
+            signature_value, public_key_pem = self._verified_external_signature(payload, db_version.file_hash)
+        new_status = ExternalSignStatus.COMPLETED if signed else ExternalSignStatus.REJECTED
+        claimed = await db.execute(
+            update(ExternalSignRequest)
+            .where(
+                ExternalSignRequest.id == request_id,
+                ExternalSignRequest.status.in_([ExternalSignStatus.PENDING, ExternalSignStatus.REQUESTED]),
+            )
+            .values(status=new_status, completed_at=datetime.utcnow(), provider_reference=payload.get("reference"))
+        )
+        if claimed.rowcount == 0:
+            # Callback lặp lại: đã xử lý
+            await db.rollback()
+            await db.refresh(db_request)
+            return db_request
+
+        details = {"external_request_id": str(request_id), "provider": provider, "stage": new_status.value}
+        if signed:
+            key_id = await register_external_key(db, public_key_pem)
+            db_signature = Signature(
+                document_version_id=db_request.document_version_id,
+                signer_id=db_request.signer_id,
+                role="MANAGER",
+                signature_type="EXTERNAL",
+                signature_value=signature_value,
+                key_id=key_id,
+            )
+            db.add(db_signature)
+            await db.flush()
+            await db.execute(
+                update(ExternalSignRequest).where(ExternalSignRequest.id == request_id)
+                .values(signature_id=db_signature.id)
+            )
+            db_document = await db.get(Document, db_version.document_id, with_for_update=True)
+            if db_document.status == DocumentStatus.APPROVED and db_document.latest_version_id == db_version.id:
+                db_document.status = DocumentStatus.COMPLETED
+            else:
+                # Hồ sơ đã đổi (ký nội bộ / phiên bản mới) trong lúc chờ CA: giữ chữ ký, không đổi trạng thái
+                details["document_status_unchanged"] = db_document.status.value
+        else:
+            details["reason"] = payload.get("reason")
+
+        create_audit_log(db, actor_id=db_request.signer_id, action=AuditAction.SIGN_EXTERNAL,
+                         document_id=db_version.document_id, details=details)
+        await db.commit()
+        await db.refresh(db_request)
+        return db_request
+
+    # =======================================================================
+    # UPLOAD PDF ĐÃ KÝ BẰNG USB TOKEN (MANAGER)
+    # =======================================================================
+    @profiled("service", "DocumentService.upload_externally_signed_file")
+    async def upload_externally_signed_file(
+        self,
+        db: AsyncSession,
+        document_id,
+        actor,
+        storage_result: StorageResult,
+        file_name: str,
+        mime_type: str,
+        storage_svc: AbstractStorageService,
+    ) -> Signature:
+        """
+        Manager upload PDF đã ký (PAdES) cho hồ sơ APPROVED:
+        1. Xác thực chữ ký nhúng (process pool, cache theo file_hash + trust store)
+           và kiểm tra chữ ký được đặt trên đúng phiên bản đã duyệt (file_hash).
+        2. Tạo phiên bản mới + Signature EXTERNAL lưu kết quả xác thực.
+        3. Hợp lệ -> COMPLETED; không hợp lệ -> giữ APPROVED để upload lại.
+        """
+        db_document, db_version = await self._get_document_and_version(db, document_id)
+        if db_document.status != DocumentStatus.APPROVED:
+            await storage_svc.delete(storage_result.file_path)
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Tài liệu đang ở trạng thái '{db_document.status.value}'. Chỉ APPROVED mới được ký.",
+            )
+
+        try:
+            validation = await pades_validator.validate(
+                storage_svc, storage_result.file_path, storage_result.file_hash,
+                approved=(db_version.file_hash, db_version.file_size),
+            )
+        except (PAdESValidationError, asyncio.TimeoutError) as e:
+            await storage_svc.delete(storage_result.file_path)
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail=f"Không xác thực được chữ ký: {str(e) or 'quá thời gian'}")
+        if not validation["signatures"] or validation["approved_revision_ok"] is False:
+            # Không ký, hoặc ký trên nội dung khác bản đã duyệt: không lưu thành phiên bản
+            await storage_svc.delete(storage_result.file_path)
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                                detail=validation["error"] or "File không có chữ ký.")
+
+        new_version = await insert_next_version(
+            db,
+            db_document,
+            file_path=storage_result.file_path,
+            file_name=file_name,
+            file_size=storage_result.file_size,
+            mime_type=mime_type,
+            file_hash=storage_result.file_hash,
+            merkle_root=storage_result.merkle_root,
+            uploaded_by_id=actor.id,
+        )
+        db_signature = Signature(
+            document_version_id=new_version.id,
+            signer_id=actor.id,
+            role=str(actor.role),
+            signature_type="EXTERNAL",
+            validation=validation,
+            trust_store_version=validation["trust_store_version"],
+            validated_at=datetime.utcnow(),
+        )
+        db.add(db_signature)
+        if validation["valid"]:
+            db_document.status = DocumentStatus.COMPLETED
+
+        create_audit_log(db, actor_id=actor.id, action=AuditAction.SIGN_EXTERNAL, document_id=db_document.id,
+                         details={"version": new_version.version_number, "stage": "PADES_VALIDATED",
+                                  "valid": validation["valid"], "trust_store_version": validation["trust_store_version"]})
+        await db.commit()
+        return db_signature
+
+    async def verify_signature_record(self, db: AsyncSession, db_signature: Signature, file_hash: str) -> bool:
+        """Xác minh một Signature (đơn lẻ hoặc theo lô) với hash của phiên bản."""
+        if db_signature.validation is not None:
+            # PAdES: chữ ký nằm trong PDF, đã xác thực lúc upload
+            return bool(db_signature.validation.get("valid"))
+        if not db_signature.signature_value or not db_signature.key_id:
+            return False
+        try:
+            public_key, revoked_at = await signing_key_registry.get_public_key(db, db_signature.key_id)
+        except SigningKeyError:
+            return False
+        if revoked_at is not None and db_signature.created_at >= revoked_at:
+            return False
+        if db_signature.batch_root:
+            return verify_batch_signature(file_hash, db_signature.signature_value, public_key,
+                                          db_signature.batch_root, decode_proof(db_signature.batch_proof or []))
+        return verify_signature(file_hash, db_signature.signature_value, public_key)
+
+    async def verify_document_signatures(self, db: AsyncSession, document_id) -> List[dict]:
+        """
+        Chữ ký của phiên bản mới nhất, kể cả chữ ký hash của phiên bản đã duyệt
+        khi phiên bản mới nhất là bản PDF nhúng chữ ký đó.
+        """
+        _, db_version = await self._get_document_and_version(db, document_id)
+        result = await db.execute(
+            select(Signature, DocumentVersion.file_hash)
+            .join(DocumentVersion, Signature.document_version_id == DocumentVersion.id)
+            .where(or_(Signature.document_version_id == db_version.id,
+                       Signature.embedded_version_id == db_version.id))
+        )
+        return [
+            {
+                "signature_id": sig.id,
+                "signer_id": sig.signer_id,
+                "signature_type": sig.signature_type,
+                "key_id": sig.key_id,
+                "batched": sig.batch_root is not None,
+                "valid": await self.verify_signature_record(db, sig, signed_hash),
+            }
+            for sig, signed_hash in result.all()
+        ]
+
+
+def document_register_query(
+    status_filter: Optional[DocumentStatus] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Select:
+    """
+    Sổ đăng ký hồ sơ cho export: mỗi hồ sơ một dòng kèm thông tin phiên bản mới nhất.
+    SELECT theo cột (không tạo đối tượng ORM), sắp theo id (UUIDv7 ~ thứ tự tạo).
+    """
+    stmt = (
+        select(
+            Document.id,
+            Document.title,
+            Document.status,
+            Document.creator_id,
+            Document.created_at,
+            Document.updated_at,
+            Document.version_counter.label("version_count"),
+            DocumentVersion.version_number.label("latest_version_number"),
+            DocumentVersion.file_name,
+            DocumentVersion.file_size,
+            DocumentVersion.mime_type,
+            DocumentVersion.file_hash,
+        )
+        .outerjoin(DocumentVersion, DocumentVersion.id == Document.latest_version_id)
+        .order_by(Document.id)
+    )
+    if status_filter is not None:
+        stmt = stmt.where(Document.status == status_filter)
+    if since is not None:
+        stmt = stmt.where(Document.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(Document.created_at < until)
+    return stmt
+
+
+document_service = DocumentService()
+
+
+def get_document_service() -> DocumentService:
+    return document_service
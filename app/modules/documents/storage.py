@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+import aiofiles
+from fastapi import UploadFile
+from pydantic import BaseModel
+
+from ...core.config import settings
+from ...core.metrics import UPLOAD_BYTES, UPLOAD_LATENCY
+from ...core.profiler import profile_span
+from .utils.merkle import SIDECAR_SUFFIX, ChunkTree, ChunkTreeHasher, tree_hash_file
+
+CHUNK_SIZE = 64 * 1024
+
+
+class StorageResult(BaseModel):
+    """
+    Kết quả sau khi lưu file.
+    """
+    file_path: str  # Đường dẫn tương đối lưu trong DB
+    file_hash: str  # SHA-256 hash (hex)
+    file_size: int
+    merkle_root: Optional[str] = None  # Chunk-tree root (hex); leaf hash ở sidecar <file_path>.merkle
+
+
+# -----------------------------------------------------------------------
+# 1. Lớp Trừu Tượng (Abstraction Layer)
+# -----------------------------------------------------------------------
+class AbstractStorageService(ABC):
+    backend_name: str = "abstract"
+
+    async def save_file_and_compute_hash(self, file: UploadFile, actor_id: uuid.UUID) -> StorageResult:
+        """
+        Lưu file upload và tính SHA-256 đồng thời (streaming), có đo thời gian/throughput.
+        """
+        start = time.perf_counter()
+        try:
+            with profile_span("storage", f"{self.backend_name}.save_file_and_compute_hash"):
+                result = await self._save_file_and_compute_hash(file, actor_id)
+        finally:
+            UPLOAD_LATENCY.observe(time.perf_counter() - start, self.backend_name)
+        UPLOAD_BYTES.inc(self.backend_name, amount=result.file_size)
+        return result
+
+    @abstractmethod
+    async def _save_file_and_compute_hash(self, file: UploadFile, actor_id: uuid.UUID) -> StorageResult:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def store_file(self, source_path: str, filename: str, file_hash: str, file_size: int,
+                         tree: Optional[ChunkTree] = None, keep_source: bool = False) -> StorageResult:
+        """
+        Đưa một file cục bộ đã được băm sẵn (vd: upload tiếp nối) vào storage
+        mà không băm lại. File nguồn được chuyển đi/xóa sau khi lưu, trừ khi
+        `keep_source` (vd: phiên upload, chỉ xóa sau khi Document commit). LOCAL
+        có thể hard link thay vì copy: chỉ dùng keep_source với file không còn bị
+        ghi. `tree` đã tính sẵn thì không băm leaf lại.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def read_chunks(self, relative_path: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Đọc file theo từng chunk (streaming, không tải toàn bộ vào RAM)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, relative_path: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def put_bytes(self, relative_path: str, data: bytes) -> None:
+        """Ghi một object nhỏ (sidecar, metadata) trọn vẹn."""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_bytes(self, relative_path: str) -> Optional[bytes]:
+        """Đọc trọn một object nhỏ; None nếu không tồn tại."""
+        raise NotImplementedError
+
+    async def save_chunk_tree(self, relative_path: str, tree: ChunkTree) -> None:
+        await self.put_bytes(relative_path + SIDECAR_SUFFIX, tree.to_sidecar())
+
+    async def load_chunk_tree(self, relative_path: str) -> Optional[ChunkTree]:
+        """Sidecar leaf hash của file; None với file cũ (chỉ có file_hash)."""
+        data = await self.get_bytes(relative_path + SIDECAR_SUFFIX)
+        return ChunkTree.from_sidecar(data) if data else None
+
+    async def verify_chunk_tree(self, relative_path: str) -> Optional[list]:
+        """
+        Integrity sweep: stream file, băm leaf song song và so với sidecar.
+        Trả về chỉ số các leaf bị sai (rỗng = toàn vẹn), None nếu không có sidecar.
+        """
+        tree = await self.load_chunk_tree(relative_path)
+        if tree is None:
+            return None
+        hasher = ChunkTreeHasher(leaf_size=tree.leaf_size)
+        async for chunk in self.read_chunks(relative_path):
+            await hasher.update(chunk)
+        current = await hasher.finalize()
+        if current.file_size != tree.file_size:
+            return list(range(max(len(current.leaves), len(tree.leaves))))
+        return [i for i, (a, b) in enumerate(zip(current.leaves, tree.leaves)) if a != b]
+
+    def get_download_url(self, relative_path: str, filename: Optional[str] = None,
+                         expires_in: int = 300) -> Optional[str]:
+        """
+        URL tải trực tiếp từ storage (presigned). None nếu backend không hỗ trợ,
+        khi đó API tự stream file qua read_chunks().
+        """
+        return None
+
+    def get_local_path(self, relative_path: str) -> Optional[str]:
+        """
+        Đường dẫn file trên đĩa nếu backend lưu cục bộ (đọc ngẫu nhiên, không
+        phải spool); None với object storage.
+        """
+        return None
+
+    async def aclose(self) -> None:
+        """Giải phóng tài nguyên (connection pool...) khi tắt ứng dụng."""
+        return None
+
+    @staticmethod
+    def build_relative_path(filename: str) -> str:
+        """documents/YYYY/MM/DD/<uuid><ext>"""
+        today = datetime.now()
+        extension = os.path.splitext(filename or "")[-1]
+        return f"documents/{today.year}/{today.month:02d}/{today.day:02d}/{uuid.uuid4()}{extension}"
+
+
+# -----------------------------------------------------------------------
+# 2. Local File System
+# -----------------------------------------------------------------------
+def _link_or_copy(source_path: str, target_path: str) -> None:
+    """Hard link khi cùng filesystem (không copy dữ liệu), ngược lại copy."""
+    try:
+        os.link(source_path, target_path)
+    except OSError:
+        shutil.copyfile(source_path, target_path)
+
+
+class LocalStorageService(AbstractStorageService):
+    """
+    Triển khai Storage cho Local File System.
+    """
+    backend_name = "local"
+
+    def __init__(self, base_dir: str = settings.LOCAL_STORAGE_DIR):
+        self.base_dir = base_dir
+        os.makedirs(self.base_dir, exist_ok=True)
+
+    def get_full_path(self, relative_path: str) -> str:
+        return os.path.join(self.base_dir, relative_path)
+
+    def get_local_path(self, relative_path: str) -> Optional[str]:
+        return self.get_full_path(relative_path)
+
+    async def _save_file_and_compute_hash(self, file: UploadFile, actor_id: uuid.UUID) -> StorageResult:
+        relative_path = self.build_relative_path(file.filename)
+        full_path = self.get_full_path(relative_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+        sha256_hash = hashlib.sha256()
+        tree_hasher = ChunkTreeHasher()
+        total_size = 0
+
+        try:
+            async with aiofiles.open(full_path, "wb") as f:
+                while chunk := await file.read(CHUNK_SIZE):
+                    sha256_hash.update(chunk)
+                    await tree_hasher.update(chunk)
+                    await f.write(chunk)
+                    total_size += len(chunk)
+            tree = await tree_hasher.finalize()
+            await self.save_chunk_tree(relative_path, tree)
+        except Exception as e:
+            await self.delete(relative_path)
+            raise IOError(f"Lỗi khi lưu file: {e}")
+        finally:
+            await file.close()
+
+        return StorageResult(
+            file_path=relative_path,
+            file_hash=sha256_hash.hexdigest(),
+            file_size=total_size,
+            merkle_root=tree.root_hex,
+        )
+
+    async def store_file(self, source_path: str, filename: str, file_hash: str, file_size: int,
+                         tree: Optional[ChunkTree] = None, keep_source: bool = False) -> StorageResult:
+        relative_path = self.build_relative_path(filename)
+        full_path = self.get_full_path(relative_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        if tree is None:
+            # File đã nằm trên đĩa: đọc và băm các leaf song song (pread)
+            tree = await asyncio.to_thread(tree_hash_file, source_path)
+        if keep_source:
+            await asyncio.to_thread(_link_or_copy, source_path, full_path)
+        else:
+            # Cùng filesystem: chỉ đổi tên, không copy dữ liệu (khác filesystem thì move sẽ copy)
+            await asyncio.to_thread(shutil.move, source_path, full_path)
+        await self.save_chunk_tree(relative_path, tree)
+        return StorageResult(file_path=relative_path, file_hash=file_hash, file_size=file_size,
+                             merkle_root=tree.root_hex)
+
+    async def read_chunks(self, relative_path: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        async with aiofiles.open(self.get_full_path(relative_path), "rb") as f:
+            while chunk := await f.read(chunk_size):
+                yield chunk
+
+    async def delete(self, relative_path: str) -> None:
+        for path in (relative_path, relative_path + SIDECAR_SUFFIX):
+            full_path = self.get_full_path(path)
+            if os.path.exists(full_path):
+                os.remove(full_path)
+
+    async def put_bytes(self, relative_path: str, data: bytes) -> None:
+        full_path = self.get_full_path(relative_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        async with aiofiles.open(full_path, "wb") as f:
+            await f.write(data)
+
+    async def get_bytes(self, relative_path: str) -> Optional[bytes]:
+        try:
+            async with aiofiles.open(self.get_full_path(relative_path), "rb") as f:
+                return await f.read()
+        except FileNotFoundError:
+            return None
+
+
+def create_storage_service(storage_type: str = settings.STORAGE_TYPE) -> AbstractStorageService:
+    if storage_type == "LOCAL":
+        return LocalStorageService()
+    if storage_type == "S3":
+        from .storage_s3 import S3StorageService
+        return S3StorageService()
+    raise ValueError(f"STORAGE_TYPE không hợp lệ: {storage_type}")
+
+
+def get_storage_service() -> AbstractStorageService:
+    """Dependency: storage backend theo STORAGE_TYPE."""
+    return storage_service
+
+
+storage_service: AbstractStorageService = create_storage_service()
@@ -0,0 +1,330 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import uuid
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+import aiofiles
+import httpx
+from fastapi import UploadFile
+
+from ...core.config import settings
+from .storage import CHUNK_SIZE, AbstractStorageService, StorageResult
+from .utils.merkle import SIDECAR_SUFFIX, ChunkTree, ChunkTreeHasher, tree_hash_file
+
+logger = logging.getLogger(__name__)
+
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+MIN_PART_SIZE = 5 * 1024 * 1024  # Giới hạn S3: mọi part (trừ part cuối) >= 5 MiB
+S3_NS = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+
+
+class S3Error(IOError):
+    pass
+
+
+# -----------------------------------------------------------------------
+# AWS Signature V4 (path-style, tương thích MinIO / moto)
+# -----------------------------------------------------------------------
+def _hmac(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+
+def _uri_encode(value: str, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+
+class SigV4Signer:
+    def __init__(self, access_key: str, secret_key: str, region: str, service: str = "s3"):
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.service = service
+        self._key_cache: Tuple[str, bytes] = ("", b"")
+
+    def _signing_key(self, date: str) -> bytes:
+        # Khóa ký chỉ đổi theo ngày -> cache lại
+        if self._key_cache[0] != date:
+            k = _hmac(("AWS4" + self.secret_key).encode("utf-8"), date)
+            k = _hmac(k, self.region)
+            k = _hmac(k, self.service)
+            self._key_cache = (date, _hmac(k, "aws4_request"))
+        return self._key_cache[1]
+
+    def _scope(self, date: str) -> str:
+        return f"{date}/{self.region}/{self.service}/aws4_request"
+
+    @staticmethod
+    def _canonical_query(params: Dict[str, str]) -> str:
+        return "&".join(f"{_uri_encode(k)}={_uri_encode(str(v))}" for k, v in sorted(params.items()))
+
+    def _signature(self, method: str, path: str, query: str, headers: Dict[str, str], payload_hash: str,
+                   amz_date: str) -> Tuple[str, str]:
+        signed_headers = ";".join(sorted(headers))
+        canonical_headers = "".join(f"{k}:{headers[k].strip()}\n" for k in sorted(headers))
+        canonical_request = "\n".join([
+            method, _uri_encode(path, safe="/-_.~"), query, canonical_headers, signed_headers, payload_hash,
+        ])
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256",
+            amz_date,
+            self._scope(amz_date[:8]),
+            hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+        ])
+        signature = hmac.new(self._signing_key(amz_date[:8]), string_to_sign.encode("utf-8"), hashlib.sha256)
+        return signed_headers, signature.hexdigest()
+
+    def sign_headers(self, method: str, host: str, path: str, params: Dict[str, str],
+                     payload_hash: str = UNSIGNED_PAYLOAD) -> Dict[str, str]:
+        amz_date = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        headers = {"host": host, "x-amz-content-sha256": payload_hash, "x-amz-date": amz_date}
+        signed_headers, signature = self._signature(
+            method, path, self._canonical_query(params), headers, payload_hash, amz_date
+        )
+        headers["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{self._scope(amz_date[:8])}, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        )
+        del headers["host"]  # httpx tự đặt Host
+        return headers
+
+    def presign(self, method: str, host: str, path: str, expires_in: int,
+                extra_params: Optional[Dict[str, str]] = None) -> str:
+        amz_date = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        params = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.access_key}/{self._scope(amz_date[:8])}",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(expires_in),
+            "X-Amz-SignedHeaders": "host",
+            **(extra_params or {}),
+        }
+        query = self._canonical_query(params)
+        _, signature = self._signature(method, path, query, {"host": host}, UNSIGNED_PAYLOAD, amz_date)
+        return f"{_uri_encode(path, safe='/-_.~')}?{query}&X-Amz-Signature={signature}"
+
+
+# -----------------------------------------------------------------------
+# S3 Storage
+# -----------------------------------------------------------------------
+class S3StorageService(AbstractStorageService):
+    """
+    Storage backend cho S3 / MinIO.
+    - Upload: multipart, băm SHA-256 trong lúc đọc, các part được upload song song
+      (tối đa `max_concurrency` part trong bộ nhớ cùng lúc).
+    - Download: trả về presigned GET, API không phải proxy nội dung file.
+    - Một httpx.AsyncClient (connection pool, keep-alive) dùng chung cho mọi request.
+    """
+    backend_name = "s3"
+
+    def __init__(
+        self,
+        endpoint_url: str = settings.S3_ENDPOINT_URL,
+        bucket: str = settings.S3_BUCKET,
+        access_key: str = settings.S3_ACCESS_KEY,
+        secret_key: str = settings.S3_SECRET_KEY,
+        region: str = settings.S3_REGION,
+        part_size: int = settings.S3_PART_SIZE,
+        max_concurrency: int = settings.S3_MAX_CONCURRENCY,
+        pool_size: int = settings.S3_POOL_SIZE,
+        public_endpoint_url: Optional[str] = settings.S3_PUBLIC_ENDPOINT_URL,
+    ):
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.host = urlsplit(self.endpoint_url).netloc
+        # Presigned URL phải ký đúng host mà trình duyệt sẽ gọi
+        self.public_endpoint_url = (public_endpoint_url or endpoint_url).rstrip("/")
+        self.public_host = urlsplit(self.public_endpoint_url).netloc
+        self.bucket = bucket
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.signer = SigV4Signer(access_key, secret_key, region)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.endpoint_url,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                timeout=httpx.Timeout(60.0, connect=5.0),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _object_path(self, key: str) -> str:
+        return f"/{self.bucket}/{key}"
+
+    async def _request(self, method: str, key: str, params: Optional[Dict[str, str]] = None,
+                       content=None, expected: Tuple[int, ...] = (200,)) -> httpx.Response:
+        params = params or {}
+        path = self._object_path(key)
+        headers = self.signer.sign_headers(method, self.host, path, params)
+        response = await self.client.request(method, _uri_encode(path, safe="/-_.~"), params=params,
+                                             headers=headers, content=content)
+        if response.status_code not in expected:
+            raise S3Error(f"S3 {method} {key} -> {response.status_code}: {response.text[:200]}")
+        return response
+
+    # --- Multipart ---
+    async def _create_multipart(self, key: str) -> str:
+        response = await self._request("POST", key, {"uploads": ""})
+        upload_id = ET.fromstring(response.content).find(f"{S3_NS}UploadId")
+        if upload_id is None:
+            upload_id = ET.fromstring(response.content).find("UploadId")
+        return upload_id.text
+
+    async def _upload_part(self, key: str, upload_id: str, number: int, data: bytes) -> Tuple[int, str]:
+        response = await self._request("PUT", key, {"partNumber": str(number), "uploadId": upload_id}, content=data)
+        return number, response.headers["etag"]
+
+    async def _complete_multipart(self, key: str, upload_id: str, parts: List[Tuple[int, str]]) -> None:
+        body = "<CompleteMultipartUpload>" + "".join(
+            f"<Part><PartNumber>{n}</PartNumber><ETag>{etag}</ETag></Part>" for n, etag in sorted(parts)
+        ) + "</CompleteMultipartUpload>"
+        response = await self._request("POST", key, {"uploadId": upload_id}, content=body.encode("utf-8"))
+        # S3 có thể trả 200 kèm <Error> trong body
+        if b"<Error>" in response.content:
+            raise S3Error(f"S3 complete multipart {key} failed: {response.text[:200]}")
+
+    async def _abort_multipart(self, key: str, upload_id: str) -> None:
+        try:
+            await self._request("DELETE", key, {"uploadId": upload_id}, expected=(204, 200, 404))
+        except Exception:
+            pass
+
+    async def _read_part(self, read, hashers=(), tree_hasher: Optional[ChunkTreeHasher] = None) -> bytes:
+        buffer = bytearray()
+        while len(buffer) < self.part_size:
+            chunk = await read(min(CHUNK_SIZE, self.part_size - len(buffer)))
+            if not chunk:
+                break
+            for hasher in hashers:
+                hasher.update(chunk)
+            buffer += chunk
+        data = bytes(buffer)
+        if tree_hasher is not None:
+            await tree_hasher.update(data)
+        return data
+
+    async def _put_stream(self, key: str, read, hashers=(), tree_hasher: Optional[ChunkTreeHasher] = None) -> int:
+        """
+        Upload nội dung đọc từ `read(n)`: một PUT nếu nhỏ hơn part size,
+        ngược lại multipart song song. Trả về tổng số byte.
+        """
+        first = await self._read_part(read, hashers, tree_hasher)
+        total_size = len(first)
+
+        if len(first) < self.part_size:
+            await self._request("PUT", key, content=first)
+            return total_size
+
+        upload_id = await self._create_multipart(key)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks: List[asyncio.Task] = []
+
+        async def upload(number: int, data: bytes):
+            try:
+                return await self._upload_part(key, upload_id, number, data)
+            finally:
+                semaphore.release()
+
+        try:
+            data, number = first, 1
+            while data:
+                # Chặn đọc tiếp khi đã đủ part đang upload -> bộ nhớ bị giới hạn
+                await semaphore.acquire()
+                tasks.append(asyncio.create_task(upload(number, data)))
+                data = await self._read_part(read, hashers, tree_hasher)
+                total_size += len(data)
+                number += 1
+            parts = await asyncio.gather(*tasks)
+            await self._complete_multipart(key, upload_id, list(parts))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await self._abort_multipart(key, upload_id)
+            raise
+        return total_size
+
+    async def _save_file_and_compute_hash(self, file: UploadFile, actor_id: uuid.UUID) -> StorageResult:
+        key = self.build_relative_path(file.filename)
+        sha256_hash = hashlib.sha256()
+        tree_hasher = ChunkTreeHasher()
+
+        try:
+            total_size = await self._put_stream(key, file.read, (sha256_hash,), tree_hasher)
+            tree = await tree_hasher.finalize()
+            await self.save_chunk_tree(key, tree)
+        except Exception as e:
+            await self._discard(key)
+            if isinstance(e, S3Error):
+                raise
+            raise IOError(f"Lỗi khi lưu file: {e}")
+        finally:
+            await file.close()
+
+        return StorageResult(file_path=key, file_hash=sha256_hash.hexdigest(), file_size=total_size,
+                             merkle_root=tree.root_hex)
+
+    async def store_file(self, source_path: str, filename: str, file_hash: str, file_size: int,
+                         tree: Optional[ChunkTree] = None, keep_source: bool = False) -> StorageResult:
+        key = self.build_relative_path(filename)
+        if tree is None:
+            tree = await asyncio.to_thread(tree_hash_file, source_path)
+        try:
+            async with aiofiles.open(source_path, "rb") as f:
+                await self._put_stream(key, f.read)
+            await self.save_chunk_tree(key, tree)
+        except Exception:
+            await self._discard(key)
+            raise
+        if not keep_source:
+            os.remove(source_path)
+        return StorageResult(file_path=key, file_hash=file_hash, file_size=file_size, merkle_root=tree.root_hex)
+
+    async def _discard(self, key: str) -> None:
+        """Dọn object (và sidecar) đã upload dở khi lưu thất bại; lỗi dọn chỉ ghi log."""
+        try:
+            await self.delete(key)
+        except Exception as e:
+            logger.warning(f"Could not remove orphan object {key}: {e}")
+
+    # --- Read / Download ---
+    async def read_chunks(self, relative_path: str, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        path = self._object_path(relative_path)
+        headers = self.signer.sign_headers("GET", self.host, path, {})
+        async with self.client.stream("GET", _uri_encode(path, safe="/-_.~"), headers=headers) as response:
+            if response.status_code != 200:
+                raise S3Error(f"S3 GET {relative_path} -> {response.status_code}")
+            async for chunk in response.aiter_bytes(chunk_size):
+                yield chunk
+
+    async def delete(self, relative_path: str) -> None:
+        await self._request("DELETE", relative_path, expected=(204, 200, 404))
+        await self._request("DELETE", relative_path + SIDECAR_SUFFIX, expected=(204, 200, 404))
+
+    async def put_bytes(self, relative_path: str, data: bytes) -> None:
+        await self._request("PUT", relative_path, content=data)
+
+    async def get_bytes(self, relative_path: str) -> Optional[bytes]:
+        response = await self._request("GET", relative_path, expected=(200, 404))
+        return response.content if response.status_code == 200 else None
+
+    def get_download_url(self, relative_path: str, filename: Optional[str] = None,
+                         expires_in: int = settings.S3_PRESIGN_EXPIRES) -> Optional[str]:
+        extra = {}
+        if filename:
+            extra["response-content-disposition"] = f"attachment; filename*=UTF-8''{quote(filename)}"
+        return self.public_endpoint_url + self.signer.presign(
+            "GET", self.public_host, self._object_path(relative_path), expires_in, extra
+        )
@@ -0,0 +1,177 @@
+import base64
+import json
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import SmallInteger, cast, func, literal, null, select, tuple_, union_all
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.config import settings
+from ...core.metrics import registry
+from .models.documents import AuditLog, Document, DocumentVersion, Signature
+
+TIMELINE_CACHE = registry.counter("timeline_cache_total", "Document timeline page cache lookups.", ("outcome",))
+
+TimelinePage = Tuple[List[dict], Optional[str]]
+# Số trang (cursor, limit) giữ cho mỗi hồ sơ
+PAGES_PER_DOCUMENT = 32
+
+
+def encode_timeline_cursor(at: datetime, event_id: UUID) -> str:
+    return base64.urlsafe_b64encode(json.dumps([at.isoformat(), str(event_id)]).encode()).decode()
+
+
+def decode_timeline_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        at, event_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(at), UUID(event_id)
+    except (AttributeError, TypeError, ValueError) as e:
+        # AttributeError: UUID() nhận giá trị không phải chuỗi (cursor bị sửa tay)
+        raise ValueError(f"Invalid timeline cursor: {e}")
+
+
+def timeline_query(document_id: UUID, limit: int, cursor: Optional[str] = None):
+    """
+    Một câu UNION ALL gồm phiên bản, chữ ký và audit log của hồ sơ, mới nhất trước.
+
+    Mỗi nhánh tự lọc theo cursor, sắp xếp và LIMIT trước khi gộp (đi theo index
+    (document_id, timestamp) / document_versions / signatures.document_version_id),
+    nên hồ sơ có hàng trăm phiên bản chỉ đọc tối đa 3 x (limit + 1) dòng.
+    Chỉ lấy các cột timeline cần, gói chi tiết vào một cột JSONB.
+    """
+    after = decode_timeline_cursor(cursor) if cursor else None
+
+    def branch(stmt, at_column, id_column):
+        if after is not None:
+            stmt = stmt.where(tuple_(at_column, id_column) < tuple_(*after))
+        return select(stmt.order_by(at_column.desc(), id_column.desc()).limit(limit + 1).subquery())
+
+    # Nhánh audit đứng đầu: kiểu của cột action (SmallIntEnum -> AuditAction) lấy từ nhánh này;
+    # NULL phải có kiểu tường minh, PostgreSQL không suy được kiểu NULL trong subquery của UNION
+    audits = branch(
+        select(
+            literal("AUDIT").label("kind"),
+            AuditLog.timestamp.label("at"),
+            AuditLog.id.label("event_id"),
+            AuditLog.actor_id.label("actor_id"),
+            cast(null(), PG_UUID(as_uuid=True)).label("version_id"),
+            AuditLog.action.label("action"),
+            AuditLog.details.label("details"),
+        ).where(AuditLog.document_id == document_id),
+        AuditLog.timestamp, AuditLog.id,
+    )
+    versions = branch(
+        select(
+            literal("VERSION").label("kind"),
+            DocumentVersion.created_at.label("at"),
+            DocumentVersion.id.label("event_id"),
+            DocumentVersion.uploaded_by_id.label("actor_id"),
+            DocumentVersion.id.label("version_id"),
+            cast(null(), SmallInteger).label("action"),
+            func.jsonb_build_object(
+                "version_number", DocumentVersion.version_number,
+                "file_name", DocumentVersion.file_name,
+                "file_size", DocumentVersion.file_size,
+                "file_hash", DocumentVersion.file_hash,
+            ).label("details"),
+        ).where(DocumentVersion.document_id == document_id),
+        DocumentVersion.created_at, DocumentVersion.id,
+    )
+    signatures = branch(
+        select(
+            literal("SIGNATURE").label("kind"),
+            Signature.created_at.label("at"),
+            Signature.id.label("event_id"),
+            Signature.signer_id.label("actor_id"),
+            Signature.document_version_id.label("version_id"),
+            cast(null(), SmallInteger).label("action"),
+            func.jsonb_build_object(
+                "role", Signature.role,
+                "signature_type", Signature.signature_type,
+                "key_id", Signature.key_id,
+                "batched", Signature.batch_root.is_not(None),
+                "embedded_version_id", Signature.embedded_version_id,
+            ).label("details"),
+        )
+        .join(DocumentVersion, Signature.document_version_id == DocumentVersion.id)
+        .where(DocumentVersion.document_id == document_id),
+        Signature.created_at, Signature.id,
+    )
+
+    events = union_all(audits, versions, signatures).subquery("events")
+    return (
+        select(events)
+        .order_by(events.c.at.desc(), events.c.event_id.desc())
+        .limit(limit + 1)
+    )
+
+
+class DocumentTimeline:
+    """
+    Timeline hồ sơ với cache trang theo hồ sơ (LRU, trong worker).
+
+    Mọi sự kiện (phiên bản mới, ký, chuyển trạng thái) đều ghi audit log của
+    hồ sơ, nên audit log mới nhất (UUIDv7, đọc qua index (document_id,
+    timestamp)) kèm version_counter làm watermark: watermark đổi -> toàn bộ
+    trang cache của hồ sơ bị bỏ. Kiểm tra bằng một lần dò index thay vì chạy
+    lại UNION, và vẫn đúng khi nhiều worker cùng ghi.
+    """
+
+    def __init__(self, cache_size: int = settings.TIMELINE_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[UUID, Tuple[tuple, Dict[Tuple[Optional[str], int], TimelinePage]]]" = OrderedDict()
+
+    async def _watermark(self, db: AsyncSession, document_id: UUID) -> Optional[tuple]:
+        last_audit_id = (
+            select(AuditLog.id)
+            .where(AuditLog.document_id == Document.id)
+            .order_by(AuditLog.timestamp.desc(), AuditLog.id.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        row = (await db.execute(
+            select(Document.version_counter, last_audit_id).where(Document.id == document_id)
+        )).first()
+        return tuple(row) if row is not None else None
+
+    def invalidate(self, document_id: UUID) -> None:
+        self._cache.pop(document_id, None)
+
+    async def page(self, db: AsyncSession, document_id: UUID,
+                   limit: int = settings.TIMELINE_PAGE_SIZE, cursor: Optional[str] = None) -> Optional[TimelinePage]:
+        """(events, next_cursor); None nếu hồ sơ không tồn tại."""
+        watermark = await self._watermark(db, document_id)
+        if watermark is None:
+            self.invalidate(document_id)
+            return None
+
+        entry = self._cache.get(document_id)
+        if entry is None or entry[0] != watermark:
+            entry = self._cache[document_id] = (watermark, {})
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        self._cache.move_to_end(document_id)
+
+        pages = entry[1]
+        key = (cursor, limit)
+        cached = pages.get(key)
+        if cached is not None:
+            TIMELINE_CACHE.inc("hit")
+            return cached
+
+        TIMELINE_CACHE.inc("miss")
+        if len(pages) >= PAGES_PER_DOCUMENT:
+            pages.clear()
+        events = [dict(row) for row in (await db.execute(timeline_query(document_id, limit, cursor))).mappings()]
+        next_cursor = None
+        if len(events) > limit:
+            events = events[:limit]
+            next_cursor = encode_timeline_cursor(events[-1]["at"], events[-1]["event_id"])
+        pages[key] = (events, next_cursor)
+        return pages[key]
+
+
+document_timeline = DocumentTimeline()
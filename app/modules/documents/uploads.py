@@ -0,0 +1,303 @@
+import fcntl
+import hashlib
+import json
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import aiofiles
+
+from ...core.config import settings
+from .storage import CHUNK_SIZE
+
+
+class UploadSessionError(Exception):
+    pass
+
+
+class UploadSessionNotFound(UploadSessionError):
+    pass
+
+
+class UploadOffsetMismatch(UploadSessionError):
+    def __init__(self, expected: int):
+        super().__init__(f"Upload-Offset phải là {expected}")
+        self.expected = expected
+
+
+class UploadTooLarge(UploadSessionError):
+    pass
+
+
+class UploadDataLost(UploadOffsetMismatch):
+    """`.part` ngắn hơn offset đã ghi nhận (mất dữ liệu phía server): phiên đã lùi về `expected`."""
+
+    def __init__(self, expected: int):
+        super().__init__(expected)
+        self.args = (f"Dữ liệu phiên upload bị thiếu, gửi lại từ offset {expected}",)
+
+
+class UploadSessionBusy(UploadOffsetMismatch):
+    """Request khác (có thể ở worker khác) đang ghi / hoàn tất phiên."""
+
+    def __init__(self, expected: int):
+        super().__init__(expected)
+        self.args = (f"Phiên upload đang được ghi bởi request khác (offset hiện tại {expected})",)
+
+
+@dataclass
+class UploadSession:
+    id: str
+    actor_id: str
+    filename: str
+    title: str
+    description: Optional[str]
+    mime_type: str
+    length: int
+    offset: int = 0
+    created_at: float = field(default_factory=time.time)
+    expires_at: float = 0.0
+
+    @property
+    def is_complete(self) -> bool:
+        return self.offset == self.length
+
+    @property
+    def expires_at_dt(self) -> datetime:
+        return datetime.fromtimestamp(self.expires_at, tz=timezone.utc)
+
+
+class UploadSessionManager:
+    """
+    Quản lý phiên upload tiếp nối (tus-style):
+    - Dữ liệu được nối dần vào `<id>.part`, metadata (offset, length...) ở `<id>.json`.
+    - Trạng thái SHA-256 được cập nhật theo từng chunk và giữ trong bộ nhớ cùng
+      offset đã băm, nên finalize không phải đọc lại file. Nếu trạng thái không
+      khớp offset của phiên (restart, hoặc PATCH trước rơi vào worker khác) thì
+      chỉ băm tiếp phần `.part` còn thiếu (hoặc băm lại từ đầu) rồi tiếp tục.
+    - Ghi / hoàn tất / dọn phiên giữ `flock` độc quyền trên `.part` (liên process):
+      PATCH gửi lại ở worker khác khi request cũ còn chạy nhận 409 thay vì ghi chồng.
+    - Phiên quá hạn (và `.part` mồ côi) được dọn lười khi có thao tác mới (tối đa 1 lần / phút).
+    """
+
+    PURGE_INTERVAL_SECONDS = 60
+
+    def __init__(
+        self,
+        base_dir: str = settings.UPLOAD_SESSION_DIR,
+        ttl_seconds: int = settings.UPLOAD_SESSION_TTL_SECONDS,
+        max_size: int = settings.UPLOAD_MAX_SIZE,
+    ):
+        self.base_dir = base_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        # session_id -> (số byte đầu của .part đã băm, trạng thái SHA-256)
+        self._hashes: Dict[str, Tuple[int, "hashlib._Hash"]] = {}
+        self._last_purge = 0.0
+
+    # --- Paths ---
+    def _meta_path(self, session_id: str) -> str:
+        return os.path.join(self.base_dir, f"{session_id}.json")
+
+    def data_path(self, session_id: str) -> str:
+        return os.path.join(self.base_dir, f"{session_id}.part")
+
+    @asynccontextmanager
+    async def _locked(self, session_id: str) -> AsyncIterator[None]:
+        """
+        Khóa độc quyền phiên bằng flock (không chờ): khóa gắn với file description
+        nên loại trừ cả request cùng process lẫn worker khác; tự nhả khi đóng fd.
+        """
+        try:
+            fd = os.open(self.data_path(session_id), os.O_RDWR)
+        except FileNotFoundError:
+            raise UploadSessionNotFound(session_id)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise UploadSessionBusy((await self._read_meta(session_id)).offset)
+            yield
+        finally:
+            os.close(fd)
+
+    async def _read_meta(self, session_id: str) -> UploadSession:
+        try:
+            async with aiofiles.open(self._meta_path(session_id)) as f:
+                return UploadSession(**json.loads(await f.read()))
+        except (FileNotFoundError, ValueError, TypeError):
+            raise UploadSessionNotFound(session_id)
+
+    async def _write_meta(self, session: UploadSession) -> None:
+        tmp_path = self._meta_path(session.id) + ".tmp"
+        async with aiofiles.open(tmp_path, "w") as f:
+            await f.write(json.dumps(asdict(session)))
+        os.replace(tmp_path, self._meta_path(session.id))
+
+    # --- Public API ---
+    async def create(self, actor_id, filename: str, title: str, description: Optional[str],
+                     mime_type: str, length: int) -> UploadSession:
+        if length <= 0:
+            raise UploadSessionError("Upload-Length phải lớn hơn 0")
+        if length > self.max_size:
+            raise UploadTooLarge(f"Upload-Length tối đa {self.max_size}")
+        await self.purge_expired()
+
+        os.makedirs(self.base_dir, exist_ok=True)
+        now = time.time()
+        session = UploadSession(
+            id=uuid.uuid4().hex,
+            actor_id=str(actor_id),
+            filename=os.path.basename(filename),
+            title=title,
+            description=description,
+            mime_type=mime_type,
+            length=length,
+            created_at=now,
+            expires_at=now + self.ttl_seconds,
+        )
+        async with aiofiles.open(self.data_path(session.id), "wb"):
+            pass
+        await self._write_meta(session)
+        self._hashes[session.id] = (0, hashlib.sha256())
+        return session
+
+    async def get(self, session_id: str, actor_id=None) -> UploadSession:
+        session = await self._read_meta(session_id)
+        if session.expires_at < time.time():
+            await self.delete(session_id)
+            raise UploadSessionNotFound(session_id)
+        if actor_id is not None and session.actor_id != str(actor_id):
+            raise UploadSessionNotFound(session_id)
+        return session
+
+    async def _hash_state(self, session: UploadSession):
+        hashed, sha256_hash = self._hashes.get(session.id, (0, None))
+        if sha256_hash is None or hashed > session.offset:
+            sha256_hash, hashed = hashlib.sha256(), 0
+        if hashed < session.offset:
+            # Trạng thái cũ hơn metadata (restart / PATCH ở worker khác): băm tiếp phần còn thiếu của .part
+            async with aiofiles.open(self.data_path(session.id), "rb") as f:
+                await f.seek(hashed)
+                while hashed < session.offset:
+                    chunk = await f.read(min(CHUNK_SIZE, session.offset - hashed))
+                    if not chunk:
+                        # Chỉ còn `hashed` byte: lùi phiên về đó để client gửi lại phần thiếu
+                        self._hashes[session.id] = (hashed, sha256_hash)
+                        session.offset = hashed
+                        await self._write_meta(session)
+                        raise UploadDataLost(hashed)
+                    sha256_hash.update(chunk)
+                    hashed += len(chunk)
+        self._hashes[session.id] = (hashed, sha256_hash)
+        return sha256_hash
+
+    async def append(self, session_id: str, offset: int, chunks: AsyncIterator[bytes], actor_id=None) -> UploadSession:
+        """
+        Nối một đoạn dữ liệu vào phiên tại `offset`.
+        Nếu kết nối đứt giữa chừng, phần đã ghi vẫn được tính (client HEAD để lấy offset mới).
+        """
+        async with self._locked(session_id):
+            session = await self.get(session_id, actor_id)
+            if offset != session.offset:
+                raise UploadOffsetMismatch(session.offset)
+
+            sha256_hash = await self._hash_state(session)
+            try:
+                async with aiofiles.open(self.data_path(session_id), "r+b") as f:
+                    # Cắt bỏ phần ghi dở của lần trước (chưa được ghi nhận vào metadata)
+                    await f.truncate(session.offset)
+                    await f.seek(session.offset)
+                    async for chunk in chunks:
+                        if session.offset + len(chunk) > session.length:
+                            raise UploadTooLarge("Dữ liệu vượt quá Upload-Length")
+                        await f.write(chunk)
+                        sha256_hash.update(chunk)
+                        session.offset += len(chunk)
+                        self._hashes[session_id] = (session.offset, sha256_hash)
+            finally:
+                session.expires_at = time.time() + self.ttl_seconds
+                await self._write_meta(session)
+            return session
+
+    @asynccontextmanager
+    async def finalizing(self, session_id: str, actor_id=None):
+        """
+        Giữ khóa phiên và trả về (session, đường dẫn file đã đủ dữ liệu, sha256 hex).
+        Caller đưa file vào storage (giữ nguyên `.part`) và tạo Document trong
+        khối `async with`; phiên chỉ bị xóa khi khối kết thúc không lỗi, nên
+        lỗi storage / DB vẫn cho phép gọi finalize lại.
+        """
+        async with self._locked(session_id):
+            session = await self.get(session_id, actor_id)
+            if not session.is_complete:
+                raise UploadOffsetMismatch(session.offset)
+            file_hash = (await self._hash_state(session)).hexdigest()
+            yield session, self.data_path(session_id), file_hash
+            await self.delete(session_id)
+
+    async def delete(self, session_id: str) -> None:
+        self._hashes.pop(session_id, None)
+        for path in (self._meta_path(session_id), self.data_path(session_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    async def purge_expired(self, force: bool = False) -> int:
+        now = time.time()
+        if not force and now - self._last_purge < self.PURGE_INTERVAL_SECONDS:
+            return 0
+        self._last_purge = now
+        if not os.path.isdir(self.base_dir):
+            return 0
+
+        purged = 0
+        for name in os.listdir(self.base_dir):
+            if name.endswith(".part") and not os.path.exists(self._meta_path(name[:-len(".part")])):
+                # .part không còn metadata (phiên bị xóa dở, process chết giữa chừng).
+                # create() ghi .part trước .json: chỉ xóa file đã cũ hơn TTL
+                path = os.path.join(self.base_dir, name)
+                try:
+                    if os.path.getmtime(path) < now - self.ttl_seconds:
+                        os.remove(path)
+                        purged += 1
+                except FileNotFoundError:
+                    pass
+                continue
+            if not name.endswith(".json"):
+                continue
+            session_id = name[:-len(".json")]
+            try:
+                async with self._locked(session_id):
+                    purged += await self._purge_if_expired(session_id, now)
+            except UploadSessionBusy:
+                continue
+            except UploadSessionNotFound:
+                # .json không còn .part
+                purged += await self._purge_if_expired(session_id, now)
+        return purged
+
+    async def _purge_if_expired(self, session_id: str, now: float) -> int:
+        try:
+            async with aiofiles.open(self._meta_path(session_id)) as f:
+                expires_at = json.loads(await f.read()).get("expires_at", 0)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError):
+            expires_at = 0
+        if expires_at >= now:
+            return 0
+        await self.delete(session_id)
+        return 1
+
+
+upload_session_manager = UploadSessionManager()
+
+
+def get_upload_session_manager() -> UploadSessionManager:
+    return upload_session_manager
@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import os
+import struct
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Deque, List, Optional, Tuple
+
+from ....core.config import settings
+from ....core.merkle import DIGEST_SIZE, hash_leaf, merkle_root
+
+# -----------------------------------------------------------------------
+# Chunk-tree (Merkle) digest của file
+# -----------------------------------------------------------------------
+# Bổ sung cho `file_hash` (SHA-256 tuần tự, giữ nguyên để tương thích):
+# - File được chia thành các leaf cố định `leaf_size` byte, mỗi leaf băm độc lập
+#   -> băm song song trên nhiều core (hashlib nhả GIL với buffer lớn).
+# - Root = Merkle root của các leaf hash, lưu cạnh `file_hash`.
+# - Các leaf hash được lưu trong sidecar nhị phân gọn (32 byte / leaf),
+#   cho phép kiểm tra toàn vẹn từng đoạn (integrity sweep, range download)
+#   mà không phải băm lại toàn bộ file.
+# Hàm băm leaf/node dùng chung với ký theo lô: app/core/merkle.py.
+
+SIDECAR_SUFFIX = ".merkle"
+SIDECAR_MAGIC = b"SDMT"
+SIDECAR_VERSION = 1
+_SIDECAR_HEADER = struct.Struct(">4sBIQ")  # magic, version, leaf_size, file_size
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_hash_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.MERKLE_HASH_WORKERS, thread_name_prefix="merkle")
+    return _executor
+
+
+class ChunkTree:
+    """Leaf hash + metadata của một file; (de)serialize sang sidecar."""
+
+    def __init__(self, leaf_size: int, file_size: int, leaves: List[bytes]):
+        self.leaf_size = leaf_size
+        self.file_size = file_size
+        self.leaves = leaves or [hash_leaf(b"")]
+        self._root: Optional[bytes] = None
+
+    @property
+    def root(self) -> bytes:
+        if self._root is None:
+            self._root = merkle_root(self.leaves)
+        return self._root
+
+    @property
+    def root_hex(self) -> str:
+        return self.root.hex()
+
+    def leaf_range(self, start: int, end: int) -> Tuple[int, int]:
+        """Các leaf [first, last] bao phủ đoạn byte [start, end] (vd: HTTP Range)."""
+        return start // self.leaf_size, min(end, self.file_size - 1) // self.leaf_size
+
+    def verify_leaf(self, index: int, data: bytes) -> bool:
+        return 0 <= index < len(self.leaves) and hash_leaf(data) == self.leaves[index]
+
+    def to_sidecar(self) -> bytes:
+        header = _SIDECAR_HEADER.pack(SIDECAR_MAGIC, SIDECAR_VERSION, self.leaf_size, self.file_size)
+        return header + b"".join(self.leaves)
+
+    @classmethod
+    def from_sidecar(cls, data: bytes) -> "ChunkTree":
+        magic, version, leaf_size, file_size = _SIDECAR_HEADER.unpack_from(data)
+        if magic != SIDECAR_MAGIC or version != SIDECAR_VERSION:
+            raise ValueError("Sidecar Merkle không hợp lệ")
+        body = memoryview(data)[_SIDECAR_HEADER.size:]
+        if len(body) % DIGEST_SIZE:
+            raise ValueError("Sidecar Merkle bị cắt cụt")
+        leaves = [bytes(body[i:i + DIGEST_SIZE]) for i in range(0, len(body), DIGEST_SIZE)]
+        return cls(leaf_size, file_size, leaves)
+
+
+class ChunkTreeHasher:
+    """
+    Hasher kiểu hashlib (`update()`), dùng song song với SHA-256 cũ trong
+    vòng lặp streaming: gom dữ liệu thành leaf và đẩy việc băm sang thread pool.
+    Số leaf đang chờ bị giới hạn để bộ nhớ không tăng theo kích thước file;
+    chờ leaf xong bằng `await` nên không chặn event loop.
+    """
+
+    def __init__(self, leaf_size: int = settings.MERKLE_LEAF_SIZE, executor: Optional[ThreadPoolExecutor] = None):
+        self.leaf_size = leaf_size
+        self.executor = executor or get_hash_executor()
+        self.max_pending = settings.MERKLE_HASH_WORKERS * 2
+        self.file_size = 0
+        self._buffer = bytearray()
+        self._pending: Deque[Future] = deque()
+        self._leaves: List[bytes] = []
+
+    async def _collect(self) -> None:
+        self._leaves.append(await asyncio.wrap_future(self._pending.popleft()))
+
+    async def _submit(self, data: bytes) -> None:
+        if len(self._pending) >= self.max_pending:
+            await self._collect()
+        self._pending.append(self.executor.submit(hash_leaf, data))
+
+    async def update(self, data: bytes) -> None:
+        self.file_size += len(data)
+        self._buffer += data
+        while len(self._buffer) >= self.leaf_size:
+            await self._submit(bytes(self._buffer[:self.leaf_size]))
+            del self._buffer[:self.leaf_size]
+
+    async def finalize(self) -> ChunkTree:
+        if self._buffer or not (self._leaves or self._pending):
+            await self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        while self._pending:
+            await self._collect()
+        return ChunkTree(self.leaf_size, self.file_size, self._leaves)
+
+
+def _hash_file_leaf(fd: int, index: int, leaf_size: int) -> bytes:
+    return hash_leaf(os.pread(fd, leaf_size, index * leaf_size))
+
+
+def tree_hash_file(path: str, leaf_size: int = settings.MERKLE_LEAF_SIZE,
+                   executor: Optional[ThreadPoolExecutor] = None) -> ChunkTree:
+    """Băm một file cục bộ: mỗi leaf được đọc (pread) và băm song song."""
+    executor = executor or get_hash_executor()
+    file_size = os.path.getsize(path)
+    count = max(1, -(-file_size // leaf_size))
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        leaves = list(executor.map(lambda i: _hash_file_leaf(fd, i, leaf_size), range(count)))
+    finally:
+        os.close(fd)
+    return ChunkTree(leaf_size, file_size, leaves)
+
+
+def digest_file(path: str, leaf_size: int = settings.MERKLE_LEAF_SIZE,
+                copy_to: Optional[str] = None) -> Tuple[str, ChunkTree]:
+    """
+    SHA-256 (`file_hash`) và chunk tree của một file trong một lần đọc, tuần tự.
+    Dùng trong process pool (nhập hàng loạt: song song theo file, không theo leaf).
+    `copy_to`: đồng thời ghi bản sao; kết quả băm đúng là nội dung của bản sao,
+    kể cả khi file nguồn bị sửa trong lúc / sau khi đọc.
+    """
+    sha256_hash = hashlib.sha256()
+    leaves: List[bytes] = []
+    file_size = 0
+    with open(path, "rb") as f, (open(copy_to, "wb") if copy_to else nullcontext()) as copy:
+        while chunk := f.read(leaf_size):
+            if copy is not None:
+                copy.write(chunk)
+            sha256_hash.update(chunk)
+            leaves.append(hash_leaf(chunk))
+            file_size += len(chunk)
+    return sha256_hash.hexdigest(), ChunkTree(leaf_size, file_size, leaves)
+
+
+def verify_file_against_tree(path: str, tree: ChunkTree,
+                             executor: Optional[ThreadPoolExecutor] = None) -> List[int]:
+    """
+    Kiểm tra song song một file cục bộ với sidecar.
+    Trả về chỉ số các leaf bị sai (rỗng = toàn vẹn).
+    """
+    current = tree_hash_file(path, tree.leaf_size, executor)
+    if current.file_size != tree.file_size:
+        return list(range(max(len(current.leaves), len(tree.leaves))))
+    return [i for i, (a, b) in enumerate(zip(current.leaves, tree.leaves)) if a != b]
@@ -0,0 +1,56 @@
+from sqlalchemy import insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from .models.documents import Document, DocumentVersion
+from .search import mark_for_reindex
+
+
+async def insert_next_version(db: AsyncSession, db_document: Document, **fields) -> DocumentVersion:
+    """
+    Cấp version_number và insert phiên bản mới trong một câu lệnh:
+
+        WITH doc AS (UPDATE documents SET version_counter = version_counter + 1,
+                                          latest_version_id = :id
+                     WHERE id = :document_id RETURNING version_counter)
+        INSERT INTO document_versions (...) SELECT ..., doc.version_counter FROM doc
+
+    UPDATE khóa dòng documents nên các resubmit đồng thời xếp hàng thay vì
+    đụng unique index ix_doc_version_unique; latest_version_id được cập nhật
+    cùng lúc nên không cần truy vấn ORDER BY version_number DESC.
+    """
+    db_version = DocumentVersion(document_id=db_document.id, version_number=0, **fields)
+    table = DocumentVersion.__table__
+    documents = Document.__table__
+    values = {
+        column.name: getattr(db_version, column.key)
+        for column in table.columns
+        if column.name != "version_number"
+    }
+
+    bump = (
+        update(documents)
+        .where(documents.c.id == db_document.id)
+        .values(version_counter=documents.c.version_counter + 1, latest_version_id=db_version.id)
+        .returning(documents.c.version_counter)
+    )
+
+    counter = bump.cte("doc")
+    source = select(
+        *(literal(value, type_=table.c[name].type).label(name) for name, value in values.items()),
+        counter.c.version_counter.label("version_number"),
+    )
+    result = await db.execute(
+        insert(table).from_select([*values, "version_number"], source).returning(table.c.version_number)
+    )
+    version_number = result.scalar_one()
+
+    # Đã có trong DB: gắn vào session như đối tượng đã load, không INSERT lại
+    db_version.version_number = version_number
+    make_transient_to_detached(db_version)
+    db.add(db_version)
+    set_committed_value(db_document, "version_counter", version_number)
+    set_committed_value(db_document, "latest_version_id", db_version.id)
+    mark_for_reindex(db, db_document.id)
+    return db_version
@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Request
-from fastapi.responses import HTMLResponse
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response
 
 from ....core.config import settings
+from ....core.health import readiness_monitor
+from ....core.metrics import CONTENT_TYPE_LATEST, registry
+from ....core.profiler import PROFILE_COOKIE, TRACE_URL_PREFIX, trace_json, verify_profile_token
+from ....core.template import error_renderer
 
 router = APIRouter(tags=["utils"])
 
+_LIVEZ_BODY = b'{"status":"ok"}'
+
 
 @router.get("/health", response_class=HTMLResponse)
 async def health(request: Request):
@@ -32,3 +38,59 @@ async def health(request: Request):
     </body>
     </html>
     """
+
+
+@router.get("/health/errors")
+async def error_stats():
+    """
+    Per-status error counters since process start (for monitoring).
+    """
+    return {str(code): count for code, count in sorted(error_renderer.snapshot().items())}
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """
+    Prometheus text exposition of the in-process metrics registry.
+    """
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE_LATEST)
+
+
+@router.get("/livez", include_in_schema=False)
+async def livez():
+    """
+    Liveness probe: constant response, no I/O.
+    """
+    return Response(content=_LIVEZ_BODY, media_type="application/json")
+
+
+@router.get("/readyz", include_in_schema=False)
+async def readyz():
+    """
+    Readiness probe: cached results of DB / storage / signing-key checks.
+    """
+    ready, payload = readiness_monitor.snapshot()
+    return JSONResponse(
+        content=payload,
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+
+@router.get(TRACE_URL_PREFIX + "/{trace_id}", include_in_schema=False)
+async def download_profile_trace(request: Request, trace_id: str):
+    """
+    Download the JSON trace of a profiled request (same token as profiling).
+    """
+    token = request.headers.get("x-profile-token") or request.cookies.get(PROFILE_COOKIE)
+    if not verify_profile_token(token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Profile token không hợp lệ.")
+
+    body = trace_json(trace_id)
+    if body is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Trace không tồn tại hoặc đã hết hạn.")
+
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"Content-Disposition": f'attachment; filename="trace-{trace_id}.json"'},
+    )
@@ -0,0 +1,223 @@
+"""
+Audit log query latency on a synthetic audit_logs-shaped table, before and
+after the composite (document_id, timestamp) / (actor_id, timestamp) indexes
+and the jsonb_path_ops GIN index on `details`.
+
+PostgreSQL only (jsonb containment / jsonpath):
+
+    python -m benchmarks.bench_audit_query --database-url postgresql+asyncpg://postgres:pw@localhost/bench \\
+        --rows 50000000 --skip-unindexed
+
+Rows are generated server-side with generate_series (spread over one year,
+REJECT rows carry a `reason`). --reuse keeps an already populated table
+between runs; the unindexed pass is a sequential scan per query, so skip it
+on the full 50M-row table once measured.
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.modules.documents.models.documents import AUDIT_ACTION_CODES, AuditAction
+
+from .harness import BASELINE_DIR, ScenarioResult, compare_to_baseline, measure, print_table, save_baseline
+
+TABLE = "bench_audit_logs"
+ANCHOR = datetime(2026, 1, 1)
+REJECT = AUDIT_ACTION_CODES[AuditAction.REJECT]
+REASONS = ["Sai mau bieu", "Thieu chu ky", "Sai so lieu", "Het han hieu luc", "Thieu phu luc"]
+
+INDEXES = {
+    f"ix_{TABLE}_document_timestamp": f"CREATE INDEX ix_{TABLE}_document_timestamp ON {TABLE} (document_id, timestamp)",
+    f"ix_{TABLE}_actor_timestamp": f"CREATE INDEX ix_{TABLE}_actor_timestamp ON {TABLE} (actor_id, timestamp)",
+    f"ix_{TABLE}_details": f"CREATE INDEX ix_{TABLE}_details ON {TABLE} USING gin (details jsonb_path_ops)",
+}
+
+# Same shape as app.modules.audit.services.query_audit_logs (keyset on timestamp, id DESC)
+QUERIES = {
+    "document_range": (
+        f"SELECT * FROM {TABLE} WHERE document_id = :document_id AND timestamp >= :since AND timestamp < :until "
+        "ORDER BY timestamp DESC, id DESC LIMIT :limit"
+    ),
+    "actor_quarter": (
+        f"SELECT * FROM {TABLE} WHERE actor_id = :actor_id AND timestamp >= :since AND timestamp < :until "
+        "ORDER BY timestamp DESC, id DESC LIMIT :limit"
+    ),
+    "actor_page2": (
+        f"SELECT * FROM {TABLE} WHERE actor_id = :actor_id AND timestamp >= :since AND timestamp < :until "
+        "AND (timestamp, id) < (:after_timestamp, :after_id) ORDER BY timestamp DESC, id DESC LIMIT :limit"
+    ),
+    "reject_contains": (
+        f"SELECT * FROM {TABLE} WHERE action = {REJECT} AND details @> CAST(:details AS jsonb) "
+        "ORDER BY timestamp DESC, id DESC LIMIT :limit"
+    ),
+    "reject_path": (
+        f"SELECT * FROM {TABLE} WHERE action = {REJECT} AND timestamp >= :since AND timestamp < :until "
+        "AND details @? CAST(:path AS jsonpath) ORDER BY timestamp DESC, id DESC LIMIT :limit"
+    ),
+}
+
+
+def md5_uuid(value: str) -> uuid.UUID:
+    """Python side of `md5(value)::uuid` used by the generator."""
+    return uuid.UUID(hashlib.md5(value.encode()).hexdigest())
+
+
+async def populate(engine: AsyncEngine, args) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        await conn.execute(text(
+            f"CREATE TABLE {TABLE} (id uuid PRIMARY KEY, timestamp timestamp NOT NULL, actor_id uuid, "
+            "action smallint NOT NULL, document_id uuid, details jsonb)"
+        ))
+        await conn.execute(text(f"CREATE INDEX ix_{TABLE}_timestamp ON {TABLE} (timestamp)"))
+
+    reasons = "ARRAY[" + ", ".join(f"'{reason}'" for reason in REASONS) + "]"
+    step = 365 * 86400 / args.rows
+    for start in range(0, args.rows, args.batch):
+        end = min(start + args.batch, args.rows) - 1
+        batch_start = time.perf_counter()
+        async with engine.begin() as conn:
+            await conn.execute(text(
+                f"INSERT INTO {TABLE} (id, timestamp, actor_id, action, document_id, details) "
+                "SELECT md5('row' || g)::uuid, "
+                f"CAST(:anchor AS timestamp) - (g * {step}) * interval '1 second', "
+                f"md5('actor' || (g % {args.actors}))::uuid, "
+                "1 + g % 9, "
+                f"md5('doc' || ((g / 7) % {args.documents}))::uuid, "
+                f"CASE WHEN 1 + g % 9 = {REJECT} "
+                f"THEN jsonb_build_object('reason', ({reasons})[1 + g % {len(REASONS)}], 'version', 1 + g % 5) "
+                "ELSE jsonb_build_object('version', 1 + g % 5) END "
+                "FROM generate_series(:start, :end) AS g"
+            ), {"anchor": ANCHOR, "start": start, "end": end})
+        print(f"populated {end + 1}/{args.rows} rows ({time.perf_counter() - batch_start:.1f}s/batch)")
+    async with engine.begin() as conn:
+        await conn.execute(text(f"ANALYZE {TABLE}"))
+
+
+async def set_indexes(engine: AsyncEngine, enabled: bool) -> None:
+    async with engine.begin() as conn:
+        for name, ddl in INDEXES.items():
+            await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            if enabled:
+                start = time.perf_counter()
+                await conn.execute(text(ddl))
+                print(f"{name}: built in {time.perf_counter() - start:.1f}s")
+        await conn.execute(text(f"ANALYZE {TABLE}"))
+
+
+def query_params(name: str, rng: random.Random, args) -> dict:
+    until = ANCHOR - timedelta(days=rng.randint(0, 270))
+    params = {"limit": args.limit + 1, "since": until - timedelta(days=90), "until": until}
+    if name == "document_range":
+        params["document_id"] = md5_uuid(f"doc{rng.randrange(args.documents)}")
+        params["since"] = until - timedelta(days=365)
+    elif name in ("actor_quarter", "actor_page2"):
+        params["actor_id"] = md5_uuid(f"actor{rng.randrange(args.actors)}")
+    elif name == "reject_contains":
+        params = {"limit": args.limit + 1, "details": f'{{"reason": "{rng.choice(REASONS)}"}}'}
+    elif name == "reject_path":
+        params["path"] = f'$.reason ? (@ like_regex "{rng.choice(REASONS).split()[-1]}" flag "i")'
+    return params
+
+
+async def run_pass(engine: AsyncEngine, name: str, args) -> dict:
+    rng = random.Random(args.seed)
+    result = ScenarioResult(name)
+    with measure(result):
+        for _ in range(args.repeat):
+            for query_name, sql in QUERIES.items():
+                params = query_params(query_name, rng, args)
+                async with engine.connect() as conn:
+                    if query_name == "actor_page2":
+                        first = (await conn.execute(text(QUERIES["actor_quarter"]), params)).mappings().all()
+                        if not first:
+                            continue
+                        params.update(after_timestamp=first[-1]["timestamp"], after_id=first[-1]["id"])
+                    start = time.perf_counter()
+                    rows = (await conn.execute(text(sql), params)).all()
+                    result.record(query_name, time.perf_counter() - start)
+                if args.verbose:
+                    print(f"{name}/{query_name}: {len(rows)} rows")
+
+    summary = result.summary()
+    async with engine.connect() as conn:
+        sizes = (await conn.execute(text(
+            "SELECT c.relname, pg_relation_size(c.oid) FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            f"WHERE i.indrelid = '{TABLE}'::regclass"
+        ))).all()
+    summary["index_mb"] = {relname: round(size / (1024 * 1024), 1) for relname, size in sizes}
+    return summary
+
+
+async def main_async(args) -> int:
+    engine = create_async_engine(args.database_url)
+    results = {}
+    try:
+        if engine.dialect.name != "postgresql":
+            print("bench_audit_query requires PostgreSQL (jsonb_path_ops / jsonpath)")
+            return 2
+        async with engine.connect() as conn:
+            exists = (await conn.execute(text(f"SELECT to_regclass('{TABLE}') IS NOT NULL"))).scalar()
+        if not (args.reuse and exists):
+            await populate(engine, args)
+        if not args.skip_unindexed:
+            await set_indexes(engine, enabled=False)
+            results["unindexed"] = await run_pass(engine, "unindexed", args)
+        await set_indexes(engine, enabled=True)
+        results["indexed"] = await run_pass(engine, "indexed", args)
+        if not args.keep_table:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DROP TABLE {TABLE}"))
+    finally:
+        await engine.dispose()
+
+    print_table(results)
+    for name, summary in results.items():
+        print(f"{name}: indexes {summary['index_mb']}")
+
+    baseline_path = Path(args.baseline) if args.baseline else BASELINE_DIR / "audit_query.json"
+    if args.compare:
+        regressions = compare_to_baseline(results, baseline_path, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    if args.save_baseline:
+        params = {"rows": args.rows, "actors": args.actors, "documents": args.documents, "repeat": args.repeat}
+        print(f"Baseline saved to {save_baseline('audit_query', results, params, baseline_path)}")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True, help="PostgreSQL async URL")
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--batch", type=int, default=1_000_000, help="Rows per INSERT ... SELECT generate_series")
+    parser.add_argument("--actors", type=int, default=500)
+    parser.add_argument("--documents", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=50, help="Page size")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs of each query per pass")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reuse", action="store_true", help="Keep an existing populated table")
+    parser.add_argument("--keep-table", action="store_true")
+    parser.add_argument("--skip-unindexed", action="store_true", help="Skip the sequential-scan pass")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--baseline", help="Baseline JSON path (default: benchmarks/baselines/audit_query.json)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="Exit 1 on regression against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
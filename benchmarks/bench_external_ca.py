@@ -0,0 +1,118 @@
+"""
+ExternalCAClient under injected CA latency and failures: request latency,
+retries, and how fast the circuit breaker sheds load during an outage.
+
+In-process against benchmarks.mock_ca (no network, callbacks disabled):
+
+    python -m benchmarks.bench_external_ca --requests 500 --concurrency 32
+
+or against a running mock / staging CA:
+
+    python -m benchmarks.bench_external_ca --base-url http://localhost:9200
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+from app.core.external_ca import CircuitOpenError, ExternalCAClient, ExternalCAError
+
+from . import mock_ca
+from .harness import BASELINE_DIR, ScenarioResult, compare_to_baseline, measure, print_table, save_baseline
+
+PROVIDER = "MOCK_CA"
+
+SCENARIOS = {
+    "healthy": {"latency_ms": 50, "jitter_ms": 20, "failure_rate": 0.0, "hang_rate": 0.0},
+    "slow": {"latency_ms": 800, "jitter_ms": 200, "failure_rate": 0.0, "hang_rate": 0.0},
+    "flaky": {"latency_ms": 100, "jitter_ms": 50, "failure_rate": 0.3, "hang_rate": 0.02},
+    "outage": {"latency_ms": 20, "jitter_ms": 5, "failure_rate": 1.0, "hang_rate": 0.0},
+}
+
+
+def make_client(base_url: str, in_process: bool, timeout: float) -> ExternalCAClient:
+    client = ExternalCAClient(providers={PROVIDER: base_url})
+    provider = client.providers[PROVIDER]
+    provider.timeout = timeout
+    if in_process:
+        provider._client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=mock_ca.app), base_url=base_url, timeout=timeout
+        )
+    return client
+
+
+async def run_scenario(name: str, args) -> dict:
+    mock_ca.config.update(SCENARIOS[name], callbacks=False, hang_seconds=args.timeout * 2)
+    if not args.in_process:
+        async with httpx.AsyncClient(base_url=args.base_url) as admin:
+            await admin.post("/_config", json=mock_ca.config)
+
+    client = make_client(args.base_url, args.in_process, args.timeout)
+    result = ScenarioResult(name)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    payload = {"document_hash": "00" * 32, "hash_algorithm": "SHA-256", "file_name": "bench.pdf"}
+
+    async def one() -> None:
+        async with semaphore:
+            request_id = str(uuid.uuid4())
+            start = time.perf_counter()
+            try:
+                await client.post(PROVIDER, "/sign-requests", {**payload, "request_id": request_id}, request_id)
+                result.record("sign_request", time.perf_counter() - start)
+            except CircuitOpenError:
+                result.record("circuit_open", time.perf_counter() - start)
+            except ExternalCAError:
+                result.record("sign_request", time.perf_counter() - start, ok=False)
+
+    with measure(result):
+        await asyncio.gather(*(one() for _ in range(args.requests)))
+    await client.aclose()
+
+    summary = result.summary()
+    summary["breaker_state"] = client.providers[PROVIDER].breaker.state
+    return summary
+
+
+async def main_async(args) -> int:
+    results = {}
+    for name in args.scenario or list(SCENARIOS):
+        results[name] = await run_scenario(name, args)
+    print_table(results)
+    for name, summary in results.items():
+        print(f"{name}: errors {summary['errors']}, breaker {summary['breaker_state']}")
+
+    baseline_path = Path(args.baseline) if args.baseline else BASELINE_DIR / "external_ca.json"
+    if args.compare:
+        regressions = compare_to_baseline(results, baseline_path, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    if args.save_baseline:
+        params = {"requests": args.requests, "concurrency": args.concurrency, "timeout": args.timeout}
+        print(f"Baseline saved to {save_baseline('external_ca', results, params, baseline_path)}")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://mock-ca")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Repeatable; default: all")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=2.0, help="Per-attempt client timeout (s)")
+    parser.add_argument("--baseline", help="Baseline JSON path (default: benchmarks/baselines/external_ca.json)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="Exit 1 on regression against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+    args.in_process = args.base_url == "http://mock-ca"
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
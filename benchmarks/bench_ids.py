@@ -0,0 +1,151 @@
+"""
+Insert throughput and primary-key index size: uuid4 vs UUIDv7 keys on an
+audit_logs-shaped table (the hottest insert path).
+
+    python -m benchmarks.bench_ids --rows 200000 --batch 500
+
+Against PostgreSQL (index size from pg_relation_size, closest to prod):
+
+    python -m benchmarks.bench_ids --database-url postgresql+asyncpg://postgres:pw@localhost/bench
+
+Defaults to a temporary SQLite file (index size from dbstat).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, Text, Uuid, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from app.core.ids import uuid7
+
+from .harness import BASELINE_DIR, ScenarioResult, compare_to_baseline, measure, print_table, save_baseline
+
+GENERATORS = {"uuid4": uuid.uuid4, "uuid7": uuid7}
+
+
+def make_table(metadata: MetaData, name: str) -> Table:
+    return Table(
+        f"bench_ids_{name}",
+        metadata,
+        Column("id", Uuid, primary_key=True),
+        Column("timestamp", DateTime, nullable=False),
+        Column("actor_id", Uuid),
+        Column("action", String, nullable=False),
+        Column("document_id", Uuid),
+        Column("details", Text),
+    )
+
+
+async def index_size_bytes(engine: AsyncEngine, table: Table) -> Optional[int]:
+    async with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            result = await conn.execute(text(f"SELECT pg_relation_size('{table.name}_pkey')"))
+            return result.scalar()
+        if engine.dialect.name == "sqlite":
+            result = await conn.execute(
+                text("SELECT SUM(pgsize) FROM dbstat WHERE name = :name"),
+                {"name": f"sqlite_autoindex_{table.name}_1"},
+            )
+            return result.scalar()
+    return None
+
+
+async def run_generator(engine: AsyncEngine, name: str, generate: Callable[[], uuid.UUID], args) -> dict:
+    metadata = MetaData()
+    table = make_table(metadata, name)
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.drop_all)
+        await conn.run_sync(metadata.create_all)
+
+    actor_ids = [uuid.uuid4() for _ in range(20)]
+    document_ids = [uuid.uuid4() for _ in range(1000)]
+    details = json.dumps({"notes": "bench", "version": 1})
+    result = ScenarioResult(name)
+
+    with measure(result):
+        for offset in range(0, args.rows, args.batch):
+            count = min(args.batch, args.rows - offset)
+            rows = [
+                {
+                    "id": generate(),
+                    "timestamp": datetime.utcnow(),
+                    "actor_id": actor_ids[i % len(actor_ids)],
+                    "action": "UPLOAD_VERSION",
+                    "document_id": document_ids[(offset + i) % len(document_ids)],
+                    "details": details,
+                }
+                for i in range(count)
+            ]
+            start = time.perf_counter()
+            async with engine.begin() as conn:
+                await conn.execute(table.insert(), rows)
+            result.record("insert_batch", time.perf_counter() - start)
+
+    summary = result.summary()
+    summary["rows_per_s"] = round(args.rows / result.elapsed, 1) if result.elapsed else 0.0
+    size = await index_size_bytes(engine, table)
+    summary["pk_index_mb"] = round(size / (1024 * 1024), 2) if size is not None else None
+    if not args.keep_tables:
+        async with engine.begin() as conn:
+            await conn.run_sync(metadata.drop_all)
+    return summary
+
+
+async def main_async(args) -> int:
+    database_url = args.database_url
+    tmp_dir = None
+    if database_url is None:
+        tmp_dir = tempfile.mkdtemp(prefix="bench-ids-")
+        database_url = f"sqlite+aiosqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    engine = create_async_engine(database_url)
+
+    results = {}
+    try:
+        for name in args.generator or list(GENERATORS):
+            results[name] = await run_generator(engine, name, GENERATORS[name], args)
+    finally:
+        await engine.dispose()
+
+    print_table(results)
+    for name, summary in results.items():
+        print(f"{name}: {summary['rows_per_s']} rows/s, pk index {summary['pk_index_mb']} MB")
+
+    baseline_path = Path(args.baseline) if args.baseline else BASELINE_DIR / "ids.json"
+    if args.compare:
+        regressions = compare_to_baseline(results, baseline_path, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    if args.save_baseline:
+        params = {"rows": args.rows, "batch": args.batch, "dialect": database_url.split(":", 1)[0]}
+        print(f"Baseline saved to {save_baseline('ids', results, params, baseline_path)}")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="SQLAlchemy async URL (default: temporary SQLite file)")
+    parser.add_argument("--generator", action="append", choices=sorted(GENERATORS), help="Repeatable; default: all")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--keep-tables", action="store_true", help="Leave bench tables for manual inspection")
+    parser.add_argument("--baseline", help="Baseline JSON path (default: benchmarks/baselines/ids.json)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="Exit 1 on regression against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
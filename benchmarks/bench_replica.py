@@ -0,0 +1,146 @@
+"""
+Replica visibility delay: how long after a commit on the primary the row is
+readable on the replica, next to the lag the app's monitor reports
+(same query as app.db.routing). The p99 delay is the lower bound for
+DB_PRIMARY_PIN_SECONDS (read-your-writes window).
+
+Two local PostgreSQL instances (streaming replication, see prd/BLUEPRINT.md):
+
+    python -m benchmarks.bench_replica \\
+        --primary-url postgresql+asyncpg://postgres:pw@localhost:5432/bench \\
+        --replica-url postgresql+asyncpg://postgres:pw@localhost:5433/bench \\
+        --writes 500 --concurrency 8
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from .harness import BASELINE_DIR, ScenarioResult, compare_to_baseline, measure, print_table, save_baseline
+
+TABLE = "bench_replica_probe"
+# Same query as app.db.routing.LAG_QUERY (not imported: that module builds the app engines from settings)
+LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+async def wait_visible(replica: AsyncEngine, probe_id: int, timeout: float, poll: float) -> bool:
+    deadline = time.perf_counter() + timeout
+    async with replica.connect() as conn:
+        while time.perf_counter() < deadline:
+            found = (await conn.execute(text(f"SELECT 1 FROM {TABLE} WHERE id = :id"), {"id": probe_id})).scalar()
+            await conn.rollback()  # snapshot mới cho lần poll sau
+            if found:
+                return True
+            await asyncio.sleep(poll)
+    return False
+
+
+async def writer(primary: AsyncEngine, replica: AsyncEngine, result: ScenarioResult, count: int, args) -> None:
+    for _ in range(count):
+        start = time.perf_counter()
+        async with primary.begin() as conn:
+            probe_id = (await conn.execute(text(f"INSERT INTO {TABLE} DEFAULT VALUES RETURNING id"))).scalar()
+        committed = time.perf_counter()
+        result.record("primary_commit", committed - start)
+        visible = await wait_visible(replica, probe_id, args.timeout, args.poll)
+        result.record("replica_visible", time.perf_counter() - committed, ok=visible)
+
+
+async def sample_lag(replica: AsyncEngine, result: ScenarioResult, samples: List[float],
+                     stop: asyncio.Event, interval: float) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        async with replica.connect() as conn:
+            lag = float((await conn.execute(LAG_QUERY)).scalar() or 0)
+        result.record("lag_query", time.perf_counter() - start)
+        samples.append(lag)
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def main_async(args) -> int:
+    primary = create_async_engine(args.primary_url, pool_size=args.concurrency + 1)
+    replica = create_async_engine(args.replica_url, pool_size=args.concurrency + 2)
+    result = ScenarioResult("replica")
+    lag_samples: List[float] = []
+    try:
+        async with primary.begin() as conn:
+            await conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+            await conn.execute(text(f"CREATE TABLE {TABLE} (id bigserial PRIMARY KEY, written_at timestamptz DEFAULT now())"))
+        # Bảng phải sang replica trước khi đo
+        deadline = time.perf_counter() + args.timeout
+        while True:
+            async with replica.connect() as conn:
+                if (await conn.execute(text(f"SELECT to_regclass('{TABLE}') IS NOT NULL"))).scalar():
+                    break
+            if time.perf_counter() > deadline:
+                print(f"{TABLE} did not reach the replica within {args.timeout}s; is replication running?")
+                return 2
+            await asyncio.sleep(args.poll)
+
+        stop = asyncio.Event()
+        lag_task = asyncio.create_task(sample_lag(replica, result, lag_samples, stop, args.lag_interval))
+        per_writer = max(1, args.writes // args.concurrency)
+        with measure(result):
+            await asyncio.gather(*(writer(primary, replica, result, per_writer, args) for _ in range(args.concurrency)))
+        stop.set()
+        await lag_task
+
+        async with primary.begin() as conn:
+            await conn.execute(text(f"DROP TABLE {TABLE}"))
+    finally:
+        await primary.dispose()
+        await replica.dispose()
+
+    summary = result.summary()
+    samples = lag_samples or [0.0]
+    summary["reported_lag_max_s"] = round(max(samples), 4)
+    results = {"replica": summary}
+    print_table(results)
+    visible = summary["operations"].get("replica_visible", {})
+    print(f"reported lag max {summary['reported_lag_max_s']}s; "
+          f"visibility p99 {visible.get('p99_ms')}ms -> DB_PRIMARY_PIN_SECONDS should stay above it")
+
+    baseline_path = Path(args.baseline) if args.baseline else BASELINE_DIR / "replica.json"
+    if args.compare:
+        regressions = compare_to_baseline(results, baseline_path, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    if args.save_baseline:
+        params = {"writes": args.writes, "concurrency": args.concurrency}
+        print(f"Baseline saved to {save_baseline('replica', results, params, baseline_path)}")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--primary-url", required=True)
+    parser.add_argument("--replica-url", required=True)
+    parser.add_argument("--writes", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--poll", type=float, default=0.005, help="Replica poll interval (s)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Give up waiting for a row after (s)")
+    parser.add_argument("--lag-interval", type=float, default=0.5)
+    parser.add_argument("--baseline", help="Baseline JSON path (default: benchmarks/baselines/replica.json)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="Exit 1 on regression against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""
+SignFlow load test: upload -> submit -> lock -> approve/reject -> sign,
+plus downloads and dashboard listings, against local stand-ins.
+
+Run in-process (ASGI, app lifespan, schema created in a throwaway
+PostgreSQL database, temp storage dir, fake OAuth provider):
+
+    createdb signflow_bench
+    python -m benchmarks.bench_signflow --in-process --login-via-oauth \
+        --database-url postgresql+asyncpg://postgres:pw@localhost/signflow_bench --iterations 200
+
+or against a running stack started with the GOOGLE_*_URL settings pointing
+at the fake provider (see fake_oauth_settings):
+
+    python -m benchmarks.bench_signflow --base-url http://localhost:8000 \
+        --login-via-oauth --concurrency 16 --save-baseline
+
+Each scenario is timed first; heap / RSS peaks come from a separate,
+shorter pass (--memory-iterations) so tracing does not skew latencies.
+Results are printed as a table and optionally saved to
+benchmarks/baselines/signflow.json; --compare fails (exit 1) on p95 or
+throughput regressions beyond --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from .harness import (
+    BASELINE_DIR,
+    ScenarioResult,
+    compare_to_baseline,
+    measure,
+    measure_memory,
+    print_table,
+    save_baseline,
+)
+
+API = "/api/v1"
+
+# Route table for the documents API; override with --routes <file.json>
+DEFAULT_ROUTES = {
+    "upload": ("POST", API + "/documents"),
+    "submit": ("POST", API + "/documents/{id}/submit"),
+    "lock": ("POST", API + "/documents/{id}/lock"),
+    "approve": ("POST", API + "/documents/{id}/approve"),
+    "reject": ("POST", API + "/documents/{id}/reject"),
+    "sign": ("POST", API + "/documents/{id}/sign"),
+    "download": ("GET", API + "/documents/{id}/download"),
+    "list": ("GET", API + "/documents"),
+}
+
+PDF_SIZES = {"small": 100 * 1024, "medium": 2 * 1024 * 1024, "large": 20 * 1024 * 1024}
+
+_pdf_cache: Dict[int, bytes] = {}
+
+
+def make_pdf(size: int) -> bytes:
+    """Minimal valid single-page PDF padded with a binary stream to `size` bytes."""
+    if size in _pdf_cache:
+        return _pdf_cache[size]
+    header = b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n"
+    objects = [
+        b"1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n",
+        b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n",
+        b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 595 842]/Contents 4 0 R>>endobj\n",
+    ]
+    trailer = b"trailer<</Root 1 0 R>>\n%%EOF\n"
+    fixed = len(header) + sum(map(len, objects)) + len(trailer) + 64
+    payload = random.Random(size).randbytes(max(0, size - fixed))
+    stream = b"4 0 obj<</Length %d>>stream\n" % len(payload) + payload + b"\nendstream endobj\n"
+    data = header + b"".join(objects) + stream + trailer
+    _pdf_cache[size] = data
+    return data
+
+
+class SignFlowClient:
+    def __init__(self, client: httpx.AsyncClient, routes: Dict[str, tuple], result: ScenarioResult):
+        self.client = client
+        self.routes = routes
+        self.result = result
+
+    async def call(self, operation: str, doc_id: Optional[str] = None, **kwargs) -> Optional[httpx.Response]:
+        method, path = self.routes[operation]
+        url = path.format(id=doc_id) if doc_id else path
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        nbytes = len(kwargs["files"]["file"][1]) if "files" in kwargs else (len(response.content) if response else 0)
+        self.result.record(operation, time.perf_counter() - start, ok=ok, nbytes=nbytes)
+        return response if ok else None
+
+    async def upload(self, size: int) -> Optional[str]:
+        response = await self.call(
+            "upload",
+            data={"title": f"Bench {size}", "description": "benchmark"},
+            files={"file": ("bench.pdf", make_pdf(size), "application/pdf")},
+        )
+        return str(response.json().get("id")) if response is not None else None
+
+
+# -----------------------------------------------------------------------
+# Scenarios
+# -----------------------------------------------------------------------
+async def flow_upload(c: SignFlowClient, size: str = "small") -> None:
+    await c.upload(PDF_SIZES[size])
+
+
+async def flow_review(c: SignFlowClient, approve: bool = True) -> Optional[str]:
+    doc_id = await c.upload(PDF_SIZES["small"])
+    if not doc_id:
+        return None
+    await c.call("submit", doc_id)
+    await c.call("lock", doc_id)
+    if approve:
+        await c.call("approve", doc_id, json={"notes": "ok"})
+    else:
+        await c.call("reject", doc_id, json={"notes": "thiếu chữ ký"})
+    return doc_id
+
+
+async def flow_sign(c: SignFlowClient) -> None:
+    doc_id = await flow_review(c, approve=True)
+    if doc_id:
+        await c.call("sign", doc_id, json={"notes": "bench"})
+
+
+async def flow_download(c: SignFlowClient, doc_ids: List[str]) -> None:
+    if doc_ids:
+        await c.call("download", random.choice(doc_ids))
+
+
+async def flow_list(c: SignFlowClient) -> None:
+    await c.call("list", params={"limit": 50})
+
+
+def build_scenarios(seed_ids: List[str]) -> Dict[str, Callable]:
+    mixed_weights = [
+        (lambda c: flow_list(c), 40),
+        (lambda c: flow_download(c, seed_ids), 25),
+        (lambda c: flow_upload(c, "small"), 15),
+        (lambda c: flow_upload(c, "medium"), 5),
+        (lambda c: flow_review(c, approve=True), 8),
+        (lambda c: flow_review(c, approve=False), 3),
+        (lambda c: flow_sign(c), 4),
+    ]
+    flows, weights = zip(*mixed_weights)
+
+    return {
+        "upload_small": lambda c: flow_upload(c, "small"),
+        "upload_medium": lambda c: flow_upload(c, "medium"),
+        "upload_large": lambda c: flow_upload(c, "large"),
+        "approve_flow": lambda c: flow_review(c, approve=True),
+        "reject_flow": lambda c: flow_review(c, approve=False),
+        "sign_flow": flow_sign,
+        "download": lambda c: flow_download(c, seed_ids),
+        "dashboard_list": flow_list,
+        "mixed": lambda c: random.choices(flows, weights)[0](c),
+    }
+
+
+async def run_scenario(
+    name: str,
+    flow: Callable,
+    make_client: Callable[[], httpx.AsyncClient],
+    routes: Dict[str, tuple],
+    iterations: int,
+    concurrency: int,
+    memory_iterations: int,
+) -> dict:
+    result = ScenarioResult(name)
+
+    async def run(count: int, target: ScenarioResult) -> None:
+        queue: asyncio.Queue = asyncio.Queue()
+        for i in range(count):
+            queue.put_nowait(i)
+        async with make_client() as client:
+            sfc = SignFlowClient(client, routes, target)
+
+            async def worker():
+                while True:
+                    try:
+                        queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    await flow(sfc)
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    with measure(result):
+        await run(iterations, result)
+
+    if memory_iterations:
+        # Lượt riêng, không tính giờ: tracemalloc làm chậm mọi phép cấp phát
+        memory = ScenarioResult(name)
+        with measure_memory(memory):
+            await run(memory_iterations, memory)
+        result.traced_peak_mb, result.rss_peak_mb = memory.traced_peak_mb, memory.rss_peak_mb
+
+    return result.summary()
+
+
+# -----------------------------------------------------------------------
+# Setup
+# -----------------------------------------------------------------------
+def fake_oauth_settings(oauth_url: str) -> Dict[str, str]:
+    """GOOGLE_*_URL settings that point the app's login flow at benchmarks.fake_oauth."""
+    return {
+        "GOOGLE_AUTH_URL": f"{oauth_url}/authorize",
+        "GOOGLE_TOKEN_URL": f"{oauth_url}/token",
+        "GOOGLE_USERINFO_URL": f"{oauth_url}/userinfo",
+    }
+
+
+@asynccontextmanager
+async def serve_fake_oauth(port: int):
+    """Run benchmarks.fake_oauth on 127.0.0.1:<port> for the duration of the run."""
+    import uvicorn
+
+    from .fake_oauth import app as oauth_app
+
+    server = uvicorn.Server(uvicorn.Config(oauth_app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        await task
+
+
+class _SplitTransport(httpx.AsyncBaseTransport):
+    """The app in-process (ASGI); any other host (fake OAuth provider) over the network."""
+
+    def __init__(self, app_host: str, app_transport: httpx.AsyncBaseTransport):
+        self.app_host = app_host
+        self.app_transport = app_transport
+        self.network = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        transport = self.app_transport if request.url.host == self.app_host else self.network
+        return await transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self.network.aclose()
+
+
+@asynccontextmanager
+async def in_process_app(database_url: str, oauth_url: Optional[str]):
+    """
+    Import the app against a dedicated PostgreSQL database and a temp storage
+    dir, create the schema, and run the app lifespan (background services,
+    storage / CA clients) around the benchmark like uvicorn would.
+    """
+    if not database_url or not database_url.startswith("postgresql"):
+        raise SystemExit("--in-process needs a PostgreSQL --database-url (models use JSONB / UUID columns)")
+    workdir = Path(tempfile.mkdtemp(prefix="signflow-bench-"))
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["LOCAL_STORAGE_DIR"] = str(workdir / "storage")
+    os.environ.setdefault("STATE_SECRET_KEY", "bench")
+    if oauth_url:
+        os.environ.update(fake_oauth_settings(oauth_url))
+
+    from sqlalchemy import text
+    from sqlmodel import SQLModel
+
+    from app.db.database import engine
+    from app.main import app, load_modules
+
+    # Import mọi module -> mọi model đã đăng ký vào SQLModel.metadata
+    load_modules()
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    async with app.router.lifespan_context(app):
+        yield app
+
+
+def in_process_client_factory(app, cookies: Optional[dict]) -> Callable[[], httpx.AsyncClient]:
+    transport = httpx.ASGITransport(app=app)
+    return lambda: httpx.AsyncClient(
+        transport=_SplitTransport("bench", transport), base_url="http://bench", cookies=cookies, timeout=120
+    )
+
+
+async def oauth_login(make_client: Callable[[], httpx.AsyncClient], email: str) -> Optional[str]:
+    """
+    Go through /auth/login -> fake provider -> /auth/callback and return
+    the session cookie set by the app.
+    """
+    async with make_client() as client:
+        client.follow_redirects = True
+        await client.get("/auth/login", params={"login_hint": email})
+        return client.cookies.get("access_token")
+
+
+async def main_async(args) -> int:
+    routes = dict(DEFAULT_ROUTES)
+    if args.routes:
+        routes.update({k: tuple(v) for k, v in json.loads(Path(args.routes).read_text()).items()})
+
+    cookie = args.session_cookie or os.environ.get("BENCH_SESSION_COOKIE")
+    async with AsyncExitStack() as stack:
+        oauth_url = None
+        if args.login_via_oauth and not cookie:
+            oauth_url = await stack.enter_async_context(serve_fake_oauth(args.oauth_port))
+
+        if args.in_process:
+            app = await stack.enter_async_context(in_process_app(args.database_url, oauth_url))
+            make_login_client = in_process_client_factory(app, None)
+        else:
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            make_login_client = lambda: httpx.AsyncClient(base_url=args.base_url, timeout=30)
+
+        if oauth_url:
+            cookie = await oauth_login(make_login_client, args.email)
+            if not cookie:
+                print("OAuth login did not set a session cookie; is the app configured with "
+                      f"{', '.join(fake_oauth_settings(oauth_url))}?")
+                return 2
+        cookies = {"access_token": cookie} if cookie else None
+
+        if args.in_process:
+            make_client = in_process_client_factory(app, cookies)
+        else:
+            make_client = lambda: httpx.AsyncClient(base_url=args.base_url, cookies=cookies, limits=limits, timeout=120)
+
+        # Seed documents for download scenarios
+        seed = ScenarioResult("seed")
+        async with make_client() as client:
+            sfc = SignFlowClient(client, routes, seed)
+            seed_ids = [i for i in [await sfc.upload(PDF_SIZES["small"]) for _ in range(args.seed)] if i]
+
+        scenarios = build_scenarios(seed_ids)
+        selected = args.scenario or list(scenarios)
+        results = {}
+        for name in selected:
+            iterations = max(1, args.iterations // 10) if name == "upload_large" else args.iterations
+            memory_iterations = min(iterations, args.memory_iterations)
+            results[name] = await run_scenario(
+                name, scenarios[name], make_client, routes, iterations, args.concurrency, memory_iterations
+            )
+
+    print_table(results)
+
+    baseline_path = Path(args.baseline) if args.baseline else BASELINE_DIR / "signflow.json"
+    params = {"iterations": args.iterations, "concurrency": args.concurrency, "in_process": args.in_process}
+    if args.compare:
+        regressions = compare_to_baseline(results, baseline_path, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    if args.save_baseline:
+        print(f"Baseline saved to {save_baseline('signflow', results, params, baseline_path)}")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--in-process", action="store_true", help="Run the app via ASGITransport (with lifespan)")
+    parser.add_argument("--database-url", default=os.environ.get("BENCH_DATABASE_URL"),
+                        help="Throwaway PostgreSQL database for --in-process (schema is created)")
+    parser.add_argument("--session-cookie", help="access_token cookie of an active user")
+    parser.add_argument("--login-via-oauth", action="store_true", help="Log in through the fake OAuth provider")
+    parser.add_argument("--email", default="bench-user@example.com")
+    parser.add_argument("--oauth-port", type=int, default=9100, help="Port of the fake OAuth provider")
+    parser.add_argument("--routes", help="JSON file overriding the route table")
+    parser.add_argument("--scenario", action="append", help="Scenario to run (repeatable); default: all")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=20, help="Documents uploaded before download scenarios")
+    parser.add_argument("--memory-iterations", type=int, default=20,
+                        help="Iterations of the separate heap / RSS pass per scenario (0 = skip)")
+    parser.add_argument("--baseline", help="Baseline JSON path (default: benchmarks/baselines/signflow.json)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="Exit 1 on regression against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
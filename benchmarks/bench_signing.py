@@ -0,0 +1,80 @@
+"""
+Sign / verify throughput per signature algorithm (RSA-PSS, Ed25519,
+ECDSA P-256) using the same code paths as the internal signer.
+
+    python -m benchmarks.bench_signing --iterations 2000 --threads 4
+
+--threads > 1 runs the operations on a thread pool (OpenSSL releases the
+GIL) to show how each algorithm scales across cores.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from app.core.signing import ALGORITHMS
+
+from .harness import BASELINE_DIR, ScenarioResult, compare_to_baseline, measure, print_table, save_baseline
+
+
+def run_algorithm(name: str, iterations: int, threads: int) -> dict:
+    algorithm = ALGORITHMS[name]
+    private_key = algorithm.generate_private_key()
+    public_key = private_key.public_key()
+    hashes = [os.urandom(32) for _ in range(iterations)]
+
+    result = ScenarioResult(name)
+
+    def sign(data: bytes) -> bytes:
+        start = time.perf_counter()
+        signature = algorithm.sign(private_key, data)
+        result.record("sign", time.perf_counter() - start)
+        return signature
+
+    def verify(item) -> None:
+        data, signature = item
+        start = time.perf_counter()
+        algorithm.verify(public_key, signature, data)
+        result.record("verify", time.perf_counter() - start)
+
+    with measure(result), ThreadPoolExecutor(max_workers=threads) as pool:
+        signatures = list(pool.map(sign, hashes))
+        list(pool.map(verify, zip(hashes, signatures)))
+
+    summary = result.summary()
+    summary["signature_bytes"] = len(signatures[0])
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--algorithm", action="append", choices=sorted(ALGORITHMS), help="Repeatable; default: all")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--baseline", help="Baseline JSON path (default: benchmarks/baselines/signing.json)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="Exit 1 on regression against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    results = {name: run_algorithm(name, args.iterations, args.threads) for name in args.algorithm or ALGORITHMS}
+    print_table(results)
+    for name, summary in results.items():
+        print(f"{name}: signature {summary['signature_bytes']} bytes")
+
+    baseline_path = Path(args.baseline) if args.baseline else BASELINE_DIR / "signing.json"
+    if args.compare:
+        regressions = compare_to_baseline(results, baseline_path, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+    if args.save_baseline:
+        params = {"iterations": args.iterations, "threads": args.threads}
+        print(f"Baseline saved to {save_baseline('signing', results, params, baseline_path)}")
+
+
+if __name__ == "__main__":
+    main()
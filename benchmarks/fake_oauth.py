@@ -0,0 +1,66 @@
+"""
+Minimal stand-in for the Google OAuth2/OIDC endpoints used by the login
+flow, so benchmarks never reach accounts.google.com.
+
+    uvicorn benchmarks.fake_oauth:app --port 9100
+"""
+import base64
+import json
+import time
+import uuid
+from urllib.parse import urlencode
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, RedirectResponse
+from starlette.routing import Route
+
+_codes = {}
+
+
+def _unsigned_jwt(claims: dict) -> str:
+    def b64(data: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+    return f"{b64({'alg': 'none', 'typ': 'JWT'})}.{b64(claims)}."
+
+
+async def authorize(request: Request):
+    """Approve immediately and bounce back to redirect_uri with a code."""
+    email = request.query_params.get("login_hint", "bench-user@example.com")
+    code = uuid.uuid4().hex
+    _codes[code] = email
+    query = urlencode({"code": code, "state": request.query_params.get("state", "")})
+    return RedirectResponse(f"{request.query_params['redirect_uri']}?{query}", status_code=302)
+
+
+async def token(request: Request):
+    form = await request.form()
+    email = _codes.pop(form.get("code"), "bench-user@example.com")
+    now = int(time.time())
+    claims = {
+        "iss": "https://fake-oauth.local",
+        "sub": f"bench-{email}",
+        "email": email,
+        "email_verified": True,
+        "name": email.split("@")[0],
+        "iat": now,
+        "exp": now + 3600,
+    }
+    return JSONResponse({
+        "access_token": uuid.uuid4().hex,
+        "id_token": _unsigned_jwt(claims),
+        "token_type": "Bearer",
+        "expires_in": 3600,
+    })
+
+
+async def userinfo(request: Request):
+    return JSONResponse({"sub": "bench-user", "email": "bench-user@example.com", "name": "bench-user"})
+
+
+app = Starlette(routes=[
+    Route("/authorize", authorize),
+    Route("/token", token, methods=["POST"]),
+    Route("/userinfo", userinfo),
+])
@@ -0,0 +1,206 @@
+"""
+Shared helpers for the benchmark suites: latency recording, percentile
+summaries, memory sampling and JSON baselines for regression comparison.
+"""
+import json
+import math
+import os
+import platform
+import statistics
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile on an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def current_rss_mb() -> Optional[float]:
+    """Resident set size right now (Linux /proc); None where unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class RssSampler:
+    """
+    Peak RSS over one scenario, sampled from a background thread.
+    (ru_maxrss is the peak of the whole process lifetime, so it cannot
+    tell scenarios apart once an earlier one grew the heap.)
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _sample(self) -> None:
+        rss = current_rss_mb()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "RssSampler":
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+class ScenarioResult:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.elapsed = 0.0
+        self.bytes = 0
+        # Chỉ có giá trị sau measure_memory (lượt đo bộ nhớ riêng)
+        self.traced_peak_mb: Optional[float] = None
+        self.rss_peak_mb: Optional[float] = None
+
+    def record(self, operation: str, seconds: float, ok: bool = True, nbytes: int = 0) -> None:
+        if ok:
+            self.latencies.setdefault(operation, []).append(seconds)
+            self.bytes += nbytes
+        else:
+            self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    def summary(self) -> dict:
+        operations = {}
+        total = 0
+        for operation, values in self.latencies.items():
+            values = sorted(values)
+            total += len(values)
+            operations[operation] = {
+                "count": len(values),
+                "throughput_per_s": round(len(values) / self.elapsed, 2) if self.elapsed else 0.0,
+                "mean_ms": round(statistics.fmean(values) * 1000, 3),
+                "p50_ms": round(percentile(values, 50) * 1000, 3),
+                "p95_ms": round(percentile(values, 95) * 1000, 3),
+                "p99_ms": round(percentile(values, 99) * 1000, 3),
+                "max_ms": round(values[-1] * 1000, 3),
+            }
+        return {
+            "elapsed_s": round(self.elapsed, 3),
+            "operations_total": total,
+            "throughput_per_s": round(total / self.elapsed, 2) if self.elapsed else 0.0,
+            "mb_per_s": round(self.bytes / (1024 * 1024) / self.elapsed, 2) if self.elapsed else 0.0,
+            "errors": self.errors,
+            "memory": {
+                "traced_peak_mb": _round(self.traced_peak_mb),
+                "rss_peak_mb": _round(self.rss_peak_mb),
+            },
+            "operations": operations,
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 2)
+
+
+@contextmanager
+def measure(result: ScenarioResult):
+    """Time a scenario. No memory tracing here: tracemalloc would inflate the latencies."""
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result.elapsed = time.perf_counter() - start
+
+
+@contextmanager
+def measure_memory(result: ScenarioResult):
+    """
+    Separate, untimed pass: Python heap peak (tracemalloc) and RSS peak of
+    this scenario only. Run it after the timed pass, not around it.
+    """
+    tracemalloc.start()
+    sampler = RssSampler()
+    try:
+        with sampler:
+            yield result
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result.traced_peak_mb = peak / (1024 * 1024)
+        result.rss_peak_mb = sampler.peak
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def save_baseline(suite: str, results: Dict[str, dict], params: dict, path: Optional[Path] = None) -> Path:
+    path = path or BASELINE_DIR / f"{suite}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {"suite": suite, "environment": environment(), "params": params, "scenarios": results}
+    path.write_text(json.dumps(payload, indent=2, ensure_ascii=False))
+    return path
+
+
+def compare_to_baseline(results: Dict[str, dict], baseline_path: Path, tolerance: float = 0.15) -> List[str]:
+    """
+    Compare p95 latency and throughput per operation with a saved baseline.
+    Returns human-readable regressions beyond `tolerance` (0.15 = 15%).
+    """
+    if not baseline_path.exists():
+        return []
+    baseline = json.loads(baseline_path.read_text())["scenarios"]
+    regressions = []
+    for scenario, summary in results.items():
+        old_ops = baseline.get(scenario, {}).get("operations", {})
+        for operation, stats in summary.get("operations", {}).items():
+            old = old_ops.get(operation)
+            if not old:
+                continue
+            if old["p95_ms"] and stats["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"{scenario}/{operation}: p95 {old['p95_ms']}ms -> {stats['p95_ms']}ms"
+                )
+            if old["throughput_per_s"] and stats["throughput_per_s"] < old["throughput_per_s"] * (1 - tolerance):
+                regressions.append(
+                    f"{scenario}/{operation}: throughput {old['throughput_per_s']}/s -> {stats['throughput_per_s']}/s"
+                )
+    return regressions
+
+
+def print_table(results: Dict[str, dict]) -> None:
+    header = f"{'scenario':<22}{'operation':<16}{'count':>7}{'ops/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}"
+    print(header)
+    print("-" * len(header))
+    for scenario, summary in results.items():
+        for operation, stats in summary["operations"].items():
+            print(
+                f"{scenario:<22}{operation:<16}{stats['count']:>7}{stats['throughput_per_s']:>10}"
+                f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+            )
+        memory = summary["memory"]
+        if memory["traced_peak_mb"] is not None:
+            print(f"{'':<22}memory: heap peak {memory['traced_peak_mb']} MB, rss peak {memory['rss_peak_mb']} MB")
@@ -0,0 +1,116 @@
+"""
+Local stand-in for an external CA (Viettel-CA / VNPT-CA / FPT-CA) with
+latency and failure injection, for exercising ExternalCAClient and the
+callback endpoint without a real provider.
+
+    MOCK_CA_LATENCY_MS=800 MOCK_CA_FAILURE_RATE=0.2 \\
+        uvicorn benchmarks.mock_ca:app --port 9200
+
+Injection can also be changed at runtime: POST /_config with a JSON body
+({"latency_ms": 50, "failure_rate": 1.0, ...}); GET /_stats returns counters.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import random
+import uuid
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+config = {
+    "latency_ms": float(os.environ.get("MOCK_CA_LATENCY_MS", 50)),
+    "jitter_ms": float(os.environ.get("MOCK_CA_JITTER_MS", 20)),
+    "failure_rate": float(os.environ.get("MOCK_CA_FAILURE_RATE", 0)),   # -> 503
+    "hang_rate": float(os.environ.get("MOCK_CA_HANG_RATE", 0)),         # sleep past client timeouts
+    "hang_seconds": float(os.environ.get("MOCK_CA_HANG_SECONDS", 30)),
+    "reject_rate": float(os.environ.get("MOCK_CA_REJECT_RATE", 0)),     # callback REJECTED
+    "callbacks": os.environ.get("MOCK_CA_CALLBACKS", "1") == "1",
+    "callback_delay_ms": float(os.environ.get("MOCK_CA_CALLBACK_DELAY_MS", 200)),
+    "duplicate_callbacks": int(os.environ.get("MOCK_CA_DUPLICATE_CALLBACKS", 1)),
+    "callback_secret": os.environ.get("MOCK_CA_CALLBACK_SECRET", os.environ.get("EXTERNAL_CA_CALLBACK_SECRET", "")),
+}
+stats = {"requests": 0, "replayed": 0, "failed": 0, "hung": 0, "callbacks_sent": 0, "callbacks_failed": 0}
+
+_private_key = ed25519.Ed25519PrivateKey.generate()
+_public_key_pem = _private_key.public_key().public_bytes(
+    serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+).decode()
+# Idempotency-Key -> response body
+_responses = {}
+
+
+async def _send_callback(payload: dict, callback_url: str) -> None:
+    await asyncio.sleep(config["callback_delay_ms"] / 1000)
+    if random.random() < config["reject_rate"]:
+        result = {"request_id": payload["request_id"], "status": "REJECTED", "reason": "Người ký từ chối"}
+    else:
+        signature = _private_key.sign(bytes.fromhex(payload["document_hash"]))
+        result = {
+            "request_id": payload["request_id"],
+            "status": "SIGNED",
+            "signature": base64.b64encode(signature).decode(),
+            "public_key_pem": _public_key_pem,
+        }
+    result["reference"] = _responses.get(payload["request_id"], {}).get("reference")
+    body = json.dumps(result).encode()
+    headers = {
+        "Content-Type": "application/json",
+        "X-CA-Signature": hmac.new(config["callback_secret"].encode(), body, hashlib.sha256).hexdigest(),
+    }
+    async with httpx.AsyncClient(timeout=10) as client:
+        # Gửi lặp để kiểm tra callback idempotent
+        for _ in range(max(1, config["duplicate_callbacks"])):
+            try:
+                await client.post(callback_url, content=body, headers=headers)
+                stats["callbacks_sent"] += 1
+            except httpx.HTTPError:
+                stats["callbacks_failed"] += 1
+
+
+async def sign_requests(request: Request):
+    stats["requests"] += 1
+    key = request.headers.get("Idempotency-Key")
+    if key and key in _responses:
+        stats["replayed"] += 1
+        return JSONResponse(_responses[key], status_code=202)
+
+    await asyncio.sleep(max(0.0, random.gauss(config["latency_ms"], config["jitter_ms"])) / 1000)
+    if random.random() < config["hang_rate"]:
+        stats["hung"] += 1
+        await asyncio.sleep(config["hang_seconds"])
+    if random.random() < config["failure_rate"]:
+        stats["failed"] += 1
+        return JSONResponse({"error": "injected failure"}, status_code=503)
+
+    payload = await request.json()
+    body = {"status": "REQUESTED", "reference": f"MOCK-{uuid.uuid4().hex[:12]}"}
+    if key:
+        _responses[key] = body
+    if config["callbacks"] and payload.get("callback_url"):
+        asyncio.get_running_loop().create_task(_send_callback(payload, payload["callback_url"]))
+    return JSONResponse(body, status_code=202)
+
+
+async def set_config(request: Request):
+    config.update(await request.json())
+    return JSONResponse(config)
+
+
+async def get_stats(request: Request):
+    return JSONResponse(stats)
+
+
+app = Starlette(routes=[
+    Route("/sign-requests", sign_requests, methods=["POST"]),
+    Route("/_config", set_config, methods=["POST"]),
+    Route("/_stats", get_stats),
+])
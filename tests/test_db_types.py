@@ -0,0 +1,49 @@
+from enum import Enum
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from app.db.types import SmallIntEnum  # noqa: E402
+
+
+class Status(str, Enum):
+    DRAFT = "DRAFT"
+    APPROVED = "APPROVED"
+
+
+CODES = {Status.DRAFT: 1, Status.APPROVED: 2}
+
+
+def test_bind_and_result_round_trip():
+    column_type = SmallIntEnum(Status, CODES)
+    assert column_type.process_bind_param(Status.APPROVED, None) == 2
+    assert column_type.process_result_value(2, None) is Status.APPROVED
+    assert column_type.process_bind_param(None, None) is None
+    assert column_type.process_result_value(None, None) is None
+
+
+def test_bind_accepts_member_value_string():
+    column_type = SmallIntEnum(Status, CODES)
+    assert column_type.process_bind_param("DRAFT", None) == 1
+    assert column_type.process_literal_param(Status.DRAFT, None) == "1"
+
+
+def test_unknown_value_is_rejected():
+    column_type = SmallIntEnum(Status, CODES)
+    with pytest.raises(ValueError):
+        column_type.process_bind_param("ARCHIVED", None)
+    with pytest.raises(KeyError):
+        column_type.process_result_value(99, None)
+
+
+def test_missing_or_duplicate_codes_are_rejected():
+    with pytest.raises(ValueError):
+        SmallIntEnum(Status, {Status.DRAFT: 1})
+    with pytest.raises(ValueError):
+        SmallIntEnum(Status, {Status.DRAFT: 1, Status.APPROVED: 1})
+
+
+def test_codes_are_hashable_for_statement_cache():
+    assert hash(SmallIntEnum(Status, CODES).codes) == hash(SmallIntEnum(Status, dict(CODES)).codes)
+    assert SmallIntEnum(Status, CODES).python_type is Status
@@ -0,0 +1,107 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+template = pytest.importorskip("app.core.template")
+
+settings = template.settings
+
+
+def _request(path, cookies=None):
+    return SimpleNamespace(url=SimpleNamespace(path=path), cookies=cookies or {})
+
+
+@pytest.fixture
+def renderer(monkeypatch):
+    renderer = template.ErrorRenderer(cache_size=2)
+    renderer.renders = []
+
+    def render_html(status_code, title, detail, user):
+        renderer.renders.append((status_code, title, detail, user))
+        return f"{status_code}|{title}|{detail}|{user}".encode("utf-8")
+
+    monkeypatch.setattr(renderer, "_render_html", render_html)
+    return renderer
+
+
+def render(renderer, request, status_code, **kwargs):
+    return asyncio.run(renderer.render(request, status_code, **kwargs))
+
+
+def test_api_paths_get_cached_json(renderer):
+    request = _request(f"{settings.API_V1_STR}/documents/1")
+    first = render(renderer, request, 404, detail="Không tìm thấy tài liệu.", headers={"X-Test": "1"})
+    second = render(renderer, request, 404, detail="Không tìm thấy tài liệu.")
+
+    assert first.media_type == "application/json" and first.status_code == 404
+    assert json.loads(first.body) == {"detail": "Không tìm thấy tài liệu."}
+    assert first.headers["x-test"] == "1"
+    assert second.body is first.body
+    assert renderer.renders == []
+
+
+def test_api_detail_defaults_and_structured_detail(renderer):
+    request = _request(f"{settings.API_V1_STR}/x")
+    assert json.loads(render(renderer, request, 404).body) == {"detail": "Not Found"}
+    body = render(renderer, request, 422, detail=[{"loc": ["q"], "msg": "quá ngắn"}]).body
+    assert json.loads(json.loads(body)["detail"]) == [{"loc": ["q"], "msg": "quá ngắn"}]
+
+
+def test_web_paths_render_html_once_per_status_title_detail(renderer):
+    request = _request("/documents/1")
+    first = render(renderer, request, 404, detail="Không tìm thấy")
+    second = render(renderer, request, 404, detail="Không tìm thấy")
+    other_title = render(renderer, request, 404, detail="Không tìm thấy", title="Trang không tồn tại")
+
+    assert first.media_type == "text/html" and first.status_code == 404
+    assert second.body == first.body
+    assert other_title.body != first.body
+    assert renderer.renders == [
+        (404, "Lỗi 404", "Không tìm thấy", None),
+        (404, "Trang không tồn tại", "Không tìm thấy", None),
+    ]
+
+
+def test_html_cache_evicts_least_recently_used(renderer):
+    request = _request("/")
+    render(renderer, request, 400, detail="a")
+    render(renderer, request, 400, detail="b")
+    render(renderer, request, 400, detail="a")  # "a" mới dùng lại -> "b" bị loại trước
+    render(renderer, request, 400, detail="c")
+    render(renderer, request, 400, detail="a")
+    render(renderer, request, 400, detail="b")
+    assert [detail for _, _, detail, _ in renderer.renders] == ["a", "b", "c", "b"]
+    assert len(renderer._html_cache) == 2
+
+
+def test_logged_in_users_are_rendered_per_request(renderer, monkeypatch):
+    user = SimpleNamespace(id=1)
+    lookups = []
+
+    async def get_user_from_request(request):
+        lookups.append(request)
+        return user if request.cookies[settings.SESSION_COOKIE_NAME] == "valid" else None
+
+    monkeypatch.setattr(template.user_registry, "get_user_from_request", get_user_from_request)
+    logged_in = _request("/", {settings.SESSION_COOKIE_NAME: "valid"})
+    expired = _request("/", {settings.SESSION_COOKIE_NAME: "expired"})
+
+    render(renderer, logged_in, 403, detail="x")
+    render(renderer, logged_in, 403, detail="x")
+    render(renderer, expired, 403, detail="x")
+    render(renderer, _request("/"), 403, detail="x")
+
+    assert len(lookups) == 3
+    assert [rendered_user for *_, rendered_user in renderer.renders] == [user, user, None]
+    assert list(renderer._html_cache) == [(403, "Lỗi 403", "x")]
+
+
+def test_counters_and_default_detail(renderer):
+    render(renderer, _request(f"{settings.API_V1_STR}/x"), 404)
+    render(renderer, _request("/"), 404)
+    render(renderer, _request("/"), 500)
+    assert renderer.snapshot() == {404: 2, 500: 1}
+    assert template.ErrorRenderer.default_detail(503) == "Service Unavailable"
+    assert template.ErrorRenderer.default_detail(799) == "Error"
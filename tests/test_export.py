@@ -0,0 +1,150 @@
+import asyncio
+import csv
+import enum
+import gzip
+import io
+import json
+import zlib
+from datetime import date, datetime
+from uuid import UUID
+
+import pytest
+
+export = pytest.importorskip("app.core.export")
+
+DOCUMENT_ID = UUID("0190b8e4-7c3a-7000-8000-000000000001")
+
+
+class Status(enum.Enum):
+    APPROVED = "APPROVED"
+
+
+ROWS = [
+    (DOCUMENT_ID, "Hợp đồng, \"bản 2\"", Status.APPROVED, datetime(2026, 3, 1, 8, 30), {"size": 10, "tags": ["a"]}),
+    (DOCUMENT_ID, None, Status.APPROVED, date(2026, 3, 2), None),
+]
+COLUMNS = ["id", "title", "status", "created_at", "details"]
+
+
+def test_export_value():
+    assert export.export_value(Status.APPROVED) == "APPROVED"
+    assert export.export_value(datetime(2026, 3, 1, 8, 30)) == "2026-03-01T08:30:00"
+    assert export.export_value(date(2026, 3, 2)) == "2026-03-02"
+    assert export.export_value(DOCUMENT_ID) == str(DOCUMENT_ID)
+    assert export.export_value(3) == 3
+
+
+def test_csv_header_has_bom_and_rows_are_drained_per_call():
+    formatter = export._CsvFormatter(COLUMNS)
+    assert formatter.header() == "\ufeffid,title,status,created_at,details\r\n"
+    first = formatter.rows(ROWS[:1])
+    second = formatter.rows(ROWS[1:])
+    assert first.count("\r\n") == second.count("\r\n") == 1
+
+    parsed = list(csv.reader(io.StringIO(first + second)))
+    assert parsed[0] == [str(DOCUMENT_ID), "Hợp đồng, \"bản 2\"", "APPROVED", "2026-03-01T08:30:00",
+                         '{"size": 10, "tags": ["a"]}']
+    assert parsed[1] == [str(DOCUMENT_ID), "", "APPROVED", "2026-03-02", ""]
+
+
+def test_ndjson_rows_are_one_object_per_line():
+    text = export._NdjsonFormatter(COLUMNS).rows(ROWS)
+    assert "Hợp đồng" in text
+    lines = [json.loads(line) for line in text.splitlines()]
+    assert lines[0] == {
+        "id": str(DOCUMENT_ID),
+        "title": "Hợp đồng, \"bản 2\"",
+        "status": "APPROVED",
+        "created_at": "2026-03-01T08:30:00",
+        "details": {"size": 10, "tags": ["a"]},
+    }
+    assert lines[1]["title"] is None and lines[1]["created_at"] == "2026-03-02"
+
+
+# -----------------------------------------------------------------------
+# stream_export với session giả (server-side cursor chia partition)
+# -----------------------------------------------------------------------
+class _Column:
+    def __init__(self, name):
+        self.name = name
+
+
+class _Statement:
+    selected_columns = [_Column(name) for name in COLUMNS]
+
+    def execution_options(self, **options):
+        self.options = options
+        return self
+
+
+class _Result:
+    def __init__(self, partitions):
+        self._partitions = partitions
+
+    async def partitions(self):
+        for partition in self._partitions:
+            yield partition
+
+
+class _Session:
+    opened = False
+
+    def __init__(self, partitions):
+        self._partitions = partitions
+
+    async def __aenter__(self):
+        _Session.opened = True
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def stream(self, stmt):
+        return _Result(self._partitions)
+
+
+def _collect(export_format, compress, partitions):
+    _Session.opened = False
+    stmt = _Statement()
+
+    async def scenario():
+        stream = export.stream_export(stmt, export_format, compress, "test",
+                                      session_factory=lambda: _Session(partitions), yield_per=1)
+        chunks = [await stream.__anext__()]
+        assert not _Session.opened  # header đi ra trước khi mở session / chạy truy vấn
+        chunks.extend([chunk async for chunk in stream])
+        return chunks
+
+    chunks = asyncio.run(scenario())
+    assert stmt.options == {"yield_per": 1}
+    return chunks
+
+
+def test_stream_export_plain_csv():
+    chunks = _collect("csv", False, [ROWS[:1], ROWS[1:]])
+    assert len(chunks) == 3
+    text = b"".join(chunks).decode("utf-8")
+    assert text.startswith("\ufeffid,title") and text.count("\r\n") == 3
+
+
+def test_stream_export_gzip_flushes_every_partition():
+    chunks = _collect("ndjson", True, [ROWS[:1], ROWS[1:]])
+    body = b"".join(chunks)
+    assert [json.loads(line)["created_at"] for line in gzip.decompress(body).splitlines()] == [
+        "2026-03-01T08:30:00", "2026-03-02",
+    ]
+    # Sau mỗi partition (sync flush) client đã giải nén được toàn bộ dòng đã gửi
+    decompressor = zlib.decompressobj(wbits=31)
+    first_partition = decompressor.decompress(b"".join(chunks[:2]))
+    assert first_partition.endswith(b"\n") and first_partition.count(b"\n") == 1
+
+
+def test_export_response_names_compressed_file():
+    async def empty():
+        yield b""
+
+    response = export.export_response(empty(), "documents-20260301", "csv", True)
+    assert response.media_type == "application/gzip"
+    assert response.headers["content-disposition"] == 'attachment; filename="documents-20260301.csv.gz"'
+    response = export.export_response(empty(), "documents-20260301", "ndjson", False)
+    assert response.media_type == "application/x-ndjson"
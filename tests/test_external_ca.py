@@ -0,0 +1,158 @@
+import asyncio
+import json
+
+import pytest
+
+external_ca = pytest.importorskip("app.core.external_ca")
+
+CircuitBreaker = external_ca.CircuitBreaker
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(external_ca.time, "monotonic", clock)
+    return clock
+
+
+def test_opens_after_threshold_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_allows_a_single_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 29.9
+    assert not breaker.allow()
+    clock.now += 0.1
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_probe_outcome_closes_or_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and breaker.opened_at == clock.now
+    assert not breaker.allow()
+
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_released_probe_can_be_retried(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.release_probe()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+
+
+# -----------------------------------------------------------------------
+# ExternalCAClient.post với client giả (không mở kết nối)
+# -----------------------------------------------------------------------
+class _Response:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.text = body
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class _FakeHTTPClient:
+    def __init__(self, response=None, hang=False):
+        self.response = response
+        self.hang = hang
+        self.calls = 0
+
+    async def post(self, path, json=None, headers=None):
+        self.calls += 1
+        if self.hang:
+            await asyncio.sleep(3600)
+        return self.response
+
+
+def _client(http_client, failure_threshold=1):
+    client = external_ca.ExternalCAClient(providers={"ca": "http://ca.invalid"}, max_retries=0)
+    provider = client.providers["ca"]
+    provider.breaker = CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=30)
+    provider._client = http_client
+    return client, provider
+
+
+def test_post_returns_json_and_closes_breaker():
+    client, provider = _client(_FakeHTTPClient(_Response(200, '{"request_id": "r1"}')))
+    assert asyncio.run(client.post("ca", "/sign", {}, "key")) == {"request_id": "r1"}
+    assert provider.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_non_json_success_raises_external_ca_error():
+    client, _ = _client(_FakeHTTPClient(_Response(200, "<html>ok</html>")))
+    with pytest.raises(external_ca.ExternalCAError):
+        asyncio.run(client.post("ca", "/sign", {}, "key"))
+
+
+def test_business_error_does_not_trip_breaker():
+    client, provider = _client(_FakeHTTPClient(_Response(422, "bad document")))
+    with pytest.raises(external_ca.ExternalCAError):
+        asyncio.run(client.post("ca", "/sign", {}, "key"))
+    assert provider.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retryable_status_opens_breaker():
+    client, provider = _client(_FakeHTTPClient(_Response(503, "busy")))
+    with pytest.raises(external_ca.ExternalCAError):
+        asyncio.run(client.post("ca", "/sign", {}, "key"))
+    assert provider.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(external_ca.CircuitOpenError):
+        asyncio.run(client.post("ca", "/sign", {}, "key"))
+
+
+def test_cancelled_probe_is_released_without_failure(clock):
+    http_client = _FakeHTTPClient(hang=True)
+    client, provider = _client(http_client)
+    provider.breaker.record_failure()
+    clock.now += 30
+
+    async def cancel_probe():
+        task = asyncio.ensure_future(client.post("ca", "/sign", {}, "key"))
+        while not http_client.calls:
+            await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_probe())
+    assert provider.breaker.state == CircuitBreaker.HALF_OPEN
+    assert provider.breaker.failures == 1
+    assert provider.breaker.allow()
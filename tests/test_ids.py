@@ -0,0 +1,40 @@
+import time
+import uuid
+
+from app.core import ids
+from app.core.ids import uuid7, uuid7_timestamp
+
+
+def test_version_and_variant():
+    value = uuid7()
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+
+
+def test_timestamp_is_current_unix_ms():
+    before = time.time()
+    value = uuid7()
+    after = time.time()
+    assert before - 0.001 <= uuid7_timestamp(value) <= after + 0.001
+
+
+def test_ids_are_strictly_increasing_within_a_millisecond():
+    values = [uuid7() for _ in range(10_000)]
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)
+
+
+def test_counter_overflow_moves_to_next_millisecond(monkeypatch):
+    frozen_ns = 1_700_000_000_000 * 1_000_000
+    monkeypatch.setattr(ids.time, "time_ns", lambda: frozen_ns)
+    monkeypatch.setattr(ids, "_last_ms", 0)
+    values = [uuid7() for _ in range(0x1000)]
+    assert values == sorted(values)
+    assert uuid7_timestamp(values[0]) == 1_700_000_000.0
+    assert uuid7_timestamp(values[-1]) == 1_700_000_000.001
+
+
+def test_clock_going_backwards_keeps_order(monkeypatch):
+    first = uuid7()
+    monkeypatch.setattr(ids.time, "time_ns", lambda: 0)
+    assert uuid7() > first
@@ -0,0 +1,65 @@
+import hashlib
+
+import pytest
+
+from app.core.merkle import (
+    decode_proof,
+    encode_proof,
+    hash_leaf,
+    hash_node,
+    merkle_proofs,
+    merkle_root,
+    root_from_proof,
+)
+
+
+def _leaves(count):
+    return [hash_leaf(f"doc-{i}".encode()) for i in range(count)]
+
+
+def test_leaf_and_node_hashes_are_domain_separated():
+    left, right = hash_leaf(b"a"), hash_leaf(b"b")
+    assert hash_leaf(b"a") == hashlib.sha256(b"\x00a").digest()
+    assert hash_node(left, right) == hashlib.sha256(b"\x01" + left + right).digest()
+    assert hash_leaf(left + right) != hash_node(left, right)
+
+
+def test_root_of_single_and_empty_tree():
+    leaf = hash_leaf(b"only")
+    assert merkle_root([leaf]) == leaf
+    assert merkle_root([]) == hash_leaf(b"")
+
+
+def test_odd_node_is_promoted():
+    a, b, c = _leaves(3)
+    assert merkle_root([a, b, c]) == hash_node(hash_node(a, b), c)
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 4, 5, 7, 8, 13])
+def test_every_proof_rebuilds_the_root(count):
+    leaves = _leaves(count)
+    root, proofs = merkle_proofs(leaves)
+    assert root == merkle_root(leaves)
+    for leaf, proof in zip(leaves, proofs):
+        assert root_from_proof(leaf, proof) == root
+
+
+def test_proof_does_not_verify_another_leaf():
+    leaves = _leaves(5)
+    root, proofs = merkle_proofs(leaves)
+    assert root_from_proof(leaves[1], proofs[2]) != root
+    assert root_from_proof(hash_leaf(b"forged"), proofs[2]) != root
+
+
+def test_proof_encoding_round_trips():
+    leaves = _leaves(6)
+    _, proofs = merkle_proofs(leaves)
+    for proof in proofs:
+        encoded = encode_proof(proof)
+        assert all(item[:2] in ("L:", "R:") for item in encoded)
+        assert decode_proof(encoded) == proof
+
+
+def test_proofs_of_empty_tree_are_rejected():
+    with pytest.raises(ValueError):
+        merkle_proofs([])
@@ -0,0 +1,51 @@
+import asyncio
+import unicodedata
+from uuid import uuid4
+
+import pytest
+
+search = pytest.importorskip("app.modules.documents.search")
+
+
+@pytest.mark.parametrize("value, folded", [
+    ("Hợp Đồng  Mua\tBán", "hop dong mua ban"),
+    ("ĐƠN ĐỀ NGHỊ", "don de nghi"),
+    ("  Quyết   định\nsố 12 ", "quyet dinh so 12"),
+    ("already plain", "already plain"),
+    (None, ""),
+    ("", ""),
+    ("\u0301\u0300 \u0323", ""),
+])
+def test_fold_text(value, folded):
+    assert search.fold_text(value) == folded
+
+
+def test_fold_text_is_idempotent_and_normalization_independent():
+    composed = "Nguyễn Văn Đức"
+    decomposed = unicodedata.normalize("NFD", composed)
+    assert search.fold_text(composed) == search.fold_text(decomposed) == "nguyen van duc"
+    assert search.fold_text(search.fold_text(composed)) == "nguyen van duc"
+
+
+def test_cursor_round_trips():
+    document_id = uuid4()
+    assert search.decode_cursor(search.encode_cursor(0.4375, document_id)) == (0.4375, document_id)
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not base64!",
+    "WzFd",  # [1]
+    "WyJ4IiwgIm5vdC1hLXV1aWQiXQ==",  # ["x", "not-a-uuid"]
+    "WzAuNSwgNV0=",  # [0.5, 5]: document_id không phải chuỗi
+    "NQ==",  # 5
+])
+def test_invalid_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        search.decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("query", ["   ", "\u0301\u0300", "a", " đ "])
+def test_query_that_folds_too_short_is_rejected_before_the_database(query):
+    with pytest.raises(search.InvalidSearchQuery):
+        asyncio.run(search.search_documents(None, query))
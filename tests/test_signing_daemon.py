@@ -0,0 +1,105 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+
+import pytest
+
+signing_daemon = pytest.importorskip("app.core.signing_daemon")
+
+FINGERPRINT = "ab" * 32
+
+
+class _FakeSigner:
+    def __init__(self, info):
+        self.info = info
+
+    def describe(self):
+        return self.info
+
+
+@pytest.fixture
+def socket_path():
+    # AF_UNIX giới hạn ~108 ký tự: không dùng tmp_path của pytest
+    directory = tempfile.mkdtemp(prefix="sd-")
+    yield os.path.join(directory, "s.sock")
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+
+def test_frames_have_fixed_sizes_and_round_trip():
+    digest = hashlib.sha256(b"doc").digest()
+    frame = signing_daemon.REQUEST.pack(0xFFFFFFFF, signing_daemon.OP_SIGN, signing_daemon.PURPOSES["INITIAL"], digest)
+    assert len(frame) == signing_daemon.REQUEST.size == 38
+    assert signing_daemon.REQUEST.unpack(frame) == (0xFFFFFFFF, 1, 1, digest)
+
+    header = signing_daemon.RESPONSE_HEADER.pack(7, signing_daemon.STATUS_ERROR, 3)
+    assert len(header) == signing_daemon.RESPONSE_HEADER.size == 9
+    assert signing_daemon.RESPONSE_HEADER.unpack(header) == (7, 1, 3)
+
+
+def test_daemon_answers_info_and_rejects_unknown_op(monkeypatch, socket_path):
+    info = {"fingerprint": FINGERPRINT, "algorithm": "ED25519"}
+    monkeypatch.setattr(signing_daemon, "_load_signers",
+                        lambda: {"FINAL": _FakeSigner(info), "INITIAL": _FakeSigner({})})
+
+    async def scenario():
+        daemon = signing_daemon.SigningDaemon(socket_path, workers=1)
+        server = await asyncio.start_unix_server(daemon._handle, path=socket_path)
+        client = signing_daemon.SigningDaemonClient(socket_path, timeout=5)
+        async with server:
+            assert json.loads(await client.request(signing_daemon.OP_INFO, "FINAL")) == info
+            with pytest.raises(signing_daemon.SigningDaemonError, match="No INITIAL key"):
+                await client.request(signing_daemon.OP_INFO, "INITIAL")
+            with pytest.raises(signing_daemon.SigningDaemonError, match="Unknown op"):
+                await client.request(99, "FINAL")
+            client._writer.close()
+
+    asyncio.run(scenario())
+
+
+def test_client_matches_out_of_order_responses(socket_path):
+    async def reply_in_reverse(reader, writer):
+        requests = [signing_daemon.REQUEST.unpack(await reader.readexactly(signing_daemon.REQUEST.size))
+                    for _ in range(2)]
+        for request_id, _, _, digest in reversed(requests):
+            payload = FINGERPRINT.encode("ascii") + b"sig:" + digest
+            writer.write(signing_daemon.RESPONSE_HEADER.pack(request_id, signing_daemon.STATUS_OK, len(payload))
+                         + payload)
+        await writer.drain()
+        await reader.read()
+        writer.close()
+
+    async def scenario():
+        server = await asyncio.start_unix_server(reply_in_reverse, path=socket_path)
+        signer = signing_daemon.RemoteSigner(socket_path)
+        first, second = hashlib.sha256(b"1").hexdigest(), hashlib.sha256(b"2").hexdigest()
+        async with server:
+            results = await asyncio.gather(signer.asign_hash_with_fingerprint(first),
+                                           signer.asign_hash_with_fingerprint(second))
+            signer.client._writer.close()
+        return first, second, results
+
+    first, second, results = asyncio.run(scenario())
+    assert results == [
+        (b"sig:" + bytes.fromhex(first), FINGERPRINT),
+        (b"sig:" + bytes.fromhex(second), FINGERPRINT),
+    ]
+
+
+def test_lost_connection_fails_pending_requests(socket_path):
+    async def hang_up(reader, writer):
+        await reader.readexactly(signing_daemon.REQUEST.size)
+        writer.close()
+
+    async def scenario():
+        server = await asyncio.start_unix_server(hang_up, path=socket_path)
+        client = signing_daemon.SigningDaemonClient(socket_path, timeout=5)
+        async with server:
+            with pytest.raises(signing_daemon.SigningDaemonError, match="connection"):
+                await client.request(signing_daemon.OP_SIGN, "FINAL", b"\x01" * 32)
+            assert not client._pending
+
+    asyncio.run(scenario())
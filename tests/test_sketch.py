@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from app.modules.analytics.sketch import MIN_VALUE, RELATIVE_ACCURACY, QuantileSketch
+
+
+def _exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def test_empty_sketch_has_no_quantile():
+    assert QuantileSketch().quantile(0.5) is None
+    assert QuantileSketch.merged([None, {}]).count == 0
+
+
+def test_small_values_fall_into_zero_bucket():
+    sketch = QuantileSketch()
+    sketch.add(0.2)
+    sketch.add(MIN_VALUE)
+    assert sketch.counts == {"0": 2}
+    assert sketch.quantile(0.99) == 0.0
+
+
+@pytest.mark.parametrize("q", [0.5, 0.9, 0.95, 0.99])
+def test_quantiles_within_relative_accuracy(q):
+    rng = random.Random(42)
+    values = [rng.lognormvariate(8, 1.5) + 2 for _ in range(20_000)]
+    sketch = QuantileSketch()
+    for value in values:
+        sketch.add(value)
+    expected = _exact_quantile(values, q)
+    assert abs(sketch.quantile(q) - expected) <= RELATIVE_ACCURACY * expected * 1.0001
+
+
+def test_merge_equals_single_sketch():
+    rng = random.Random(7)
+    values = [rng.uniform(1, 86_400) for _ in range(5_000)]
+    whole, left, right = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for i, value in enumerate(values):
+        whole.add(value)
+        (left if i % 2 else right).add(value)
+    merged = QuantileSketch.merged([left.to_json(), right.to_json()])
+    assert merged.counts == whole.counts
+    assert merged.count == len(values)
+
+
+def test_weighted_add():
+    sketch = QuantileSketch()
+    sketch.add(3600, count=9)
+    sketch.add(60)
+    assert sketch.count == 10
+    assert sketch.quantile(0.5) == pytest.approx(3600, rel=RELATIVE_ACCURACY)
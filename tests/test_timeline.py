@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+
+timeline = pytest.importorskip("app.modules.documents.timeline")
+
+
+@pytest.mark.parametrize("at", [
+    datetime(2026, 3, 1, 8, 30, 15, 123456),
+    datetime(2026, 3, 1, 8, 30, tzinfo=timezone(timedelta(hours=7))),
+])
+def test_cursor_round_trips(at):
+    event_id = uuid4()
+    assert timeline.decode_timeline_cursor(timeline.encode_timeline_cursor(at, event_id)) == (at, event_id)
+
+
+def test_cursor_is_url_safe():
+    cursor = timeline.encode_timeline_cursor(datetime(2026, 3, 1), uuid4())
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not base64!",
+    "WzFd",  # [1]
+    "WyJ5ZXN0ZXJkYXkiLCAiMDAwMDAwMDAtMDAwMC0wMDAwLTAwMDAtMDAwMDAwMDAwMDAwIl0=",  # ngày không hợp lệ
+    "WyIyMDI2LTAzLTAxIiwgNV0=",  # event_id không phải chuỗi
+])
+def test_invalid_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        timeline.decode_timeline_cursor(cursor)
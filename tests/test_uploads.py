@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+uploads = pytest.importorskip("app.modules.documents.uploads")
+
+ACTOR = "actor-1"
+DATA = os.urandom(3 * 1024 + 17)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def _chunks(*parts):
+    for part in parts:
+        yield part
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return uploads.UploadSessionManager(base_dir=str(tmp_path), ttl_seconds=3600, max_size=1 << 20)
+
+
+async def _create(manager, length=len(DATA)):
+    return await manager.create(ACTOR, "a.pdf", "A", None, "application/pdf", length)
+
+
+def test_resume_across_managers_keeps_hash(manager, tmp_path):
+    async def scenario():
+        session = await _create(manager)
+        await manager.append(session.id, 0, _chunks(DATA[:1000], DATA[1000:2000]), ACTOR)
+        # Worker khác (không có trạng thái SHA-256 trong bộ nhớ) nhận PATCH kế tiếp
+        other = uploads.UploadSessionManager(base_dir=str(tmp_path), ttl_seconds=3600, max_size=1 << 20)
+        session = await other.append(session.id, 2000, _chunks(DATA[2000:]), ACTOR)
+        assert session.offset == len(DATA) and session.is_complete
+        async with manager.finalizing(session.id, ACTOR) as (_, path, file_hash):
+            with open(path, "rb") as f:
+                assert f.read() == DATA
+        return session.id, file_hash
+
+    session_id, file_hash = run(scenario())
+    assert file_hash == hashlib.sha256(DATA).hexdigest()
+    assert not os.path.exists(manager.data_path(session_id))
+
+
+def test_offset_mismatch_reports_current_offset(manager):
+    async def scenario():
+        session = await _create(manager)
+        await manager.append(session.id, 0, _chunks(DATA[:10]), ACTOR)
+        await manager.append(session.id, 5, _chunks(DATA[5:20]), ACTOR)
+
+    with pytest.raises(uploads.UploadOffsetMismatch) as exc:
+        run(scenario())
+    assert exc.value.expected == 10
+
+
+def test_overflow_keeps_accepted_bytes(manager):
+    async def scenario():
+        session = await _create(manager, length=10)
+        with pytest.raises(uploads.UploadTooLarge):
+            await manager.append(session.id, 0, _chunks(DATA[:6], DATA[6:12]), ACTOR)
+        return await manager.get(session.id)
+
+    assert run(scenario()).offset == 6
+
+
+def test_truncated_part_rewinds_session(manager, tmp_path):
+    async def scenario():
+        session = await _create(manager)
+        await manager.append(session.id, 0, _chunks(DATA[:2000]), ACTOR)
+        with open(manager.data_path(session.id), "r+b") as f:
+            f.truncate(700)
+        other = uploads.UploadSessionManager(base_dir=str(tmp_path), ttl_seconds=3600, max_size=1 << 20)
+        with pytest.raises(uploads.UploadDataLost) as exc:
+            await other.append(session.id, 2000, _chunks(DATA[2000:]), ACTOR)
+        assert exc.value.expected == 700
+        assert (await other.get(session.id)).offset == 700
+        session = await other.append(session.id, 700, _chunks(DATA[700:]), ACTOR)
+        async with other.finalizing(session.id, ACTOR) as (_, _, file_hash):
+            return file_hash
+
+    assert run(scenario()) == hashlib.sha256(DATA).hexdigest()
+
+
+def test_session_is_busy_while_finalizing(manager):
+    async def scenario():
+        session = await _create(manager, length=4)
+        await manager.append(session.id, 0, _chunks(b"abcd"), ACTOR)
+        async with manager.finalizing(session.id, ACTOR):
+            with pytest.raises(uploads.UploadSessionBusy) as exc:
+                await manager.append(session.id, 4, _chunks(b""), ACTOR)
+            assert exc.value.expected == 4
+
+    run(scenario())
+
+
+def test_failed_finalize_keeps_session(manager):
+    async def scenario():
+        session = await _create(manager, length=4)
+        await manager.append(session.id, 0, _chunks(b"abcd"), ACTOR)
+        with pytest.raises(RuntimeError):
+            async with manager.finalizing(session.id, ACTOR):
+                raise RuntimeError("db down")
+        return await manager.get(session.id, ACTOR)
+
+    assert run(scenario()).is_complete
+
+
+def test_incomplete_or_foreign_session_cannot_finalize(manager):
+    async def scenario():
+        session = await _create(manager)
+        with pytest.raises(uploads.UploadSessionNotFound):
+            await manager.get(session.id, "someone-else")
+        with pytest.raises(uploads.UploadOffsetMismatch):
+            async with manager.finalizing(session.id, ACTOR):
+                pass
+
+    run(scenario())
+
+
+def test_create_validates_length(manager):
+    with pytest.raises(uploads.UploadTooLarge):
+        run(_create(manager, length=(1 << 20) + 1))
+    with pytest.raises(uploads.UploadSessionError):
+        run(_create(manager, length=0))
+
+
+def test_purge_removes_expired_sessions(manager):
+    async def scenario():
+        expired = await _create(manager)
+        live = await _create(manager)
+        session = await manager.get(expired.id)
+        session.expires_at = 0
+        await manager._write_meta(session)
+        assert await manager.purge_expired(force=True) == 1
+        with pytest.raises(uploads.UploadSessionNotFound):
+            await manager.get(expired.id)
+        await manager.get(live.id)
+
+    run(scenario())